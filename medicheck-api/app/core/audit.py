@@ -1,7 +1,61 @@
-from typing import Optional
+import asyncio
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+import psycopg
+from app.core.config import settings
 from app.core.db import get_conn
 
-def write_audit_event(
+logger = logging.getLogger(__name__)
+
+# Audit events are queued in-process and written in bulk by a background
+# asyncio task (COPY, flushed on AUDIT_BATCH_SIZE or AUDIT_FLUSH_INTERVAL_SECONDS).
+# When the queue stays full or the database is unavailable, events are
+# appended to a per-process NDJSON spool file and replayed later, so audit
+# never blocks on the database and is not lost if the DB is down. Events
+# still in memory are flushed on shutdown. Callers holding a unit-of-work
+# connection pass conn= instead, and the event commits or rolls back with
+# the rest of their transaction.
+
+_COLUMNS = (
+    "created_at, actor_user_id, actor_role, action, target_type, target_id, "
+    "metadata_json, ip, user_agent"
+)
+
+_INSERT_SQL = f"INSERT INTO audit_events({_COLUMNS}) VALUES ({', '.join(['%s'] * 9)})"
+
+AuditRow = Tuple[Optional[str], ...]
+
+# Created by start_audit_writer() on the app's event loop.
+_queue: "Optional[asyncio.Queue[AuditRow]]" = None
+_stop: Optional[asyncio.Event] = None
+_task: "Optional[asyncio.Task[None]]" = None
+_spool_lock = threading.Lock()  # spool I/O runs in worker threads
+
+_stats_lock = threading.Lock()
+_stats = {
+    "enqueued": 0,
+    "written": 0,
+    "spooled": 0,
+    "replayed": 0,
+    "rejected": 0,
+    "flushes": 0,
+    "last_flush_ms": 0.0,
+}
+
+
+def _bump(key: str, n: int = 1):
+    with _stats_lock:
+        _stats[key] += n
+
+
+async def write_audit_event(
     *,
     actor_user_id: Optional[str],
     actor_role: Optional[str],
@@ -11,15 +65,296 @@ def write_audit_event(
     metadata_json: dict | None = None,
     ip: Optional[str] = None,
     user_agent: Optional[str] = None,
+    conn: Optional[psycopg.AsyncConnection] = None,
 ):
     metadata_json = metadata_json or {}
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO audit_events(actor_user_id, actor_role, action, target_type, target_id, metadata_json, ip, user_agent)
-                VALUES (%s, %s, %s, %s, %s, %s::jsonb, %s, %s)
-                """,
-                (actor_user_id, actor_role, action, target_type, target_id, metadata_json, ip, user_agent)
-            )
-        conn.commit()
+    row: AuditRow = (
+        datetime.now(timezone.utc).isoformat(),
+        actor_user_id,
+        actor_role,
+        action,
+        target_type,
+        target_id,
+        json.dumps(metadata_json, default=str),
+        ip,
+        user_agent,
+    )
+
+    if conn is not None:
+        # Part of the caller's transaction (works in pipeline mode too).
+        await conn.execute(_INSERT_SQL, row)
+        _bump("written")
+        return
+
+    if _task is None:
+        await _insert_rows([row])
+        _bump("written")
+        return
+
+    try:
+        _queue.put_nowait(row)
+    except asyncio.QueueFull:
+        try:
+            await asyncio.wait_for(_queue.put(row), settings.AUDIT_ENQUEUE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            # Backpressure: the writer is behind; persist durably instead of
+            # growing memory or failing the request.
+            await asyncio.to_thread(_spool, [row])
+            return
+    _bump("enqueued")
+
+
+# -----------------------------
+# Database writes
+# -----------------------------
+
+async def _insert_rows(rows: List[AuditRow]):
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            async with cur.copy(f"COPY audit_events({_COLUMNS}) FROM STDIN") as copy:
+                for row in rows:
+                    await copy.write_row(row)
+
+
+async def _flush(rows: List[AuditRow]) -> bool:
+    """Write rows; returns False if some had to be spooled instead."""
+    started = time.perf_counter()
+    written = 0
+    ok = True
+    try:
+        await _insert_rows(rows)
+        written = len(rows)
+    except (psycopg.DataError, psycopg.IntegrityError):
+        # One bad row fails the whole COPY; isolate it row by row.
+        for i, row in enumerate(rows):
+            try:
+                await _insert_rows([row])
+                written += 1
+            except (psycopg.DataError, psycopg.IntegrityError):
+                logger.error("rejected audit event: %s", row)
+                await asyncio.to_thread(_reject, row)
+            except Exception:
+                await asyncio.to_thread(_spool, rows[i:])
+                ok = False
+                break
+    except Exception:
+        logger.warning("audit flush failed; spooling %d events", len(rows), exc_info=True)
+        await asyncio.to_thread(_spool, rows)
+        ok = False
+
+    with _stats_lock:
+        _stats["written"] += written
+        _stats["flushes"] += 1
+        _stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000.0, 3)
+    return ok
+
+
+# -----------------------------
+# Spool file
+# -----------------------------
+
+def _spool_path(pid: int) -> str:
+    return os.path.join(settings.AUDIT_SPOOL_DIR, f"{pid}.ndjson")
+
+
+def _append_lines(path: str, rows: List[AuditRow]):
+    os.makedirs(settings.AUDIT_SPOOL_DIR, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _spool(rows: List[AuditRow]):
+    with _spool_lock:
+        _append_lines(_spool_path(os.getpid()), rows)
+    _bump("spooled", len(rows))
+
+
+def _reject(row: AuditRow):
+    with _spool_lock:
+        _append_lines(os.path.join(settings.AUDIT_SPOOL_DIR, "rejected.ndjson"), [row])
+    _bump("rejected")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_spool(path: str) -> List[AuditRow]:
+    """Rows of a spool file. Lines that don't parse (a write cut short by a
+    crash) are moved to rejected.ndjson as-is."""
+    rows: List[AuditRow] = []
+    bad: List[str] = []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            if isinstance(row, list) and len(row) == 9:
+                rows.append(tuple(row))
+            else:
+                bad.append(line if line.endswith("\n") else line + "\n")
+    if bad:
+        logger.error("%d unreadable audit spool lines in %s; moved to rejected.ndjson", len(bad), path)
+        with _spool_lock:
+            os.makedirs(settings.AUDIT_SPOOL_DIR, exist_ok=True)
+            with open(os.path.join(settings.AUDIT_SPOOL_DIR, "rejected.ndjson"), "a", encoding="utf-8") as f:
+                f.writelines(bad)
+                f.flush()
+                os.fsync(f.fileno())
+        _bump("rejected", len(bad))
+    return rows
+
+
+async def _replay_spool():
+    """
+    Re-insert spooled events: our own spool plus those left behind by dead
+    worker processes. A file is claimed by renaming it before reading.
+    """
+    me = os.getpid()
+    for path in glob.glob(os.path.join(settings.AUDIT_SPOOL_DIR, "*.ndjson*")):
+        # "<pid>.ndjson" is a live spool; "<pid>.ndjson.replay-<owner>" was
+        # claimed by a replayer that may have died mid-way.
+        name, _, owner = os.path.basename(path).partition(".ndjson")
+        owner = owner[len(".replay-"):] if owner.startswith(".replay-") else name
+        if not owner.isdigit():
+            continue
+        pid = int(owner)
+        if pid != me and _pid_alive(pid):
+            continue
+
+        claimed = f"{os.path.join(settings.AUDIT_SPOOL_DIR, name)}.ndjson.replay-{me}"
+        with _spool_lock:
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue
+
+        rows = await asyncio.to_thread(_read_spool, claimed)
+
+        ok = True
+        for i in range(0, len(rows), settings.AUDIT_BATCH_SIZE):
+            if not await _flush(rows[i:i + settings.AUDIT_BATCH_SIZE]):
+                # Failed batch went back to our spool; keep the rest too.
+                await asyncio.to_thread(_spool, rows[i + settings.AUDIT_BATCH_SIZE:])
+                ok = False
+                break
+        os.remove(claimed)
+        if ok:
+            _bump("replayed", len(rows))
+        else:
+            return
+
+
+# -----------------------------
+# Background writer
+# -----------------------------
+
+async def _next_batch() -> List[AuditRow]:
+    try:
+        first = await asyncio.wait_for(_queue.get(), settings.AUDIT_FLUSH_INTERVAL_SECONDS)
+    except asyncio.TimeoutError:
+        return []
+
+    batch = [first]
+    deadline = time.monotonic() + settings.AUDIT_FLUSH_INTERVAL_SECONDS
+    while len(batch) < settings.AUDIT_BATCH_SIZE:
+        if not _queue.empty():
+            batch.append(_queue.get_nowait())
+            continue
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(_queue.get(), remaining))
+        except asyncio.TimeoutError:
+            break
+    return batch
+
+
+async def _run_writer():
+    try:
+        await _replay_spool()
+    except Exception:
+        logger.exception("audit spool replay failed")
+    while not (_stop.is_set() and _queue.empty()):
+        batch: List[AuditRow] = []
+        try:
+            batch = await _next_batch()
+            if batch and await _flush(batch) and os.path.exists(_spool_path(os.getpid())):
+                await _replay_spool()
+        except Exception:
+            # Keep draining the queue whatever goes wrong; a dead writer
+            # would leave every caller waiting on a full queue.
+            logger.exception("audit writer iteration failed")
+            if batch:
+                try:
+                    await asyncio.to_thread(_spool, batch)
+                except Exception:
+                    logger.exception("could not spool %d audit events", len(batch))
+            await asyncio.sleep(settings.AUDIT_FLUSH_INTERVAL_SECONDS)
+
+
+def _writer_done(task: "asyncio.Task[None]"):
+    global _task
+    if _task is not task:
+        return  # stopped by stop_audit_writer()
+    error = None if task.cancelled() else task.exception()
+    if error is not None:
+        logger.error("audit writer died; writing events directly", exc_info=error)
+    # write_audit_event() falls back to direct inserts; what was queued is spooled.
+    _task = None
+    leftover: List[AuditRow] = []
+    while not _queue.empty():
+        leftover.append(_queue.get_nowait())
+    if leftover:
+        asyncio.get_running_loop().run_in_executor(None, _spool, leftover)
+
+
+def start_audit_writer():
+    """Start the writer task on the running event loop."""
+    global _queue, _stop, _task
+    if not settings.AUDIT_ASYNC or _task is not None:
+        return
+    _queue = asyncio.Queue(maxsize=settings.AUDIT_QUEUE_MAX)
+    _stop = asyncio.Event()
+    _task = asyncio.create_task(_run_writer(), name="audit-writer")
+    _task.add_done_callback(_writer_done)
+
+
+async def stop_audit_writer():
+    """Flush everything still queued; anything that cannot be written is spooled."""
+    global _task
+    if _task is None:
+        return
+    _stop.set()
+    try:
+        await asyncio.wait_for(_task, timeout=30.0)
+    except asyncio.TimeoutError:
+        logger.warning("audit writer did not drain in time; spooling the rest")
+    _task = None
+
+    leftover: List[AuditRow] = []
+    while not _queue.empty():
+        leftover.append(_queue.get_nowait())
+    if leftover:
+        await asyncio.to_thread(_spool, leftover)
+
+
+def audit_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["queued"] = _queue.qsize() if _queue is not None else 0
+    stats["async"] = _task is not None
+    return stats
@@ -1,12 +1,12 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from app.core.security import decode_access_token
+from app.core.security import verify_access_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 def get_current_user(token: str = Depends(oauth2_scheme)):
     try:
-        payload = decode_access_token(token)
+        payload = verify_access_token(token)
         return payload
     except Exception:
         raise HTTPException(
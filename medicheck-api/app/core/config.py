@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
@@ -12,9 +14,96 @@ class Settings(BaseSettings):
     JWT_ISSUER: str = "medicheck"
     JWT_AUDIENCE: str = "medicheck-web"
     JWT_EXPIRES_MINUTES: int = 60
+    JWT_CACHE_MAX_ENTRIES: int = 10000  # verified-claims cache; 0 = disabled
+    JWT_CACHE_TTL_SECONDS: float = 300.0  # cap per entry; entries never outlive the token's exp
+    REVOKED_TOKENS_MAX_ENTRIES: int = 100000
+
+    # Password hashing
+    BCRYPT_ROUNDS: int = 12  # work factor; stored hashes are upgraded on the next login
+    BCRYPT_WORKERS: int = 2  # dedicated hashing processes; 0 = hash on the threadpool
+    BCRYPT_QUEUE_MAX: int = 64  # waiting hash jobs beyond which requests get 503
 
     # Database
     DATABASE_URL: str
+    DB_POOL_MIN_SIZE: int = 2
+    DB_POOL_MAX_SIZE: int = 10
+    DB_POOL_MAX_WAITING: int = 0  # 0 = unbounded queue of waiting requests
+    DB_POOL_TIMEOUT_SECONDS: float = 10.0
+    DB_POOL_MAX_IDLE_SECONDS: float = 300.0
+    DB_POOL_MAX_LIFETIME_SECONDS: float = 3600.0
+
+    # Operational endpoints
+    OPS_TOKEN: str = ""  # `Authorization: Bearer <token>` for /health/stats, /metrics and /rules/profile; empty = refused
+
+    # Metrics (/metrics, Prometheus text format)
+    METRICS_ENABLED: bool = True
+    METRICS_SLOW_REQUEST_MS: float = 0.0  # log requests at least this slow, with their SQL; 0 = off
+    METRICS_SLOW_LOG_MAX_STATEMENTS: int = 50
+    METRICS_TRACEMALLOC_SAMPLE_RATE: float = 0.0  # fraction of requests with allocation sampling; 0 = tracemalloc off
+    METRICS_TRACEMALLOC_FRAMES: int = 1
+
+    # List endpoints
+    PAGE_DEFAULT_LIMIT: int = 50  # page size after a cursor with no limit; neither given = the whole list
+    PAGE_MAX_LIMIT: int = 200
+
+    # Streaming responses
+    STREAM_ITERSIZE: int = 500  # rows per server-side cursor fetch
+    STREAM_CHUNK_BYTES: int = 64 * 1024
+
+    # LISTEN/NOTIFY cache invalidation
+    NOTIFY_ENABLED: bool = True
+    NOTIFY_RECONNECT_SECONDS: float = 5.0
+
+    # Audit writer
+    AUDIT_ASYNC: bool = True  # False = insert synchronously inside the request
+    AUDIT_QUEUE_MAX: int = 10000
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = 0.5
+    AUDIT_ENQUEUE_TIMEOUT_SECONDS: float = 0.05  # wait for queue space before spooling to disk
+    AUDIT_SPOOL_DIR: str = "audit_spool"
+
+    # Reminder dispatch
+    REMINDER_DISPATCH_ENABLED: bool = True
+    REMINDER_SINK: Literal["log", "local"] = "log"  # "local" keeps deliveries in memory (tests)
+    REMINDER_WORKERS: int = 8  # concurrent deliveries per process
+    REMINDER_CLAIM_BATCH: int = 500  # max reminders claimed and held in memory per process
+    REMINDER_LOOKAHEAD_SECONDS: float = 30.0  # claim reminders due this far ahead
+    REMINDER_POLL_SECONDS: float = 1.0
+    REMINDER_LEASE_SECONDS: float = 120.0  # after remind_at; then another worker may take it
+    REMINDER_MAX_ATTEMPTS: int = 5
+    REMINDER_RETRY_SECONDS: float = 30.0  # first retry delay, doubled per attempt
+    REMINDER_FLUSH_INTERVAL_SECONDS: float = 0.2
+
+    # Message push (GET /messages/stream)
+    MESSAGE_PUSH_QUEUE_MAX: int = 256  # undelivered messages per connection before it resyncs from the DB
+    MESSAGE_PUSH_DEDUPE_ENTRIES: int = 10000  # recently published ids (local publish + NOTIFY echo)
+    MESSAGE_STREAM_HEARTBEAT_SECONDS: float = 15.0
+    MESSAGE_STREAM_MAX_SECONDS: float = 300.0  # then the client reconnects with Last-Event-ID
+    MESSAGE_STREAM_BACKFILL_PAGE: int = 200  # rows per query when catching up
+
+    # Consent decision cache
+    CONSENT_CACHE_MAX_ENTRIES: int = 10000
+    CONSENT_CACHE_TTL_SECONDS: float = 60.0
+
+    # Identity (user -> patient/doctor/institution) cache
+    IDENTITY_CACHE_MAX_ENTRIES: int = 50000
+    IDENTITY_CACHE_WARM_ROWS: int = 1000  # preloaded at startup; 0 = disabled
+
+    # Symptom vocabulary (synonym index shared by the rules engines)
+    SYMPTOM_CACHE_MAX_ENTRIES: int = 50000  # raw symptom string -> canonical key
+
+    # Rules engine
+    RULES_CACHE_TTL_SECONDS: float = 300.0  # safety net on top of NOTIFY; 0 = never expire
+    RULES_RESULT_CACHE_MAX_ENTRIES: int = 20000  # memoized evaluation results; 0 = disabled
+    RULES_PROFILE_SAMPLE_RATE: float = 0.01  # evaluations traced into GET /rules/profile; 0 = off
+    RULES_REOPTIMIZE_SECONDS: float = 60.0  # re-plan clause order from the profile; 0 = off
+    RULES_BATCH_MAX_ITEMS: int = 5000
+    RULES_BATCH_WORKERS: int = 0  # process pool size for large batches; 0 = evaluate in-process
+    RULES_BATCH_PARALLEL_MIN_ITEMS: int = 1000
+    RULES_SOURCE: Literal["postgres", "file"] = "postgres"
+    RULES_SNAPSHOT_PATH: str = "rules.json"  # RULES_SOURCE=file: snapshot to serve (.json or .msgpack)
+    RULES_SNAPSHOT_DIR: str = "rules_snapshots"  # snapshots handed to batch worker processes
+    RULES_SNAPSHOT_FORMAT: Literal["json", "msgpack"] = "json"  # msgpack needs the msgpack package
 
     class Config:
         env_file = ".env"
@@ -1,6 +1,116 @@
-import psycopg
+import time
+from contextlib import asynccontextmanager
+from threading import Lock
+from typing import Annotated, AsyncIterator, Optional
+
+from fastapi import Depends
+from psycopg import AsyncConnection
 from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
 from app.core.config import settings
+from app.core.metrics import instrument_connection, observe_acquire
+
+# One async pool per worker process. Opened/closed from the app lifespan in
+# app/main.py; every route and service borrows connections through get_conn().
+pool = AsyncConnectionPool(
+    conninfo=settings.DATABASE_URL,
+    kwargs={"row_factory": dict_row},
+    configure=instrument_connection,
+    min_size=settings.DB_POOL_MIN_SIZE,
+    max_size=settings.DB_POOL_MAX_SIZE,
+    max_waiting=settings.DB_POOL_MAX_WAITING,
+    timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+    max_idle=settings.DB_POOL_MAX_IDLE_SECONDS,
+    max_lifetime=settings.DB_POOL_MAX_LIFETIME_SECONDS,
+    check=AsyncConnectionPool.check_connection,
+    name="medicheck",
+    open=False,
+)
+
+_acquire_lock = Lock()
+_acquire_count = 0
+_acquire_ms_total = 0.0
+_acquire_ms_max = 0.0
+
+
+async def open_pool():
+    await pool.open(wait=True, timeout=settings.DB_POOL_TIMEOUT_SECONDS)
+
+
+async def close_pool():
+    await pool.close()
+
+
+def _record_acquire(elapsed_ms: float):
+    global _acquire_count, _acquire_ms_total, _acquire_ms_max
+    with _acquire_lock:
+        _acquire_count += 1
+        _acquire_ms_total += elapsed_ms
+        if elapsed_ms > _acquire_ms_max:
+            _acquire_ms_max = elapsed_ms
+
+
+@asynccontextmanager
+async def get_conn():
+    """
+    Borrow a pooled AsyncConnection. The transaction is committed when the
+    block exits cleanly and rolled back on error; explicit commit() still
+    works. Raises psycopg_pool.PoolTimeout if no connection frees up in time.
+    """
+    started = time.perf_counter()
+    async with pool.connection() as conn:
+        elapsed = time.perf_counter() - started
+        _record_acquire(elapsed * 1000.0)
+        observe_acquire(elapsed)
+        yield conn
+
+
+@asynccontextmanager
+async def use_conn(conn: Optional[AsyncConnection] = None):
+    """Use the caller's connection if given, otherwise borrow one for this block."""
+    if conn is not None:
+        yield conn
+        return
+    async with get_conn() as own:
+        yield own
+
+
+async def unit_of_work() -> AsyncIterator[AsyncConnection]:
+    """
+    Request-scoped dependency: one pooled connection and one transaction for
+    every statement the request runs (lookups, writes and audit). FastAPI
+    closes it after the endpoint returns, so the transaction commits before
+    the response is sent and rolls back if the endpoint raises. Routes must
+    not call commit() on it.
+    """
+    async with get_conn() as conn:
+        async with conn.transaction():
+            yield conn
+
+
+UnitOfWork = Annotated[AsyncConnection, Depends(unit_of_work)]
+
+
+def pool_stats() -> dict:
+    stats = pool.get_stats()
+    with _acquire_lock:
+        count = _acquire_count
+        total_ms = _acquire_ms_total
+        max_ms = _acquire_ms_max
 
-def get_conn():
-    return psycopg.connect(settings.DATABASE_URL, row_factory=dict_row)
+    size = stats.get("pool_size", 0)
+    available = stats.get("pool_available", 0)
+    return {
+        "min_size": stats.get("pool_min"),
+        "max_size": stats.get("pool_max"),
+        "size": size,
+        "in_use": size - available,
+        "idle": available,
+        "waiting": stats.get("requests_waiting", 0),
+        "requests": stats.get("requests_num", 0),
+        "timeouts": stats.get("requests_errors", 0),
+        "connections_lost": stats.get("connections_lost", 0),
+        "acquired": count,
+        "acquire_ms_avg": round(total_ms / count, 3) if count else 0.0,
+        "acquire_ms_max": round(max_ms, 3),
+    }
@@ -0,0 +1,300 @@
+import logging
+import random
+import re
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from psycopg import AsyncCursor, AsyncServerCursor, sql
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Request instrumentation, exported in Prometheus text format on /metrics.
+#
+# MetricsMiddleware puts a RequestMetrics in a context variable for every
+# HTTP request. The pool hands out connections whose cursors are
+# TimedCursor/TimedServerCursor, and get_conn() reports acquire time, so
+# each query and connection checkout is charged to the request that ran it
+# (background tasks have no request and only feed the global query
+# histogram). When the request finishes its latency, query count/time and
+# connection count go into per-route histograms, and requests slower than
+# METRICS_SLOW_REQUEST_MS are logged with the SQL they ran.
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+_BYTES_BUCKETS = (1024, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_MAX_STATEMENT_CHARS = 500
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values (Prometheus semantics)."""
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float], labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labelnames = labelnames
+        self._series: Dict[Tuple[str, ...], list] = {}  # labels -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total, n) for labels, (counts, total, n) in self._series.items()]
+        for labels, counts, total, n in sorted(series):
+            base = [f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, labels)]
+            running = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                running += c
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                bucket_labels = ",".join(base + ['le="%s"' % le])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {running}")
+            suffix = "{" + ",".join(base) + "}" if base else ""
+            lines.append(f"{self.name}_sum{suffix} {total:.6f}")
+            lines.append(f"{self.name}_count{suffix} {n}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_ROUTE = ("method", "route")
+request_seconds = Histogram(
+    "medicheck_http_request_duration_seconds", "Time to the last response byte.",
+    _LATENCY_BUCKETS, ("method", "route", "status"),
+)
+request_queries = Histogram("medicheck_http_request_db_queries", "Statements executed per request.", _COUNT_BUCKETS, _ROUTE)
+request_db_seconds = Histogram("medicheck_http_request_db_seconds", "Statement execution time per request.", _LATENCY_BUCKETS, _ROUTE)
+request_connections = Histogram("medicheck_http_request_db_connections", "Pool checkouts per request.", _COUNT_BUCKETS, _ROUTE)
+request_alloc_bytes = Histogram(
+    "medicheck_http_request_alloc_bytes", "Net traced allocations of sampled requests (tracemalloc).",
+    _BYTES_BUCKETS, _ROUTE,
+)
+query_seconds = Histogram("medicheck_db_query_duration_seconds", "Statement execution time.", _QUERY_BUCKETS, ("verb",))
+acquire_seconds = Histogram("medicheck_db_pool_acquire_seconds", "Wait for a pooled connection.", _QUERY_BUCKETS)
+
+_HISTOGRAMS = (
+    request_seconds, request_queries, request_db_seconds, request_connections,
+    request_alloc_bytes, query_seconds, acquire_seconds,
+)
+
+
+class RequestMetrics:
+    __slots__ = ("queries", "query_seconds", "connections", "acquire_seconds", "statements")
+
+    def __init__(self, capture: bool):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.connections = 0
+        self.acquire_seconds = 0.0
+        self.statements: Optional[List[Tuple[float, str]]] = [] if capture else None
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar("medicheck_request_metrics", default=None)
+
+
+# -----------------------------
+# DB hooks
+
+
+def _leading_sql(query: Any, context) -> str:
+    while isinstance(query, sql.Composed):
+        query = next(iter(query), "")
+    if isinstance(query, sql.Composable):
+        return query.as_string(context)
+    if isinstance(query, bytes):
+        return query[:64].decode("utf-8", "replace")
+    return query if isinstance(query, str) else ""
+
+
+def _verb(head: str) -> str:
+    word = head.lstrip(" \t\r\n(").split(None, 1)
+    return word[0].upper() if word else "OTHER"
+
+
+def _statement_text(query: Any, context) -> str:
+    if isinstance(query, sql.Composable):
+        query = query.as_string(context)
+    elif isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    return re.sub(r"\s+", " ", str(query)).strip()[:_MAX_STATEMENT_CHARS]
+
+
+def _record_query(cursor, query: Any, seconds: float):
+    query_seconds.observe(seconds, _verb(_leading_sql(query, cursor)))
+    req = _current.get()
+    if req is None:
+        return
+    req.queries += 1
+    req.query_seconds += seconds
+    if req.statements is not None and len(req.statements) < settings.METRICS_SLOW_LOG_MAX_STATEMENTS:
+        req.statements.append((seconds, _statement_text(query, cursor)))
+
+
+def observe_acquire(seconds: float):
+    """Called by get_conn() for every pool checkout."""
+    if not settings.METRICS_ENABLED:
+        return
+    acquire_seconds.observe(seconds)
+    req = _current.get()
+    if req is not None:
+        req.connections += 1
+        req.acquire_seconds += seconds
+
+
+class TimedCursor(AsyncCursor):
+    async def execute(self, query, params=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().execute(query, params, **kwargs)
+        finally:
+            _record_query(self, query, time.perf_counter() - started)
+
+    async def executemany(self, query, params_seq, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().executemany(query, params_seq, **kwargs)
+        finally:
+            _record_query(self, query, time.perf_counter() - started)
+
+
+class TimedServerCursor(AsyncServerCursor):
+    # Only DECLARE is timed; rows are fetched while the response streams.
+    async def execute(self, query, params=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().execute(query, params, **kwargs)
+        finally:
+            _record_query(self, query, time.perf_counter() - started)
+
+
+async def instrument_connection(conn):
+    """Pool `configure` callback: time every statement run on `conn`."""
+    if settings.METRICS_ENABLED:
+        conn.cursor_factory = TimedCursor
+        conn.server_cursor_factory = TimedServerCursor
+
+
+# -----------------------------
+# Middleware
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no extra task per request, streaming untouched)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        req = RequestMetrics(capture=settings.METRICS_SLOW_REQUEST_MS > 0)
+        token = _current.set(req)
+        sampled = tracemalloc.is_tracing() and random.random() < settings.METRICS_TRACEMALLOC_SAMPLE_RATE
+        traced_before = tracemalloc.get_traced_memory()[0] if sampled else 0
+        status = 500
+        started = time.perf_counter()
+        finished = None
+
+        async def send_wrapper(message):
+            nonlocal status, finished
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                finished = time.perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            elapsed = (finished or time.perf_counter()) - started
+            alloc = max(0, tracemalloc.get_traced_memory()[0] - traced_before) if sampled else None
+            _finish(scope, req, status, elapsed, alloc)
+
+
+def _finish(scope, req: RequestMetrics, status: int, elapsed: float, alloc: Optional[int]):
+    route = scope.get("route")
+    # Unmatched paths share one label so 404 scans can't blow up cardinality.
+    path = getattr(route, "path", None) or "unmatched"
+    method = scope.get("method", "")
+
+    request_seconds.observe(elapsed, method, path, str(status))
+    request_queries.observe(req.queries, method, path)
+    request_db_seconds.observe(req.query_seconds, method, path)
+    request_connections.observe(req.connections, method, path)
+    if alloc is not None:
+        request_alloc_bytes.observe(alloc, method, path)
+
+    threshold_ms = settings.METRICS_SLOW_REQUEST_MS
+    if threshold_ms > 0 and elapsed * 1000.0 >= threshold_ms:
+        lines = [
+            f"slow request {method} {path} {elapsed * 1000.0:.1f}ms status={status} "
+            f"queries={req.queries} ({req.query_seconds * 1000.0:.1f}ms) "
+            f"connections={req.connections} (acquire {req.acquire_seconds * 1000.0:.1f}ms)"
+        ]
+        lines.extend(f"  {seconds * 1000.0:8.2f}ms  {text}" for seconds, text in req.statements or ())
+        if req.queries > len(req.statements or ()):
+            lines.append(f"  ... {req.queries - len(req.statements or ())} more")
+        logger.warning("\n".join(lines))
+
+
+# -----------------------------
+# Export
+
+
+def start_metrics():
+    if settings.METRICS_ENABLED and settings.METRICS_TRACEMALLOC_SAMPLE_RATE > 0 and not tracemalloc.is_tracing():
+        tracemalloc.start(max(1, settings.METRICS_TRACEMALLOC_FRAMES))
+
+
+def stop_metrics():
+    if settings.METRICS_TRACEMALLOC_SAMPLE_RATE > 0 and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def _stat_gauges(stats: Dict[str, Any], prefix: str = "medicheck") -> List[str]:
+    lines = []
+    for key, value in stats.items():
+        name = f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', str(key))}"
+        if isinstance(value, dict):
+            lines.extend(_stat_gauges(value, name))
+        elif isinstance(value, (bool, int, float)):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {float(value)}")
+    return lines
+
+
+def render_metrics(stats: Optional[Dict[str, Any]] = None) -> str:
+    """Prometheus text exposition: the histograms, plus `stats` (/health/stats) as gauges."""
+    lines: List[str] = []
+    for histogram in _HISTOGRAMS:
+        lines.extend(histogram.render())
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        lines += [
+            "# TYPE medicheck_tracemalloc_current_bytes gauge", f"medicheck_tracemalloc_current_bytes {current}",
+            "# TYPE medicheck_tracemalloc_peak_bytes gauge", f"medicheck_tracemalloc_peak_bytes {peak}",
+        ]
+    if stats:
+        lines.extend(_stat_gauges(stats))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,66 @@
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+import psycopg
+from psycopg import sql
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# channel -> handlers. A handler receives the NOTIFY payload, or None right after
+# the listener (re)connects, meaning "events may have been missed, drop state".
+_handlers: Dict[str, List[Callable[[Optional[str]], None]]] = {}
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+def subscribe(channel: str, handler: Callable[[Optional[str]], None]):
+    """
+    Register a handler for a PostgreSQL NOTIFY channel. Subscribe at import
+    time: channels are LISTENed when the listener connects.
+    """
+    _handlers.setdefault(channel, []).append(handler)
+
+
+def _dispatch(channel: str, payload: Optional[str]):
+    for handler in _handlers.get(channel, []):
+        try:
+            handler(payload)
+        except Exception:
+            logger.exception("notify handler failed for channel %s", channel)
+
+
+def _listen_forever():
+    while not _stop.is_set():
+        try:
+            with psycopg.connect(settings.DATABASE_URL, autocommit=True) as conn:
+                for channel in list(_handlers):
+                    conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel)))
+                for channel in list(_handlers):
+                    _dispatch(channel, None)
+
+                while not _stop.is_set():
+                    for n in conn.notifies(timeout=1.0):
+                        _dispatch(n.channel, n.payload)
+        except psycopg.Error:
+            logger.warning("notify listener lost its connection; retrying", exc_info=True)
+            _stop.wait(settings.NOTIFY_RECONNECT_SECONDS)
+
+
+def start_listener():
+    global _thread
+    if not settings.NOTIFY_ENABLED or not _handlers or _thread is not None:
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_listen_forever, name="pg-notify-listener", daemon=True)
+    _thread.start()
+
+
+def stop_listener():
+    global _thread
+    if _thread is None:
+        return
+    _stop.set()
+    _thread.join(timeout=5.0)
+    _thread = None
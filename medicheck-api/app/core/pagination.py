@@ -0,0 +1,107 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from psycopg import sql
+
+from app.core.config import settings
+
+# Keyset pagination over (sort_col, id). The cursor is an opaque, URL-safe
+# encoding of the last row's sort key; pages are fetched with a row-value
+# comparison so each page is an index range scan, not an OFFSET.
+#
+# A request with neither `limit` nor `cursor` gets the whole list, as the
+# endpoints returned before pagination; clients opt in by sending `limit`.
+
+
+def encode_cursor(sort_value: datetime, row_id) -> str:
+    raw = json.dumps([sort_value.isoformat(), str(row_id)]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        datetime.fromisoformat(sort_value)
+        return sort_value, str(uuid.UUID(str(row_id)))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> list[str]:
+    """`fields=id,text` -> validated column list; None/empty -> all allowed columns."""
+    if not fields:
+        return list(allowed)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys(requested))
+
+
+async def fetch_page(
+    cur,
+    *,
+    table: str,
+    allowed: Sequence[str],
+    where: str,
+    params: tuple,
+    fields: Optional[str],
+    cursor: Optional[str],
+    limit: Optional[int],
+    sort_col: str = "created_at",
+    descending: bool = True,
+) -> dict:
+    """
+    Run one keyset page query. `where` is a trusted SQL fragment with %s
+    placeholders for `params`. Returns {"items": [...], "next_cursor": str|None}.
+    `limit=None` means every row, or PAGE_DEFAULT_LIMIT after a cursor.
+    """
+    columns = parse_fields(fields, allowed)
+    select_cols = list(dict.fromkeys(columns + [sort_col, "id"]))
+
+    query = sql.SQL("SELECT {cols} FROM {table} WHERE ").format(
+        cols=sql.SQL(", ").join(sql.Identifier(c) for c in select_cols),
+        table=sql.Identifier(table),
+    ) + sql.SQL(where)
+    args = list(params)
+
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        query += sql.SQL(" AND ({sort}, id) {cmp} (%s::timestamptz, %s::uuid)").format(
+            sort=sql.Identifier(sort_col),
+            cmp=sql.SQL("<" if descending else ">"),
+        )
+        args += [sort_value, row_id]
+
+    if limit is None and cursor:
+        limit = settings.PAGE_DEFAULT_LIMIT
+
+    direction = sql.SQL("DESC" if descending else "ASC")
+    query += sql.SQL(" ORDER BY {sort} {dir}, id {dir}").format(
+        sort=sql.Identifier(sort_col), dir=direction,
+    )
+    if limit is not None:
+        query += sql.SQL(" LIMIT %s")
+        args.append(limit + 1)
+
+    await cur.execute(query, args)
+    rows = await cur.fetchall()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[sort_col], last["id"])
+
+    extra = [c for c in select_cols if c not in columns]
+    if extra:
+        for r in rows:
+            for c in extra:
+                del r[c]
+
+    return {"items": rows, "next_cursor": next_cursor}
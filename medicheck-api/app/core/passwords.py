@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from app.core import security
+from app.core.config import settings
+
+# bcrypt runs in a small dedicated process pool so a burst of logins can use
+# at most BCRYPT_WORKERS cores and never ties up the request threadpool or
+# the event loop. At most BCRYPT_QUEUE_MAX jobs wait for a free worker; past
+# that, callers get PasswordHasherBusy (503) instead of queueing unboundedly.
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_in_flight = 0  # only touched from the event loop
+
+_stats_lock = threading.Lock()
+_stats = {
+    "submitted": 0,
+    "completed": 0,
+    "rejected": 0,
+    "rehashed": 0,
+    "max_queued": 0,
+    "wait_ms_total": 0.0,
+    "wait_ms_max": 0.0,
+    "run_ms_total": 0.0,
+}
+
+
+def _timed(fn, *args):
+    # Runs in the worker; returns when the job actually started so the
+    # caller can tell queueing time from hashing time.
+    started = time.time()
+    result = fn(*args)
+    return result, started, time.time() - started
+
+
+def start_password_pool():
+    """Create the worker processes. Call at startup, before other threads start."""
+    global _pool
+    if settings.BCRYPT_WORKERS <= 0:
+        return
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.BCRYPT_WORKERS)
+            # Workers are forked on the first submit; do it now.
+            _pool.submit(int).result()
+
+
+def shutdown_password_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+async def _run(fn, *args):
+    global _in_flight
+    workers = max(settings.BCRYPT_WORKERS, 1)
+    if _in_flight >= workers + settings.BCRYPT_QUEUE_MAX:
+        with _stats_lock:
+            _stats["rejected"] += 1
+        raise PasswordHasherBusy()
+
+    _in_flight += 1
+    queued = max(_in_flight - workers, 0)
+    with _stats_lock:
+        _stats["submitted"] += 1
+        _stats["max_queued"] = max(_stats["max_queued"], queued)
+
+    submitted = time.time()
+    try:
+        if _pool is None:
+            result, started, run_s = await asyncio.to_thread(_timed, fn, *args)
+        else:
+            loop = asyncio.get_running_loop()
+            result, started, run_s = await loop.run_in_executor(_pool, _timed, fn, *args)
+    finally:
+        _in_flight -= 1
+
+    wait_ms = max(started - submitted, 0.0) * 1000.0
+    with _stats_lock:
+        _stats["completed"] += 1
+        _stats["wait_ms_total"] += wait_ms
+        _stats["wait_ms_max"] = max(_stats["wait_ms_max"], wait_ms)
+        _stats["run_ms_total"] += run_s * 1000.0
+    return result
+
+
+async def hash_password(password: str) -> str:
+    return await _run(security.hash_password, password)
+
+
+async def verify_and_update_password(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    ok, new_hash = await _run(security.verify_and_update_password, password, hashed)
+    if new_hash:
+        with _stats_lock:
+            _stats["rehashed"] += 1
+    return ok, new_hash
+
+
+def password_pool_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    done = stats["completed"]
+    return {
+        "workers": settings.BCRYPT_WORKERS,
+        "rounds": settings.BCRYPT_ROUNDS,
+        "queue_max": settings.BCRYPT_QUEUE_MAX,
+        "in_flight": _in_flight,
+        "submitted": stats["submitted"],
+        "completed": done,
+        "rejected": stats["rejected"],
+        "rehashed": stats["rehashed"],
+        "max_queued": stats["max_queued"],
+        "wait_ms_avg": round(stats["wait_ms_total"] / done, 3) if done else 0.0,
+        "wait_ms_max": round(stats["wait_ms_max"], 3),
+        "run_ms_avg": round(stats["run_ms_total"] / done, 3) if done else 0.0,
+    }
@@ -1,4 +1,8 @@
-from fastapi import HTTPException, status
+import hmac
+
+from fastapi import Header, HTTPException, status
+from app.core.config import settings
+
 
 def require_role(user: dict, allowed: set[str]):
     if not user or user.get("role") not in allowed:
@@ -6,3 +10,14 @@ def require_role(user: dict, allowed: set[str]):
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access denied (role restriction)."
         )
+
+
+def require_ops_token(authorization: str = Header("")):
+    """Dependency for operational endpoints: the caller must present OPS_TOKEN."""
+    scheme, _, token = authorization.partition(" ")
+    expected = settings.OPS_TOKEN
+    if not expected or scheme.lower() != "bearer" or not hmac.compare_digest(token.strip(), expected):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied (operations token required)."
+        )
@@ -0,0 +1,73 @@
+import logging
+import time
+from typing import Optional
+
+import psycopg
+from psycopg.rows import dict_row
+from app.core.cache import TTLCache, MISSING
+from app.core.config import settings
+from app.core.db import get_conn
+from app.core.notify import subscribe
+
+logger = logging.getLogger(__name__)
+
+# jti -> True for every revoked access token that has not expired yet. Loaded
+# at startup, kept current by the revoked_tokens NOTIFY trigger (including
+# revocations made by other workers), and reloaded whenever the listener
+# reconnects. Entries expire with the token, so the set stays small.
+_revoked = TTLCache(maxsize=settings.REVOKED_TOKENS_MAX_ENTRIES)
+
+_LOAD_SQL = """
+    SELECT jti, extract(epoch FROM expires_at)::float8 AS exp
+    FROM revoked_tokens
+    WHERE expires_at > now()
+"""
+
+
+def is_revoked(jti: Optional[str]) -> bool:
+    return bool(jti) and _revoked.get(jti) is not MISSING
+
+
+def mark_revoked(jti: str, exp: float):
+    """Record a revocation locally; it is forgotten once the token would have expired."""
+    ttl = exp - time.time()
+    if ttl > 0:
+        _revoked.set(jti, True, ttl=ttl)
+
+
+def _load_rows(rows):
+    _revoked.clear()
+    for row in rows:
+        mark_revoked(row["jti"], row["exp"])
+
+
+async def load_revoked_tokens():
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(_LOAD_SQL)
+            _load_rows(await cur.fetchall())
+
+
+def _reload_blocking():
+    # Runs on the NOTIFY listener thread, which has no event loop.
+    with psycopg.connect(settings.DATABASE_URL, row_factory=dict_row) as conn:
+        _load_rows(conn.execute(_LOAD_SQL).fetchall())
+
+
+def _on_token_revoked(payload: Optional[str]):
+    if payload is None:
+        # (Re)connected: revocations may have been missed while we were away.
+        _reload_blocking()
+        return
+    jti, _, exp = payload.rpartition(":")
+    try:
+        mark_revoked(jti, float(exp))
+    except ValueError:
+        logger.warning("bad token revocation payload: %r", payload)
+
+
+subscribe("medicheck_tokens_revoked", _on_token_revoked)
+
+
+def revocation_stats() -> dict:
+    return _revoked.stats()
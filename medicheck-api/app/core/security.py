@@ -1,13 +1,36 @@
 import hashlib
-from datetime import datetime, timedelta
-from jose import jwt
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+import jwt
 from passlib.context import CryptContext
 
+from app.core.cache import TTLCache, MISSING
 from app.core.config import settings
+from app.core.revocation import is_revoked
+
+
 
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+)
 
+# HS256 key prepared once: PyJWT otherwise re-encodes the secret and
+# re-checks it is not a PEM/SSH key on every encode and decode.
+_ALGORITHM = "HS256"
+_SIGNING_KEY = jwt.PyJWK(
+    {"kty": "oct", "k": jwt.utils.base64url_encode(settings.JWT_SECRET.encode("utf-8")).decode("ascii")},
+    algorithm=_ALGORITHM,
+)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# sha256(token) -> verified claims. Each entry expires at the token's exp
+# (or after JWT_CACHE_TTL_SECONDS if sooner), so an expired token is never
+# served from the cache; revoked jtis are rejected even on a cache hit.
+_verified = TTLCache(maxsize=max(settings.JWT_CACHE_MAX_ENTRIES, 1))
 
 
 def _prehash(password: str) -> str:
@@ -25,16 +48,24 @@ def verify_password(password: str, hashed: str) -> bool:
     return pwd_context.verify(_prehash(password), hashed)
 
 
+def verify_and_update_password(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """(ok, new_hash): new_hash is set when the stored hash needs a newer work factor."""
+    return pwd_context.verify_and_update(_prehash(password), hashed)
+
+
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
 
-    expire = datetime.utcnow() + timedelta(
+    now = datetime.now(timezone.utc)
+    expire = now + timedelta(
         minutes=settings.JWT_EXPIRES_MINUTES
     )
 
     to_encode.update(
         {
             "exp": expire,
+            "iat": now,
+            "jti": uuid.uuid4().hex,
             "iss": settings.JWT_ISSUER,
             "aud": settings.JWT_AUDIENCE,
         }
@@ -42,16 +73,46 @@ def create_access_token(data: dict) -> str:
 
     return jwt.encode(
         to_encode,
-        settings.JWT_SECRET,
-        algorithm="HS256",
+        _SIGNING_KEY,
+        algorithm=_ALGORITHM,
     )
 
 
 def decode_access_token(token: str) -> dict:
+    """Fully verify a token (signature, exp, iss, aud) without the cache."""
     return jwt.decode(
         token,
-        settings.JWT_SECRET,
-        algorithms=["HS256"],
+        _SIGNING_KEY,
+        algorithms=[_ALGORITHM],
         audience=settings.JWT_AUDIENCE,
         issuer=settings.JWT_ISSUER,
+        options={"require": ["exp"]},
     )
+
+
+def verify_access_token(token: str) -> dict:
+    """
+    decode_access_token() behind the verified-claims cache, plus the
+    revocation check. Raises jwt.InvalidTokenError on any failure.
+    """
+    if settings.JWT_CACHE_MAX_ENTRIES <= 0:
+        claims = decode_access_token(token)
+    else:
+        key = hashlib.sha256(token.encode("utf-8")).digest()
+        claims = _verified.get(key)
+        if claims is MISSING:
+            claims = decode_access_token(token)
+            ttl = claims["exp"] - time.time()
+            if settings.JWT_CACHE_TTL_SECONDS > 0:
+                ttl = min(ttl, settings.JWT_CACHE_TTL_SECONDS)
+            if ttl > 0:
+                _verified.set(key, claims, ttl=ttl)
+
+    if is_revoked(claims.get("jti")):
+        raise jwt.InvalidTokenError("Token has been revoked")
+    # Callers may mutate the dict; never hand out the cached one.
+    return dict(claims)
+
+
+def token_cache_stats() -> dict:
+    return _verified.stats()
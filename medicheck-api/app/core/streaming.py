@@ -0,0 +1,78 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator
+from uuid import UUID
+
+from app.core.config import settings
+
+# Helpers for streaming large result sets: rows are pulled through a
+# server-side (named) cursor ITERSIZE at a time and serialized as they
+# arrive, so memory per request stays bounded regardless of row count.
+
+
+def _json_default(o: Any):
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if isinstance(o, UUID):
+        return str(o)
+    if isinstance(o, Decimal):
+        return float(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> str:
+    return json.dumps(obj, default=_json_default, separators=(",", ":"))
+
+
+async def iter_rows(conn, query: str, params: tuple, name: str = "stream") -> AsyncIterator[dict]:
+    """Iterate a query through a server-side cursor (needs a non-autocommit connection)."""
+    async with conn.cursor(name=name) as cur:
+        cur.itersize = settings.STREAM_ITERSIZE
+        await cur.execute(query, params)
+        async for row in cur:
+            yield row
+
+
+async def coalesce(pieces: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    """
+    Join small string pieces into ~STREAM_CHUNK_BYTES chunks. The first piece
+    is sent on its own so clients get the first byte as early as possible.
+    """
+    limit = settings.STREAM_CHUNK_BYTES
+    buf: list[str] = []
+    size = 0
+    first = True
+    async for piece in pieces:
+        if first:
+            yield piece.encode("utf-8")
+            first = False
+            continue
+        buf.append(piece)
+        size += len(piece)
+        if size >= limit:
+            yield "".join(buf).encode("utf-8")
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf).encode("utf-8")
+
+
+async def json_array(prefix: str, rows: AsyncIterator[dict], suffix: str) -> AsyncIterator[str]:
+    """prefix + "[" + rows joined by "," + "]" + suffix, one row at a time."""
+    yield prefix + "["
+    sep = ""
+    async for row in rows:
+        yield sep + dumps(row)
+        sep = ","
+    yield "]" + suffix
+
+
+def sse(data: Any, event: str = "message", id: Any = None) -> str:
+    """One Server-Sent Events frame; `data` is sent as compact JSON."""
+    head = f"id: {id}\n" if id is not None else ""
+    return f"{head}event: {event}\ndata: {dumps(data)}\n\n"
+
+
+async def ndjson(rows: AsyncIterator[Any]) -> AsyncIterator[str]:
+    async for row in rows:
+        yield dumps(row) + "\n"
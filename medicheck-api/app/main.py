@@ -1,6 +1,39 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from psycopg_pool import PoolTimeout
 from app.core.config import settings
+from app.core.db import open_pool, close_pool, pool_stats
+from app.core.notify import start_listener, stop_listener
+from app.core.metrics import MetricsMiddleware, start_metrics, stop_metrics, render_metrics
+from app.core.audit import start_audit_writer, stop_audit_writer, audit_stats
+from app.core.passwords import (
+    PasswordHasherBusy,
+    start_password_pool,
+    shutdown_password_pool,
+    password_pool_stats,
+)
+from app.core.rbac import require_ops_token
+from app.core.revocation import load_revoked_tokens, revocation_stats
+from app.core.security import token_cache_stats
+from app.services.rules_engine import (
+    shutdown_batch_pool,
+    rules_result_cache_stats,
+    start_rules_optimizer,
+    stop_rules_optimizer,
+    rules_optimizer_stats,
+)
+from app.services.consent_check import consent_cache_stats
+from app.services.identity import warm_identity_cache, identity_cache_stats
+from app.services.symptom_vocab import load_symptom_vocabulary, symptom_vocab_stats
+from app.services.message_hub import start_message_hub, stop_message_hub, message_hub_stats
+from app.services.reminder_dispatch import (
+    start_reminder_dispatcher,
+    stop_reminder_dispatcher,
+    reminder_dispatch_stats,
+)
 
 from app.routes.session import router as session_router
 from app.routes.auth import router as auth_router
@@ -13,7 +46,36 @@ from app.routes.doctor_notes import router as doctor_notes_router
 from app.routes.messages import router as messages_router
 from app.routes.rules import router as rules_router
 
-app = FastAPI(title=settings.APP_NAME)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fork the hashing processes before any background threads exist.
+    start_password_pool()
+    start_metrics()
+    await open_pool()
+    await warm_identity_cache()
+    await load_symptom_vocabulary()
+    await load_revoked_tokens()
+    start_listener()
+    start_message_hub()
+    start_audit_writer()
+    start_reminder_dispatcher()
+    start_rules_optimizer()
+    try:
+        yield
+    finally:
+        stop_message_hub()
+        await stop_rules_optimizer()
+        await stop_reminder_dispatcher()
+        shutdown_batch_pool()
+        shutdown_password_pool()
+        stop_listener()
+        await stop_audit_writer()
+        await close_pool()
+        stop_metrics()
+
+
+app = FastAPI(title=settings.APP_NAME, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,6 +85,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so latency covers CORS handling too.
+app.add_middleware(MetricsMiddleware)
 app.include_router(session_router)
 app.include_router(auth_router)
 app.include_router(consents_router)
@@ -34,6 +98,43 @@ app.include_router(doctor_notes_router)
 app.include_router(messages_router)
 app.include_router(rules_router)
 
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    return JSONResponse(status_code=503, content={"detail": "Database busy, try again."})
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many sign-in attempts in progress, try again."},
+        headers={"Retry-After": "1"},
+    )
+
 @app.get("/health")
 def health():
     return {"ok": True}
+
+@app.get("/health/stats", dependencies=[Depends(require_ops_token)])
+def health_stats():
+    return {
+        "db_pool": pool_stats(),
+        "audit": audit_stats(),
+        "consent_cache": consent_cache_stats(),
+        "identity_cache": identity_cache_stats(),
+        "symptom_vocab": symptom_vocab_stats(),
+        "rules_results": rules_result_cache_stats(),
+        "rules_optimizer": rules_optimizer_stats(),
+        "token_cache": token_cache_stats(),
+        "password_pool": password_pool_stats(),
+        "revoked_tokens": revocation_stats(),
+        "reminders": reminder_dispatch_stats(),
+        "message_push": message_hub_stats(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_ops_token)])
+def metrics():
+    """Prometheus exposition: request/DB histograms plus /health/stats as gauges."""
+    return PlainTextResponse(
+        render_metrics(health_stats()),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -0,0 +1,31 @@
+-- Rule-set version counter + change notification.
+-- Every statement touching medicheck.rules bumps the version and notifies
+-- listeners so API workers can drop their compiled rule cache.
+
+CREATE TABLE IF NOT EXISTS medicheck.rules_version (
+  id          BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),   -- single row
+  version     BIGINT NOT NULL DEFAULT 0,
+  updated_at  TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO medicheck.rules_version(id, version)
+VALUES (TRUE, 0)
+ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION medicheck.bump_rules_version() RETURNS trigger AS $$
+DECLARE
+  new_version BIGINT;
+BEGIN
+  UPDATE medicheck.rules_version
+  SET version = version + 1, updated_at = NOW()
+  RETURNING version INTO new_version;
+
+  PERFORM pg_notify('medicheck_rules_changed', new_version::text);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_rules_version ON medicheck.rules;
+CREATE TRIGGER trg_rules_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON medicheck.rules
+FOR EACH STATEMENT EXECUTE FUNCTION medicheck.bump_rules_version();
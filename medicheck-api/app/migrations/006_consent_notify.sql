@@ -0,0 +1,18 @@
+-- Notify API workers when a patient's consents change so cached
+-- doctor/patient access decisions are dropped immediately.
+
+CREATE OR REPLACE FUNCTION notify_consents_changed() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    PERFORM pg_notify('medicheck_consents_changed', OLD.patient_id::text);
+  ELSE
+    PERFORM pg_notify('medicheck_consents_changed', NEW.patient_id::text);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_consents_changed ON consents;
+CREATE TRIGGER trg_consents_changed
+AFTER INSERT OR UPDATE OR DELETE ON consents
+FOR EACH ROW EXECUTE FUNCTION notify_consents_changed();
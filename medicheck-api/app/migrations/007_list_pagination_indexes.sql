@@ -0,0 +1,18 @@
+-- Composite indexes backing keyset pagination on (sort column, id)
+-- for the list endpoints.
+
+CREATE INDEX IF NOT EXISTS idx_notes_owner_created
+  ON notes(owner_user_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_reminders_owner_created
+  ON reminders(owner_user_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_consents_patient_granted
+  ON consents(patient_id, granted_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_consents_grantee_granted
+  ON consents(grantee_type, grantee_id, granted_at DESC, id DESC)
+  WHERE status = 'GRANTED';
+
+CREATE INDEX IF NOT EXISTS idx_messages_patient_created
+  ON messages(patient_id, created_at, id);
@@ -0,0 +1,28 @@
+-- Revoked access tokens (by jti) + change notification.
+-- API workers keep the unexpired jtis in memory and reject cached claims
+-- for a token as soon as its revocation is announced.
+
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+  jti         TEXT PRIMARY KEY,
+  user_id     UUID REFERENCES users(id) ON DELETE CASCADE,
+  expires_at  TIMESTAMPTZ NOT NULL,
+  revoked_at  TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires_at
+  ON revoked_tokens(expires_at);
+
+CREATE OR REPLACE FUNCTION notify_token_revoked() RETURNS trigger AS $$
+BEGIN
+  PERFORM pg_notify(
+    'medicheck_tokens_revoked',
+    NEW.jti || ':' || floor(extract(epoch FROM NEW.expires_at))::bigint::text
+  );
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_token_revoked ON revoked_tokens;
+CREATE TRIGGER trg_token_revoked
+AFTER INSERT ON revoked_tokens
+FOR EACH ROW EXECUTE FUNCTION notify_token_revoked();
@@ -0,0 +1,24 @@
+-- Synonyms / abbreviations for medicheck.symptoms keys.
+-- API workers load these with the symptom keys at startup (symptom_vocab)
+-- and map reported symptoms and rule "has" values to canonical keys.
+
+CREATE TABLE IF NOT EXISTS medicheck.symptom_aliases (
+  alias        TEXT PRIMARY KEY,
+  symptom_key  TEXT NOT NULL REFERENCES medicheck.symptoms(key) ON DELETE CASCADE,
+  created_at   TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_symptom_aliases_symptom_key
+  ON medicheck.symptom_aliases(symptom_key);
+
+INSERT INTO medicheck.symptom_aliases(alias, symptom_key)
+VALUES
+  ('short of breath', 'shortness_of_breath'),
+  ('sob', 'shortness_of_breath'),
+  ('dyspnea', 'shortness_of_breath'),
+  ('chest tightness', 'chest_pain'),
+  ('syncope', 'fainting'),
+  ('passed out', 'fainting'),
+  ('stiff neck', 'neck_stiffness'),
+  ('painful urination', 'dysuria')
+ON CONFLICT (alias) DO NOTHING;
@@ -0,0 +1,20 @@
+-- Reminder dispatch: claim/lease bookkeeping + due-queue index.
+--
+-- SCHEDULED -> CLAIMED (leased by one API worker, claimed_by/claimed_until)
+--           -> SENT | SCHEDULED again with a later remind_at (retry) | FAILED
+-- A lease that runs out (worker died) is put back to SCHEDULED by any worker.
+
+ALTER TABLE reminders
+  ADD COLUMN IF NOT EXISTS attempts      INT NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS claimed_by    TEXT,
+  ADD COLUMN IF NOT EXISTS claimed_until TIMESTAMPTZ,
+  ADD COLUMN IF NOT EXISTS dispatched_at TIMESTAMPTZ,
+  ADD COLUMN IF NOT EXISTS last_error    TEXT;
+
+-- Only open reminders are indexed, so the index stays the size of the
+-- backlog rather than of the whole history. Serves both the due scan
+-- (status = 'SCHEDULED' AND remind_at <= ... ORDER BY remind_at) and the
+-- lease sweep (status = 'CLAIMED').
+CREATE INDEX IF NOT EXISTS idx_reminders_due
+  ON reminders(status, remind_at)
+  WHERE status IN ('SCHEDULED', 'CLAIMED');
@@ -0,0 +1,39 @@
+-- Announce new messages so every API worker can push them to connected
+-- sender/receiver sessions (GET /messages/stream). Sent on commit only.
+--
+-- NOTIFY payloads are capped at 8000 bytes: a long message_text is left out
+-- ("truncated": true) and the worker reads the row back before pushing it.
+
+CREATE OR REPLACE FUNCTION notify_message_created() RETURNS trigger AS $$
+DECLARE
+  body jsonb;
+BEGIN
+  body := jsonb_build_object(
+    'id', NEW.id,
+    'patient_id', NEW.patient_id,
+    'sender_user_id', NEW.sender_user_id,
+    'sender_role', NEW.sender_role,
+    'receiver_user_id', NEW.receiver_user_id,
+    'is_read', NEW.is_read,
+    'created_at', NEW.created_at
+  );
+  IF octet_length(NEW.message_text) <= 7000 THEN
+    body := body || jsonb_build_object('message_text', NEW.message_text);
+  ELSE
+    body := body || jsonb_build_object('truncated', true);
+  END IF;
+  PERFORM pg_notify('medicheck_messages', body::text);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_message_created ON messages;
+CREATE TRIGGER trg_message_created
+AFTER INSERT ON messages
+FOR EACH ROW EXECUTE FUNCTION notify_message_created();
+
+-- Resuming a stream reads the user's messages after the last one it saw.
+CREATE INDEX IF NOT EXISTS idx_messages_sender_created
+  ON messages(sender_user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_messages_receiver_created
+  ON messages(receiver_user_id, created_at, id);
@@ -1,46 +1,45 @@
 from fastapi import APIRouter, HTTPException, status
 from app.schemas.auth import RegisterRequest, LoginRequest, AuthResponse
+from app.core.auth_dependency import get_current_user
 from app.core.db import get_conn
-from app.core.security import (
-    hash_password,
-    verify_password,
-    create_access_token,
-)
+from app.core.revocation import mark_revoked
+from app.core.passwords import hash_password, verify_and_update_password
+from app.core.security import create_access_token
+from app.services.identity import identity_claims
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
 
 @router.post("/register", response_model=AuthResponse)
-def register(payload: RegisterRequest):
+async def register(payload: RegisterRequest):
     email = payload.email.lower().strip()
     password = payload.password
     role = payload.role
 
-    with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT id FROM users WHERE email = %s",
-            (email,)
-        )
-        if cur.fetchone():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="User already exists",
-            )
+    # bcrypt runs in the dedicated hashing pool (503 when saturated), before
+    # a DB connection is taken so a login/register burst can't drain the pool.
+    pw_hash = await hash_password(password)
 
-        pw_hash = hash_password(password)
-
-        # Create user
-        cur.execute(
+    async with get_conn() as conn:
+        cur = conn.cursor()
+        await cur.execute(
             """
             INSERT INTO users (email, password_hash, role)
             VALUES (%s, %s, %s)
+            ON CONFLICT (email) DO NOTHING
             RETURNING id
             """,
             (email, pw_hash, role),
         )
-        user_id = cur.fetchone()["id"]
-        conn.commit()
+        row = await cur.fetchone()
+        await conn.commit()
+
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User already exists",
+        )
+    user_id = row["id"]
 
     token = create_access_token(
         data={
@@ -57,13 +56,13 @@ def register(payload: RegisterRequest):
 
 
 @router.post("/login", response_model=AuthResponse)
-def login(payload: LoginRequest):
+async def login(payload: LoginRequest):
     email = payload.email.lower().strip()
     password = payload.password
 
-    with get_conn() as conn:
+    async with get_conn() as conn:
         cur = conn.cursor()
-        cur.execute(
+        await cur.execute(
             """
             SELECT id, password_hash, role
             FROM users
@@ -71,24 +70,37 @@ def login(payload: LoginRequest):
             """,
             (email,),
         )
-        user = cur.fetchone()
+        user = await cur.fetchone()
 
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid credentials",
-            )
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid credentials",
+        )
 
-        if not verify_password(password, user["password_hash"]):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid credentials",
+    # Verified with no connection held (see register).
+    ok, new_hash = await verify_and_update_password(password, user["password_hash"])
+    if not ok:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid credentials",
+        )
+
+    if new_hash:
+        # Stored hash predates the current BCRYPT_ROUNDS; upgrade it now
+        # that we have the plaintext. Skipped if it changed meanwhile.
+        async with get_conn() as conn:
+            await conn.execute(
+                "UPDATE users SET password_hash = %s WHERE id = %s AND password_hash = %s",
+                (new_hash, user["id"], user["password_hash"]),
             )
+            await conn.commit()
 
     token = create_access_token(
         data={
             "sub": str(user["id"]),
             "role": user["role"],
+            **(await identity_claims(str(user["id"]))),
         }
     )
 
@@ -97,3 +109,28 @@ def login(payload: LoginRequest):
         token_type="bearer",
         role=user["role"],
     )
+
+
+@router.post("/logout")
+async def logout(authorization: str = ""):
+    user = get_current_user(authorization)
+    jti = user.get("jti")
+    if not jti:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Token cannot be revoked",
+        )
+
+    async with get_conn() as conn:
+        await conn.execute(
+            """
+            INSERT INTO revoked_tokens (jti, user_id, expires_at)
+            VALUES (%s, %s, to_timestamp(%s))
+            ON CONFLICT (jti) DO NOTHING
+            """,
+            (jti, user.get("sub"), user["exp"]),
+        )
+    # Other workers learn about it from the revoked_tokens NOTIFY trigger.
+    mark_revoked(jti, user["exp"])
+
+    return {"ok": True}
@@ -1,47 +1,47 @@
-from fastapi import APIRouter, Request
+from typing import Optional
+
+from fastapi import APIRouter, BackgroundTasks, Query, Request
 from app.core.auth_dependency import get_current_user
+from app.core.config import settings
 from app.core.rbac import require_role
-from app.core.db import get_conn
+from app.core.db import get_conn, UnitOfWork
 from app.core.audit import write_audit_event
-from app.schemas.consent import ConsentGrantIn, ConsentRevokeIn
+from app.core.pagination import fetch_page
+from app.schemas.consent import ConsentGrantIn, ConsentRevokeIn, CONSENT_FIELDS
+from app.schemas.page import Page
+from app.services.consent_check import invalidate_consent
+from app.services.identity import patient_id_for, doctor_id_for, institution_id_for
 
 router = APIRouter(prefix="/consents", tags=["consents"])
 
-def _get_patient_id_for_user(user_id: str) -> str:
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT id FROM patients WHERE user_id=%s", (user_id,))
-            row = cur.fetchone()
-            return str(row["id"]) if row else ""
-
-@router.get("")
-def list_consents(request: Request, authorization: str = ""):
+@router.get("", response_model=Page)
+async def list_consents(
+    request: Request,
+    authorization: str = "",
+    limit: Optional[int] = Query(None, ge=1, le=settings.PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
     user = get_current_user(authorization)
 
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            if user["role"] == "PATIENT":
-                patient_id = _get_patient_id_for_user(user["user_id"])
-                cur.execute("SELECT * FROM consents WHERE patient_id=%s ORDER BY granted_at DESC", (patient_id,))
-            elif user["role"] == "DOCTOR":
-                cur.execute("SELECT id FROM doctors WHERE user_id=%s", (user["user_id"],))
-                d = cur.fetchone()
-                doctor_id = str(d["id"]) if d else ""
-                cur.execute(
-                    "SELECT * FROM consents WHERE grantee_type='DOCTOR' AND grantee_id=%s AND status='GRANTED'",
-                    (doctor_id,)
-                )
-            else:
-                cur.execute("SELECT id FROM institutions WHERE user_id=%s", (user["user_id"],))
-                i = cur.fetchone()
-                inst_id = str(i["id"]) if i else ""
-                cur.execute(
-                    "SELECT * FROM consents WHERE grantee_type='INSTITUTION' AND grantee_id=%s AND status='GRANTED'",
-                    (inst_id,)
-                )
-            rows = cur.fetchall()
+    if user["role"] == "PATIENT":
+        where, params = "patient_id=%s", (await patient_id_for(user),)
+    elif user["role"] == "DOCTOR":
+        where = "grantee_type='DOCTOR' AND grantee_id=%s AND status='GRANTED'"
+        params = (await doctor_id_for(user),)
+    else:
+        where = "grantee_type='INSTITUTION' AND grantee_id=%s AND status='GRANTED'"
+        params = (await institution_id_for(user),)
+
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            page = await fetch_page(
+                cur, table="consents", allowed=CONSENT_FIELDS,
+                where=where, params=params, sort_col="granted_at",
+                fields=fields, cursor=cursor, limit=limit,
+            )
 
-    write_audit_event(
+    await write_audit_event(
         actor_user_id=user["user_id"],
         actor_role=user["role"],
         action="CONSENT_LIST",
@@ -49,29 +49,33 @@ def list_consents(request: Request, authorization: str = ""):
         ip=request.client.host if request.client else None,
         user_agent=request.headers.get("user-agent"),
     )
-    return {"items": rows}
+    return page
 
 @router.post("/grant")
-def grant_consent(payload: ConsentGrantIn, request: Request, authorization: str = ""):
+async def grant_consent(
+    payload: ConsentGrantIn,
+    request: Request,
+    conn: UnitOfWork,
+    background: BackgroundTasks,
+    authorization: str = "",
+):
     user = get_current_user(authorization)
     require_role(user, {"PATIENT"})
 
-    patient_id = _get_patient_id_for_user(user["user_id"])
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO consents(patient_id, grantee_type, grantee_id, scope_json, status)
-                VALUES (%s, %s, %s, %s::jsonb, 'GRANTED')
-                RETURNING id
-                """,
-                (patient_id, payload.grantee_type, payload.grantee_id, payload.scope_json)
-            )
-            row = cur.fetchone()
-            consent_id = str(row["id"])
-        conn.commit()
+    patient_id = await patient_id_for(user, conn)
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            INSERT INTO consents(patient_id, grantee_type, grantee_id, scope_json, status)
+            VALUES (%s, %s, %s, %s::jsonb, 'GRANTED')
+            RETURNING id
+            """,
+            (patient_id, payload.grantee_type, payload.grantee_id, payload.scope_json)
+        )
+        row = await cur.fetchone()
+        consent_id = str(row["id"])
 
-    write_audit_event(
+    await write_audit_event(
         actor_user_id=user["user_id"],
         actor_role=user["role"],
         action="CONSENT_GRANTED",
@@ -80,35 +84,45 @@ def grant_consent(payload: ConsentGrantIn, request: Request, authorization: str
         metadata_json={"grantee_type": payload.grantee_type, "grantee_id": payload.grantee_id},
         ip=request.client.host if request.client else None,
         user_agent=request.headers.get("user-agent"),
+        conn=conn,
     )
+    # Background tasks run after the unit of work has committed, so a check
+    # racing this request can't re-cache the old decision. Other workers are
+    # invalidated by the consents NOTIFY.
+    background.add_task(invalidate_consent, patient_id)
     return {"ok": True, "consent_id": consent_id}
 
 @router.post("/revoke")
-def revoke_consent(payload: ConsentRevokeIn, request: Request, authorization: str = ""):
+async def revoke_consent(
+    payload: ConsentRevokeIn,
+    request: Request,
+    conn: UnitOfWork,
+    background: BackgroundTasks,
+    authorization: str = "",
+):
     user = get_current_user(authorization)
     require_role(user, {"PATIENT"})
 
-    patient_id = _get_patient_id_for_user(user["user_id"])
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                UPDATE consents
-                SET status='REVOKED', revoked_at=now()
-                WHERE id=%s AND patient_id=%s
-                """,
-                (payload.consent_id, patient_id)
-            )
-        conn.commit()
-
-    write_audit_event(
-        actor_user_id=user["user_id"],
-        actor_role=user["role"],
-        action="CONSENT_REVOKED",
-        target_type="CONSENT",
-        target_id=payload.consent_id,
-        metadata_json={},
-        ip=request.client.host if request.client else None,
-        user_agent=request.headers.get("user-agent"),
-    )
+    patient_id = await patient_id_for(user, conn)
+    async with conn.pipeline():
+        await conn.execute(
+            """
+            UPDATE consents
+            SET status='REVOKED', revoked_at=now()
+            WHERE id=%s AND patient_id=%s
+            """,
+            (payload.consent_id, patient_id)
+        )
+        await write_audit_event(
+            actor_user_id=user["user_id"],
+            actor_role=user["role"],
+            action="CONSENT_REVOKED",
+            target_type="CONSENT",
+            target_id=payload.consent_id,
+            metadata_json={},
+            ip=request.client.host if request.client else None,
+            user_agent=request.headers.get("user-agent"),
+            conn=conn,
+        )
+    background.add_task(invalidate_consent, patient_id)  # after commit, as in grant_consent
     return {"ok": True}
@@ -1,46 +1,71 @@
-from fastapi import APIRouter, Request, HTTPException
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Literal, Optional
+
+from fastapi import APIRouter, BackgroundTasks, Header, Query, Request, HTTPException
+from fastapi.responses import StreamingResponse
 from app.core.auth_dependency import get_current_user
-from app.core.db import get_conn
+from app.core.config import settings
+from app.core.db import get_conn, UnitOfWork
 from app.core.audit import write_audit_event
-from app.schemas.message import MessageCreate
+from app.core.pagination import fetch_page, decode_cursor
+from app.core.revocation import is_revoked
+from app.core.streaming import coalesce, iter_rows, json_array, ndjson, sse
+from app.schemas.message import MessageCreate, MESSAGE_FIELDS
+from app.schemas.page import MessagePage
 from app.services.consent_check import doctor_has_consent
+from app.services.message_hub import (
+    CLOSED,
+    RESYNC,
+    hub_stopping,
+    open_subscription,
+    close_subscription,
+    publish_message,
+)
 
 router = APIRouter(prefix="/messages", tags=["messages"])
 
 @router.post("")
-def send_message(payload: MessageCreate, request: Request, authorization: str = ""):
+async def send_message(
+    payload: MessageCreate,
+    request: Request,
+    conn: UnitOfWork,
+    background: BackgroundTasks,
+    authorization: str = "",
+):
     user = get_current_user(authorization)
 
     if user["role"] not in {"PATIENT", "DOCTOR"}:
         raise HTTPException(status_code=403, detail="Messaging not permitted.")
 
     if user["role"] == "DOCTOR":
-        if not doctor_has_consent(user["user_id"], payload.patient_id):
+        if not await doctor_has_consent(user["user_id"], payload.patient_id, conn):
             raise HTTPException(status_code=403, detail="No patient consent.")
 
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO messages(
-                  patient_id, sender_user_id, sender_role,
-                  receiver_user_id, message_text
-                )
-                VALUES (%s, %s, %s, %s, %s)
-                RETURNING id
-                """,
-                (
-                    payload.patient_id,
-                    user["user_id"],
-                    user["role"],
-                    payload.receiver_user_id,
-                    payload.message_text,
-                )
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            INSERT INTO messages(
+              patient_id, sender_user_id, sender_role,
+              receiver_user_id, message_text
+            )
+            VALUES (%s, %s, %s, %s, %s)
+            RETURNING *
+            """,
+            (
+                payload.patient_id,
+                user["user_id"],
+                user["role"],
+                payload.receiver_user_id,
+                payload.message_text,
             )
-            row = cur.fetchone()
-        conn.commit()
+        )
+        row = await cur.fetchone()
 
-    write_audit_event(
+    await write_audit_event(
         actor_user_id=user["user_id"],
         actor_role=user["role"],
         action="MESSAGE_SENT",
@@ -49,33 +74,89 @@ def send_message(payload: MessageCreate, request: Request, authorization: str =
         metadata_json={"receiver": payload.receiver_user_id},
         ip=request.client.host if request.client else None,
         user_agent=request.headers.get("user-agent"),
+        conn=conn,
     )
 
+    # Background tasks run after the unit of work has committed.
+    background.add_task(_publish_local, row)
     return {"ok": True, "message_id": row["id"]}
 
 
-@router.get("/patient/{patient_id}")
-def get_conversation(patient_id: str, request: Request, authorization: str = ""):
+async def _publish_local(row: dict):
+    # Push to this worker's open streams now; other workers get the NOTIFY.
+    publish_message(row)
+
+
+async def _stream_thread(patient_id: str, user_id: str, after, fmt: str):
+    query = """
+        SELECT * FROM messages
+        WHERE patient_id=%s
+          AND (sender_user_id=%s OR receiver_user_id=%s)
+    """
+    params: tuple = (patient_id, user_id, user_id)
+    if after:
+        query += " AND (created_at, id) > (%s::timestamptz, %s::uuid)"
+        params += after
+    query += " ORDER BY created_at ASC, id ASC"
+
+    async with get_conn() as conn:
+        rows = iter_rows(conn, query, params, name="message_thread_stream")
+        pieces = ndjson(rows) if fmt == "ndjson" else json_array('{"messages":', rows, "}")
+        async for piece in pieces:
+            yield piece
+
+
+@router.get("/patient/{patient_id}", response_model=MessagePage)
+async def get_conversation(
+    patient_id: str,
+    request: Request,
+    authorization: str = "",
+    limit: Optional[int] = Query(None, ge=1, le=settings.PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    stream: bool = False,
+    format: Literal["json", "ndjson"] = "json",
+):
+    """
+    Oldest first; the whole thread unless `limit` or `cursor` is given,
+    then follow next_cursor for newer messages. stream=true sends the
+    whole thread after `cursor` incrementally (JSON or NDJSON) instead of
+    one page.
+    """
     user = get_current_user(authorization)
 
     if user["role"] == "DOCTOR":
-        if not doctor_has_consent(user["user_id"], patient_id):
+        if not await doctor_has_consent(user["user_id"], patient_id):
             raise HTTPException(status_code=403, detail="No patient consent.")
 
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT * FROM messages
-                WHERE patient_id=%s
-                  AND (sender_user_id=%s OR receiver_user_id=%s)
-                ORDER BY created_at ASC
-                """,
-                (patient_id, user["user_id"], user["user_id"])
+    if stream:
+        after = decode_cursor(cursor) if cursor else None
+        await write_audit_event(
+            actor_user_id=user["user_id"],
+            actor_role=user["role"],
+            action="MESSAGE_THREAD_VIEWED",
+            target_type="PATIENT",
+            target_id=patient_id,
+            metadata_json={"stream": format},
+            ip=request.client.host if request.client else None,
+            user_agent=request.headers.get("user-agent"),
+        )
+        media_type = "application/x-ndjson" if format == "ndjson" else "application/json"
+        return StreamingResponse(
+            coalesce(_stream_thread(patient_id, user["user_id"], after, format)),
+            media_type=media_type,
+        )
+
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            page = await fetch_page(
+                cur, table="messages", allowed=MESSAGE_FIELDS,
+                where="patient_id=%s AND (sender_user_id=%s OR receiver_user_id=%s)",
+                params=(patient_id, user["user_id"], user["user_id"]),
+                fields=fields, cursor=cursor, limit=limit, descending=False,
             )
-            rows = cur.fetchall()
 
-    write_audit_event(
+    await write_audit_event(
         actor_user_id=user["user_id"],
         actor_role=user["role"],
         action="MESSAGE_THREAD_VIEWED",
@@ -85,4 +166,210 @@ def get_conversation(patient_id: str, request: Request, authorization: str = "")
         user_agent=request.headers.get("user-agent"),
     )
 
-    return {"messages": rows}
+    return {"messages": page["items"], "next_cursor": page["next_cursor"]}
+
+
+# -----------------------------
+# Push (Server-Sent Events)
+
+_RESYNC_SLACK = timedelta(seconds=5)  # created_at is the transaction start, commits land out of order
+_SENT_IDS_MAX = 1024
+_ZERO_ID = uuid.UUID(int=0)
+
+
+def _uuid_or_400(value: str, what: str) -> str:
+    try:
+        return str(uuid.UUID(value))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {what}.")
+
+
+async def _message_position(message_id: str, user_id: str):
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT created_at, id FROM messages
+                WHERE id=%s AND (sender_user_id=%s OR receiver_user_id=%s)
+                """,
+                (message_id, user_id, user_id),
+            )
+            row = await cur.fetchone()
+    return (row["created_at"], row["id"]) if row else None
+
+
+async def _messages_after(user_id: str, patient_id: Optional[str], position):
+    """The user's messages after (created_at, id), oldest first, a page per query."""
+    page = max(1, settings.MESSAGE_STREAM_BACKFILL_PAGE)
+    while True:
+        query = """
+            SELECT * FROM messages
+            WHERE (sender_user_id=%s OR receiver_user_id=%s)
+              AND (created_at, id) > (%s::timestamptz, %s::uuid)
+        """
+        params: tuple = (user_id, user_id, position[0], position[1])
+        if patient_id:
+            query += " AND patient_id=%s"
+            params += (patient_id,)
+        query += " ORDER BY created_at ASC, id ASC LIMIT %s"
+        params += (page,)
+
+        async with get_conn() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(query, params)
+                rows = await cur.fetchall()
+        for row in rows:
+            yield row
+        if len(rows) < page:
+            return
+        position = (rows[-1]["created_at"], rows[-1]["id"])
+
+
+async def _load_message(message_id) -> Optional[dict]:
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT * FROM messages WHERE id=%s", (message_id,))
+            return await cur.fetchone()
+
+
+async def _push_stream(user: dict, patient_id: Optional[str], position):
+    user_id = user["user_id"]
+    deadline = time.monotonic() + settings.MESSAGE_STREAM_MAX_SECONDS
+    if user.get("exp"):
+        deadline = min(deadline, time.monotonic() + float(user["exp"]) - time.time())
+    sent: "OrderedDict[str, None]" = OrderedDict()
+    latest = position[0] if position else datetime.now(timezone.utc)
+
+    async def frame(message: dict):
+        """(SSE frame or None, reason to end the stream or None)"""
+        nonlocal latest
+        mid = str(message["id"])
+        if mid in sent:
+            return None, None
+        if patient_id and str(message["patient_id"]) != patient_id:
+            return None, None
+        if user["role"] == "DOCTOR" and not await doctor_has_consent(user_id, str(message["patient_id"])):
+            # One thread: consent was withdrawn. All threads: skip that patient.
+            return None, ("consent_revoked" if patient_id else None)
+        if message.get("truncated"):
+            message = await _load_message(mid)
+            if message is None:
+                return None, None
+
+        sent[mid] = None
+        if len(sent) > _SENT_IDS_MAX:
+            sent.popitem(last=False)
+        if message["created_at"] > latest:
+            latest = message["created_at"]
+        return sse({k: message[k] for k in MESSAGE_FIELDS if k in message}, id=mid), None
+
+    async def catch_up(since):
+        async for row in _messages_after(user_id, patient_id, since):
+            if hub_stopping():
+                yield None, "reconnect"
+                return
+            yield await frame(row)
+
+    sub = open_subscription(user_id)
+    try:
+        yield "retry: 2000\n\n"
+        if position is not None:
+            # Back off like the lag path: a message whose transaction started
+            # before the client's last event may have committed after it.
+            sent[str(position[1])] = None
+            async for piece, reason in catch_up((position[0] - _RESYNC_SLACK, _ZERO_ID)):
+                if reason:
+                    yield sse({"reason": reason}, event="close")
+                    return
+                if piece:
+                    yield piece
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or hub_stopping():
+                yield sse({"reason": "reconnect"}, event="close")
+                return
+            try:
+                item = await asyncio.wait_for(
+                    sub.queue.get(), timeout=min(settings.MESSAGE_STREAM_HEARTBEAT_SECONDS, remaining)
+                )
+            except asyncio.TimeoutError:
+                if is_revoked(user.get("jti")):
+                    yield sse({"reason": "token_revoked"}, event="close")
+                    return
+                yield ": keepalive\n\n"
+                continue
+
+            if item is CLOSED:
+                yield sse({"reason": "reconnect"}, event="close")
+                return
+            if sub.lagged:
+                sub.lagged = False
+                async for piece, reason in catch_up((latest - _RESYNC_SLACK, _ZERO_ID)):
+                    if reason:
+                        yield sse({"reason": reason}, event="close")
+                        return
+                    if piece:
+                        yield piece
+            if item is RESYNC:
+                continue
+
+            piece, reason = await frame(item)
+            if reason:
+                yield sse({"reason": reason}, event="close")
+                return
+            if piece:
+                yield piece
+    finally:
+        close_subscription(sub)
+
+
+@router.get("/stream")
+async def stream_messages(
+    request: Request,
+    authorization: str = "",
+    patient_id: Optional[str] = None,
+    after: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Server-Sent Events push of messages the caller sends or receives, in
+    every thread or only `patient_id`'s: `event: message` frames whose `id:`
+    is the message id. A reconnect resumes after the Last-Event-ID header
+    (sent by EventSource) or ?after=<message id>; messages from the few
+    seconds before it may be sent again, so dedupe by id. The stream ends
+    with an `event: close` frame (reconnect, consent_revoked, token_revoked).
+    """
+    user = get_current_user(authorization)
+
+    if user["role"] not in {"PATIENT", "DOCTOR"}:
+        raise HTTPException(status_code=403, detail="Messaging not permitted.")
+
+    if patient_id:
+        patient_id = _uuid_or_400(patient_id, "patient id")
+        if user["role"] == "DOCTOR" and not await doctor_has_consent(user["user_id"], patient_id):
+            raise HTTPException(status_code=403, detail="No patient consent.")
+
+    resume_from = last_event_id or after
+    position = None
+    if resume_from:
+        position = await _message_position(_uuid_or_400(resume_from, "message id"), user["user_id"])
+        if position is None:
+            raise HTTPException(status_code=404, detail="Unknown message id.")
+
+    await write_audit_event(
+        actor_user_id=user["user_id"],
+        actor_role=user["role"],
+        action="MESSAGE_STREAM_OPENED",
+        target_type="PATIENT" if patient_id else None,
+        target_id=patient_id,
+        metadata_json={"resumed": bool(position)},
+        ip=request.client.host if request.client else None,
+        user_agent=request.headers.get("user-agent"),
+    )
+
+    return StreamingResponse(
+        _push_stream(user, patient_id, position),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
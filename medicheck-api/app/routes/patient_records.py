@@ -1,29 +1,82 @@
+from typing import Literal
+
 from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import StreamingResponse
 from app.core.auth_dependency import get_current_user
 from app.core.db import get_conn
 from app.core.audit import write_audit_event
+from app.core.streaming import coalesce, dumps, iter_rows, json_array
 from app.schemas.patient_records import MedicalHistoryUpdate, MedicationsUpdate
 from app.services.consent_check import can_access_patient
 
 router = APIRouter(prefix="/patients", tags=["patient-records"])
 
+_TEST_RESULTS_SQL = "SELECT * FROM test_results WHERE patient_id=%s ORDER BY collected_at DESC"
+
+
+async def _stream_records(patient_id: str, fmt: str):
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT items_json FROM medical_history WHERE patient_id=%s", (patient_id,))
+            history = await cur.fetchone()
+            await cur.execute("SELECT meds_json FROM medications WHERE patient_id=%s", (patient_id,))
+            meds = await cur.fetchone()
+        history = history["items_json"] if history else []
+        meds = meds["meds_json"] if meds else []
+        tests = iter_rows(conn, _TEST_RESULTS_SQL, (patient_id,), name="test_results_stream")
+
+        if fmt == "ndjson":
+            yield dumps({"type": "medical_history", "data": history}) + "\n"
+            yield dumps({"type": "medications", "data": meds}) + "\n"
+            async for row in tests:
+                yield dumps({"type": "test_result", "data": row}) + "\n"
+        else:
+            prefix = '{"medical_history":' + dumps(history) + ',"medications":' + dumps(meds) + ',"test_results":'
+            async for piece in json_array(prefix, tests, "}"):
+                yield piece
+
+
 @router.get("/{patient_id}/records")
-def get_records(patient_id: str, request: Request, authorization: str = ""):
+async def get_records(
+    patient_id: str,
+    request: Request,
+    authorization: str = "",
+    stream: bool = False,
+    format: Literal["json", "ndjson"] = "json",
+):
+    """
+    stream=true sends the same document incrementally (or NDJSON with
+    format=ndjson), reading test results through a server-side cursor.
+    """
     user = get_current_user(authorization)
 
-    if not can_access_patient(user, patient_id):
+    if not await can_access_patient(user, patient_id):
         raise HTTPException(status_code=403, detail="Access denied.")
 
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT items_json FROM medical_history WHERE patient_id=%s", (patient_id,))
-            history = cur.fetchone()
-            cur.execute("SELECT meds_json FROM medications WHERE patient_id=%s", (patient_id,))
-            meds = cur.fetchone()
-            cur.execute("SELECT * FROM test_results WHERE patient_id=%s ORDER BY collected_at DESC", (patient_id,))
-            tests = cur.fetchall()
+    if stream:
+        await write_audit_event(
+            actor_user_id=user["user_id"],
+            actor_role=user["role"],
+            action="PATIENT_RECORDS_VIEWED",
+            target_type="PATIENT",
+            target_id=patient_id,
+            metadata_json={"stream": format},
+            ip=request.client.host if request.client else None,
+            user_agent=request.headers.get("user-agent"),
+        )
+        media_type = "application/x-ndjson" if format == "ndjson" else "application/json"
+        return StreamingResponse(coalesce(_stream_records(patient_id, format)), media_type=media_type)
+
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT items_json FROM medical_history WHERE patient_id=%s", (patient_id,))
+            history = await cur.fetchone()
+            await cur.execute("SELECT meds_json FROM medications WHERE patient_id=%s", (patient_id,))
+            meds = await cur.fetchone()
+            await cur.execute(_TEST_RESULTS_SQL, (patient_id,))
+            tests = await cur.fetchall()
 
-    write_audit_event(
+    await write_audit_event(
         actor_user_id=user["user_id"],
         actor_role=user["role"],
         action="PATIENT_RECORDS_VIEWED",
@@ -40,14 +93,14 @@ def get_records(patient_id: str, request: Request, authorization: str = ""):
     }
 
 @router.put("/{patient_id}/medical-history")
-def update_history(patient_id: str, payload: MedicalHistoryUpdate, request: Request, authorization: str = ""):
+async def update_history(patient_id: str, payload: MedicalHistoryUpdate, request: Request, authorization: str = ""):
     user = get_current_user(authorization)
     if user["role"] != "PATIENT":
         raise HTTPException(status_code=403, detail="Only patients may update history.")
 
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
                 """
                 INSERT INTO medical_history(patient_id, items_json)
                 VALUES (%s, %s::jsonb)
@@ -56,9 +109,9 @@ def update_history(patient_id: str, payload: MedicalHistoryUpdate, request: Requ
                 """,
                 (patient_id, payload.items)
             )
-        conn.commit()
+        await conn.commit()
 
-    write_audit_event(
+    await write_audit_event(
         actor_user_id=user["user_id"],
         actor_role=user["role"],
         action="MEDICAL_HISTORY_UPDATED",
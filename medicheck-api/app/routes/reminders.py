@@ -1,20 +1,34 @@
-from fastapi import APIRouter, Request
+from typing import Optional
+
+from fastapi import APIRouter, Query, Request
 from app.core.auth_dependency import get_current_user
+from app.core.config import settings
 from app.core.db import get_conn
 from app.core.audit import write_audit_event
-from app.schemas.reminder import ReminderCreateIn
+from app.core.pagination import fetch_page
+from app.schemas.page import Page
+from app.schemas.reminder import ReminderCreateIn, REMINDER_FIELDS
 
 router = APIRouter(prefix="/reminders", tags=["reminders"])
 
-@router.get("")
-def list_reminders(request: Request, authorization: str = ""):
+@router.get("", response_model=Page)
+async def list_reminders(
+    request: Request,
+    authorization: str = "",
+    limit: Optional[int] = Query(None, ge=1, le=settings.PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
     user = get_current_user(authorization)
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT * FROM reminders WHERE owner_user_id=%s ORDER BY created_at DESC", (user["user_id"],))
-            rows = cur.fetchall()
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            page = await fetch_page(
+                cur, table="reminders", allowed=REMINDER_FIELDS,
+                where="owner_user_id=%s", params=(user["user_id"],),
+                fields=fields, cursor=cursor, limit=limit,
+            )
 
-    write_audit_event(
+    await write_audit_event(
         actor_user_id=user["user_id"],
         actor_role=user["role"],
         action="REMINDERS_LIST",
@@ -22,14 +36,14 @@ def list_reminders(request: Request, authorization: str = ""):
         ip=request.client.host if request.client else None,
         user_agent=request.headers.get("user-agent"),
     )
-    return {"items": rows}
+    return page
 
 @router.post("")
-def create_reminder(payload: ReminderCreateIn, request: Request, authorization: str = ""):
+async def create_reminder(payload: ReminderCreateIn, request: Request, authorization: str = ""):
     user = get_current_user(authorization)
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
                 """
                 INSERT INTO reminders(owner_user_id, patient_id, remind_at, type, payload_json)
                 VALUES (%s, %s, %s::timestamptz, %s, %s::jsonb)
@@ -37,11 +51,11 @@ def create_reminder(payload: ReminderCreateIn, request: Request, authorization:
                 """,
                 (user["user_id"], payload.patient_id, payload.remind_at, payload.type, payload.payload_json)
             )
-            row = cur.fetchone()
+            row = await cur.fetchone()
             reminder_id = str(row["id"])
-        conn.commit()
+        await conn.commit()
 
-    write_audit_event(
+    await write_audit_event(
         actor_user_id=user["user_id"],
         actor_role=user["role"],
         action="REMINDER_CREATED",
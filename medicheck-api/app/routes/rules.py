@@ -1,11 +1,92 @@
-from fastapi import APIRouter
-from app.schemas.rules import EvaluateRulesRequest, EvaluateRulesResponse
-from app.services.rules_engine import evaluate_rules
+import json
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
+from app.core.rbac import require_ops_token
+from app.schemas.rules import (
+    EvaluateRulesRequest,
+    EvaluateRulesResponse,
+    EvaluateRulesBatchRequest,
+    EvaluateRulesBatchResponse,
+    RulesProfileResponse,
+)
+from app.services.rules_engine import (
+    evaluate_rules,
+    evaluate_rules_batch,
+    iter_evaluate_rules,
+    reset_rules_profile,
+    rules_profile,
+)
 
 router = APIRouter(prefix="/rules", tags=["rules"])
 
 
-@router.post("/evaluate", response_model=EvaluateRulesResponse)
-def evaluate(payload: EvaluateRulesRequest):
-    result = evaluate_rules(payload.model_dump())
+def _batch_payloads(payload: EvaluateRulesBatchRequest) -> list[dict]:
+    if len(payload.items) > settings.RULES_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large (max {settings.RULES_BATCH_MAX_ITEMS} items).",
+        )
+    if any(item.explain for item in payload.items):
+        raise HTTPException(
+            status_code=400,
+            detail="explain is not supported in batches; use POST /rules/evaluate.",
+        )
+    return [item.model_dump() for item in payload.items]
+
+
+@router.post("/evaluate", response_model=EvaluateRulesResponse, response_model_exclude_unset=True)
+async def evaluate(payload: EvaluateRulesRequest):
+    """explain=true adds a clause-level trace of every candidate rule."""
+    result = await evaluate_rules(payload.model_dump())
     return result
+
+
+@router.post("/evaluate/batch", response_model=EvaluateRulesBatchResponse, response_model_exclude_unset=True)
+async def evaluate_batch(payload: EvaluateRulesBatchRequest):
+    return {"results": await evaluate_rules_batch(_batch_payloads(payload))}
+
+
+@router.post("/evaluate/batch/stream")
+async def evaluate_batch_stream(payload: EvaluateRulesBatchRequest):
+    """
+    NDJSON: one EvaluateRulesResponse per line, in request order, flushed as
+    each result is ready.
+    """
+    payloads = _batch_payloads(payload)
+
+    async def lines():
+        async for result in iter_evaluate_rules(payloads):
+            yield json.dumps(result, separators=(",", ":"), default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+_PROFILE_SORT = {
+    "time": lambda r: -r["total_ms"],
+    "avg": lambda r: -r["avg_us"],
+    "evaluations": lambda r: -r["evaluations"],
+    "match_rate": lambda r: r["match_rate"],  # dead rules first
+}
+
+
+@router.get("/profile", response_model=RulesProfileResponse, dependencies=[Depends(require_ops_token)])
+async def get_profile(
+    sort: Literal["time", "avg", "evaluations", "match_rate"] = "time",
+    limit: int = Query(100, ge=1, le=10000),
+):
+    """
+    Per-rule and per-clause counts, match rates and time accumulated from a
+    RULES_PROFILE_SAMPLE_RATE sample of evaluations of the current rule set.
+    """
+    profile = rules_profile()
+    profile["rules"] = sorted(profile["rules"], key=_PROFILE_SORT[sort])[:limit]
+    return profile
+
+
+@router.delete("/profile", dependencies=[Depends(require_ops_token)])
+async def delete_profile():
+    reset_rules_profile()
+    return {"ok": True}
@@ -3,6 +3,9 @@ from typing import Literal, Optional
 
 GranteeType = Literal["DOCTOR", "INSTITUTION"]
 
+# Columns a client may request with ?fields=
+CONSENT_FIELDS = ("id", "patient_id", "grantee_type", "grantee_id", "scope_json", "status", "granted_at", "revoked_at")
+
 class ConsentGrantIn(BaseModel):
     grantee_type: GranteeType
     grantee_id: str
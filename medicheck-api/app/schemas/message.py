@@ -1,5 +1,11 @@
 from pydantic import BaseModel
 
+# Columns a client may request with ?fields=
+MESSAGE_FIELDS = (
+    "id", "patient_id", "sender_user_id", "sender_role",
+    "receiver_user_id", "message_text", "is_read", "created_at",
+)
+
 class MessageCreate(BaseModel):
     patient_id: str
     receiver_user_id: str
@@ -1,6 +1,9 @@
 from pydantic import BaseModel
 from typing import Optional
 
+# Columns a client may request with ?fields=
+NOTE_FIELDS = ("id", "owner_user_id", "patient_id", "text", "is_shared", "shared_with_json", "created_at")
+
 class NoteCreateIn(BaseModel):
     text: str
     patient_id: Optional[str] = None
@@ -0,0 +1,12 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+
+
+class Page(BaseModel):
+    items: List[Dict[str, Any]] = Field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
+class MessagePage(BaseModel):
+    messages: List[Dict[str, Any]] = Field(default_factory=list)
+    next_cursor: Optional[str] = None
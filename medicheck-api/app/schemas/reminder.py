@@ -1,6 +1,9 @@
 from pydantic import BaseModel
 from typing import Optional
 
+# Columns a client may request with ?fields=
+REMINDER_FIELDS = ("id", "owner_user_id", "patient_id", "remind_at", "type", "payload_json", "status", "created_at")
+
 class ReminderCreateIn(BaseModel):
     remind_at: str
     type: str
@@ -16,6 +16,14 @@ class EvaluateRulesRequest(BaseModel):
     vitals: Dict[str, Any] = Field(default_factory=dict)
     extras: Dict[str, Any] = Field(default_factory=dict)
 
+    # "compact": matched_rule_ids instead of matched_rules with full outcomes.
+    response_mode: Literal["full", "compact"] = "full"
+    # Stop at the first matching emergency rule (triage is final by then).
+    stop_on_emergency: bool = False
+    # Return a per-rule, per-clause trace with timings (never cached;
+    # single evaluations only, batches reject it).
+    explain: bool = False
+
 
 class MatchedRule(BaseModel):
     rule_id: int
@@ -27,6 +35,46 @@ class MatchedRule(BaseModel):
 
 
 class EvaluateRulesResponse(BaseModel):
+    # Routes serialize with response_model_exclude_unset, so a response holds
+    # either matched_rules (full) or matched_rule_ids (compact), not both.
     triage: Dict[str, Any] = Field(default_factory=dict)
     recommendations: List[Dict[str, Any]] = Field(default_factory=list)
     matched_rules: List[MatchedRule] = Field(default_factory=list)
+    matched_rule_ids: List[int] = Field(default_factory=list)
+    short_circuited: bool = False
+    explain: Optional[Dict[str, Any]] = None
+
+
+class EvaluateRulesBatchRequest(BaseModel):
+    items: List[EvaluateRulesRequest] = Field(default_factory=list)
+
+
+class EvaluateRulesBatchResponse(BaseModel):
+    results: List[EvaluateRulesResponse] = Field(default_factory=list)
+
+
+class ClauseProfile(BaseModel):
+    group: Literal["all", "any", "none"]
+    index: int  # position in the rule's stored group
+    evaluations: int
+    true_rate: float
+    avg_ns: int
+
+
+class RuleProfile(BaseModel):
+    rule_id: int
+    name: str
+    evaluations: int  # sampled evaluations where the rule was a candidate
+    candidate_rate: float
+    matches: int
+    match_rate: float
+    total_ms: float
+    avg_us: float
+    clauses: List[ClauseProfile] = Field(default_factory=list)
+
+
+class RulesProfileResponse(BaseModel):
+    version: Optional[int] = None
+    sample_rate: float
+    sampled_evaluations: int
+    rules: List[RuleProfile] = Field(default_factory=list)
@@ -1,61 +1,207 @@
-def evaluate_urgency(symptoms: list[dict]) -> str:
-    # Simple, explicit red-flag rules (expandable)
-    for s in symptoms:
-        name = s["symptom"].lower()
-        severity = s["severity"]
-        days = s["duration_days"]
+from bisect import bisect_right
+from typing import Any, Dict, List, NamedTuple, Sequence, Tuple
 
-        if "chest pain" in name and severity >= 7:
-            return "URGENT"
-        if "shortness of breath" in name and severity >= 7:
-            return "URGENT"
-        if "loss of consciousness" in name:
-            return "URGENT"
-        if "fever" in name and severity >= 8 and days >= 3:
-            return "PROMPT"
+from app.services.symptom_vocab import mentioned_symptoms, symptom_phrase
 
-    return "ROUTINE"
+# Symptom-session rules as data. Patterns are lower-case substrings of the
+# reported symptom names. All patterns are compiled into one Aho-Corasick
+# automaton, so a session's symptom text is scanned once and that single
+# pass yields urgency, insights and tests together.
+#
+#   urgency   checked per symptom, symptoms in order and rules in table
+#             order; the first hit decides. A rule needs its pattern inside
+#             that symptom's name plus the severity/duration thresholds.
+#   insights  every rule whose patterns ("all") occur anywhere in the joined
+#             symptom text; the default applies when none does.
+#   tests     every rule with at least one pattern ("any") in the joined text.
+#
+# Each reported name is extended with the canonical phrases of the symptoms
+# symptom_vocab finds in it, so "SOB" or "pyrexia" match the patterns for
+# "shortness of breath" and "fever".
 
+CLINICAL_RULES: Dict[str, Any] = {
+    "urgency": [
+        {"pattern": "chest pain", "min_severity": 7, "level": "URGENT"},
+        {"pattern": "shortness of breath", "min_severity": 7, "level": "URGENT"},
+        {"pattern": "loss of consciousness", "level": "URGENT"},
+        {"pattern": "fever", "min_severity": 8, "min_days": 3, "level": "PROMPT"},
+    ],
+    "default_urgency": "ROUTINE",
+    "insights": [
+        {
+            "all": ["fever", "cough"],
+            "insight": {
+                "condition": "Respiratory infection",
+                "confidence": "Low",
+                "note": "Based on symptom clustering; not diagnostic.",
+            },
+        },
+        {
+            "all": ["abdominal pain"],
+            "insight": {
+                "condition": "Gastrointestinal condition",
+                "confidence": "Low",
+                "note": "Broad category; requires further evaluation.",
+            },
+        },
+    ],
+    "default_insight": {
+        "condition": "Non-specific symptoms",
+        "confidence": "Low",
+        "note": "Insufficient specificity for targeted insight.",
+    },
+    "tests": [
+        {"any": ["fever"], "test": {"test": "Complete Blood Count (CBC)", "reason": "Assess infection or inflammation."}},
+        {"any": ["cough", "shortness of breath"], "test": {"test": "Chest X-ray", "reason": "Evaluate lung pathology."}},
+        {"any": ["abdominal pain"], "test": {"test": "Abdominal Ultrasound", "reason": "Evaluate abdominal organs."}},
+    ],
+}
 
-def condition_insights(symptoms: list[dict]) -> list[dict]:
-    insights = []
-    names = " ".join([s["symptom"].lower() for s in symptoms])
 
-    if "fever" in names and "cough" in names:
-        insights.append({
-            "condition": "Respiratory infection",
-            "confidence": "Low",
-            "note": "Based on symptom clustering; not diagnostic."
-        })
+class Analysis(NamedTuple):
+    urgency: str
+    insights: List[Dict[str, Any]]
+    tests: List[Dict[str, Any]]
 
-    if "abdominal pain" in names:
-        insights.append({
-            "condition": "Gastrointestinal condition",
-            "confidence": "Low",
-            "note": "Broad category; requires further evaluation."
-        })
 
-    if not insights:
-        insights.append({
-            "condition": "Non-specific symptoms",
-            "confidence": "Low",
-            "note": "Insufficient specificity for targeted insight."
-        })
+class _Automaton:
+    """Aho-Corasick over a fixed set of patterns; find() reports every occurrence."""
 
-    return insights
+    def __init__(self, patterns: Sequence[str]):
+        self.patterns = tuple(patterns)
+        goto: List[Dict[str, int]] = [{}]
+        out: List[Tuple[int, ...]] = [()]
+        for idx, pattern in enumerate(self.patterns):
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(())
+                state = nxt
+            out[state] = out[state] + (idx,)
 
+        # Breadth-first failure links (depth-1 states fail to the root);
+        # outputs inherit their fallback's. Failure transitions are folded
+        # into each state's table, so scanning is one dict lookup per char.
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [dict(goto[0])] + [{} for _ in goto[1:]]
+        queue = list(goto[0].values())
+        for state in queue:
+            delta[state] = {**delta[fail[state]], **goto[state]}
+            for ch, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]].get(ch, 0)
+                out[nxt] = out[nxt] + out[fail[nxt]]
+                queue.append(nxt)
 
-def recommended_tests(symptoms: list[dict]) -> list[dict]:
-    tests = []
-    names = " ".join([s["symptom"].lower() for s in symptoms])
+        self._delta = delta
+        self._out = out
+
+    def find(self, text: str) -> List[Tuple[int, int]]:
+        """(pattern index, end offset exclusive) for every match, in text order."""
+        delta, out = self._delta, self._out
+        hits: List[Tuple[int, int]] = []
+        state = 0
+        for pos, ch in enumerate(text):
+            state = delta[state].get(ch, 0)
+            if out[state]:
+                for idx in out[state]:
+                    hits.append((idx, pos + 1))
+        return hits
+
+
+class ClinicalMatcher:
+    """A CLINICAL_RULES-shaped table compiled for single-pass analysis."""
+
+    def __init__(self, table: Dict[str, Any]):
+        patterns: Dict[str, int] = {}
+
+        def pid(p: str) -> int:
+            return patterns.setdefault(p.lower(), len(patterns))
+
+        self.urgency = tuple(
+            (pid(r["pattern"]), int(r.get("min_severity", 0)), int(r.get("min_days", 0)), str(r["level"]))
+            for r in table.get("urgency", ())
+        )
+        self.default_urgency = str(table.get("default_urgency", "ROUTINE"))
+        self.insights = tuple(
+            (frozenset(pid(p) for p in r["all"]), r["insight"]) for r in table.get("insights", ())
+        )
+        self.default_insight = table.get("default_insight")
+        self.tests = tuple(
+            (frozenset(pid(p) for p in r["any"]), r["test"]) for r in table.get("tests", ())
+        )
+        self._automaton = _Automaton(list(patterns))
+        self._lengths = tuple(len(p) for p in self._automaton.patterns)
+
+    def analyze(self, symptoms: Sequence[Tuple[str, int, int]]) -> Analysis:
+        """symptoms: (name, severity, duration_days) in reported order."""
+        names = [name.lower() for name, _, _ in symptoms]
+        text = " ".join(names)
+
+        # Start offset of each symptom's name in the joined text.
+        starts = []
+        offset = 0
+        for name in names:
+            starts.append(offset)
+            offset += len(name) + 1
+
+        found = set()
+        per_symptom: List[set] = [set() for _ in names]
+        for idx, end in self._automaton.find(text):
+            found.add(idx)
+            begin = end - self._lengths[idx]
+            i = bisect_right(starts, begin) - 1
+            if end <= starts[i] + len(names[i]):
+                per_symptom[i].add(idx)
+
+        urgency = self.default_urgency
+        for (_, severity, days), hits in zip(symptoms, per_symptom):
+            if not hits:
+                continue
+            level = next(
+                (lvl for p, min_sev, min_days, lvl in self.urgency
+                 if p in hits and severity >= min_sev and days >= min_days),
+                None,
+            )
+            if level is not None:
+                urgency = level
+                break
 
-    if "fever" in names:
-        tests.append({"test": "Complete Blood Count (CBC)", "reason": "Assess infection or inflammation."})
+        insights = [dict(ins) for need, ins in self.insights if need <= found]
+        if not insights and self.default_insight is not None:
+            insights.append(dict(self.default_insight))
+        tests = [dict(test) for any_of, test in self.tests if any_of & found]
+        return Analysis(urgency, insights, tests)
 
-    if "cough" in names or "shortness of breath" in names:
-        tests.append({"test": "Chest X-ray", "reason": "Evaluate lung pathology."})
 
-    if "abdominal pain" in names:
-        tests.append({"test": "Abdominal Ultrasound", "reason": "Evaluate abdominal organs."})
+_matcher = ClinicalMatcher(CLINICAL_RULES)
 
-    return tests
+
+def _with_synonyms(name: str) -> str:
+    lowered = name.lower()
+    extra = [p for p in map(symptom_phrase, mentioned_symptoms(name)) if p not in lowered]
+    return " ".join([lowered, *extra]) if extra else lowered
+
+
+def analyze_symptoms(symptoms: Sequence[Any]) -> Analysis:
+    """Urgency, insights and tests for SymptomIn objects (or dicts) in one pass."""
+    return _matcher.analyze([
+        (_with_synonyms(s["symptom"]), s["severity"], s["duration_days"]) if isinstance(s, dict)
+        else (_with_synonyms(s.symptom), s.severity, s.duration_days)
+        for s in symptoms
+    ])
+
+
+def evaluate_urgency(symptoms: list[dict]) -> str:
+    return analyze_symptoms(symptoms).urgency
+
+
+def condition_insights(symptoms: list[dict]) -> list[dict]:
+    return analyze_symptoms(symptoms).insights
+
+
+def recommended_tests(symptoms: list[dict]) -> list[dict]:
+    return analyze_symptoms(symptoms).tests
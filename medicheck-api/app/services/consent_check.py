@@ -1,14 +1,51 @@
-from app.core.db import get_conn
-
-def doctor_has_consent(doctor_user_id: str, patient_id: str) -> bool:
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT id FROM doctors WHERE user_id=%s", (doctor_user_id,))
-            d = cur.fetchone()
-            if not d:
-                return False
-            doctor_id = str(d["id"])
-            cur.execute(
+import uuid
+from typing import Optional
+
+from app.core.cache import TTLCache, MISSING
+from app.core.config import settings
+from app.core.db import use_conn
+from app.core.notify import subscribe
+from app.services.identity import resolve_identity, patient_id_for
+
+# (doctor_user_id, patient_id) -> bool. Entries for a patient are dropped as
+# soon as one of their consents changes: locally from /consents/grant and
+# /consents/revoke, and in every worker via the consents NOTIFY trigger.
+_decisions = TTLCache(
+    maxsize=settings.CONSENT_CACHE_MAX_ENTRIES,
+    ttl=settings.CONSENT_CACHE_TTL_SECONDS,
+)
+
+
+def _canonical_id(value: str) -> Optional[str]:
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return None
+
+
+def invalidate_consent(patient_id: Optional[str] = None):
+    """Forget cached decisions for one patient, or for everyone if None."""
+    pid = _canonical_id(patient_id) if patient_id else None
+    if pid is None:
+        _decisions.clear()
+    else:
+        _decisions.discard_where(lambda key: key[1] == pid)
+
+
+subscribe("medicheck_consents_changed", invalidate_consent)
+
+
+def consent_cache_stats() -> dict:
+    return _decisions.stats()
+
+
+async def _load_doctor_consent(doctor_user_id: str, patient_id: str, conn=None) -> bool:
+    ident = await resolve_identity(doctor_user_id, conn)
+    if not ident or not ident.doctor_id:
+        return False
+    async with use_conn(conn) as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
                 """
                 SELECT 1 FROM consents
                 WHERE patient_id=%s
@@ -16,21 +53,34 @@ def doctor_has_consent(doctor_user_id: str, patient_id: str) -> bool:
                   AND grantee_id=%s
                   AND status='GRANTED'
                 """,
-                (patient_id, doctor_id)
+                (patient_id, ident.doctor_id)
             )
-            return cur.fetchone() is not None
+            return await cur.fetchone() is not None
+
+async def doctor_has_consent(doctor_user_id: str, patient_id: str, conn=None) -> bool:
+    """conn: run any lookups on the caller's (unit-of-work) connection."""
+    pid = _canonical_id(patient_id)
+    if pid is None:
+        # Not a UUID: cannot match a consent row, and must not be cached
+        # under a key that invalidation would never see.
+        return await _load_doctor_consent(doctor_user_id, patient_id, conn)
+
+    key = (str(doctor_user_id), pid)
+    decision = _decisions.get(key)
+    if decision is not MISSING:
+        return decision
 
-def can_access_patient(user: dict, patient_id: str) -> bool:
-    from app.core.db import get_conn
+    generation = _decisions.generation
+    decision = await _load_doctor_consent(doctor_user_id, pid, conn)
+    _decisions.set(key, decision, generation=generation)
+    return decision
 
+async def can_access_patient(user: dict, patient_id: str, conn=None) -> bool:
     if user["role"] == "PATIENT":
-        with get_conn() as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT id FROM patients WHERE user_id=%s", (user["user_id"],))
-                r = cur.fetchone()
-                return r and str(r["id"]) == patient_id
+        own = await patient_id_for(user, conn)
+        return bool(own) and own == _canonical_id(patient_id)
 
     if user["role"] == "DOCTOR":
-        return doctor_has_consent(user["user_id"], patient_id)
+        return await doctor_has_consent(user["user_id"], patient_id, conn)
 
     return False
@@ -0,0 +1,115 @@
+from typing import NamedTuple, Optional
+
+from app.core.cache import TTLCache, MISSING
+from app.core.config import settings
+from app.core.db import get_conn, use_conn
+
+# users.id -> role + patient/doctor/institution id. These mappings never
+# change once the entity row exists (user_id is UNIQUE on each table), so
+# resolved identities are cached without expiry. Users whose entity row is
+# not created yet are not cached.
+
+
+class Identity(NamedTuple):
+    role: str
+    patient_id: Optional[str]
+    doctor_id: Optional[str]
+    institution_id: Optional[str]
+
+
+_identities = TTLCache(maxsize=settings.IDENTITY_CACHE_MAX_ENTRIES)
+
+_IDENTITY_SQL = """
+    SELECT u.id AS user_id, u.role,
+           p.id AS patient_id, d.id AS doctor_id, i.id AS institution_id
+    FROM users u
+    LEFT JOIN patients p ON p.user_id = u.id
+    LEFT JOIN doctors d ON d.user_id = u.id
+    LEFT JOIN institutions i ON i.user_id = u.id
+"""
+
+
+def _to_identity(row: dict) -> Identity:
+    return Identity(
+        role=str(row["role"]),
+        patient_id=str(row["patient_id"]) if row["patient_id"] else None,
+        doctor_id=str(row["doctor_id"]) if row["doctor_id"] else None,
+        institution_id=str(row["institution_id"]) if row["institution_id"] else None,
+    )
+
+
+def _is_resolved(ident: Identity) -> bool:
+    return bool(ident.patient_id or ident.doctor_id or ident.institution_id)
+
+
+async def resolve_identity(user_id: str, conn=None) -> Optional[Identity]:
+    key = str(user_id)
+    ident = _identities.get(key)
+    if ident is not MISSING:
+        return ident
+
+    async with use_conn(conn) as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(_IDENTITY_SQL + " WHERE u.id = %s", (key,))
+            row = await cur.fetchone()
+    if not row:
+        return None
+
+    ident = _to_identity(row)
+    if _is_resolved(ident):
+        _identities.set(key, ident)
+    return ident
+
+
+async def warm_identity_cache(limit: Optional[int] = None):
+    """Preload identities of the most recently created users."""
+    if limit is None:
+        limit = settings.IDENTITY_CACHE_WARM_ROWS
+    if limit <= 0:
+        return
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(_IDENTITY_SQL + " ORDER BY u.created_at DESC LIMIT %s", (limit,))
+            rows = await cur.fetchall()
+    for row in rows:
+        ident = _to_identity(row)
+        if _is_resolved(ident):
+            _identities.set(str(row["user_id"]), ident)
+
+
+def identity_cache_stats() -> dict:
+    return _identities.stats()
+
+
+async def identity_claims(user_id: str) -> dict:
+    """Entity ids to embed in the access token so requests skip the lookup."""
+    ident = await resolve_identity(user_id)
+    if not ident:
+        return {}
+    claims = {
+        "patient_id": ident.patient_id,
+        "doctor_id": ident.doctor_id,
+        "institution_id": ident.institution_id,
+    }
+    return {k: v for k, v in claims.items() if v}
+
+
+async def _entity_id(user: dict, field: str, conn=None) -> str:
+    claimed = user.get(field)
+    if claimed:
+        return str(claimed)
+    ident = await resolve_identity(user["user_id"], conn)
+    value = getattr(ident, field) if ident else None
+    return value or ""
+
+
+async def patient_id_for(user: dict, conn=None) -> str:
+    return await _entity_id(user, "patient_id", conn)
+
+
+async def doctor_id_for(user: dict, conn=None) -> str:
+    return await _entity_id(user, "doctor_id", conn)
+
+
+async def institution_id_for(user: dict, conn=None) -> str:
+    return await _entity_id(user, "institution_id", conn)
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import logging
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+
+from app.core.cache import TTLCache, MISSING
+from app.core.config import settings
+from app.core.notify import subscribe
+
+logger = logging.getLogger(__name__)
+
+# In-process fan-out of new messages to open /messages/stream connections.
+#
+# Every committed INSERT INTO messages is announced on the medicheck_messages
+# channel (migration 011) and reaches every worker through the NOTIFY
+# listener. The worker that handled POST /messages also publishes the row
+# itself right after commit, so its own sessions don't wait for the round
+# trip; the NOTIFY echo of that row is then dropped as a duplicate.
+#
+# Each connection owns a bounded queue. A connection that can't keep up, or
+# any connection after the listener reconnects (notifications may have been
+# lost), is flagged `lagged` and re-reads what it missed from the database.
+#
+# Shutdown: stop_message_hub() runs first in the lifespan shutdown path. It
+# sets the stop event, which the stream generators check between frames,
+# and wakes every waiting stream with CLOSED so it ends with a reconnect
+# frame. Servers only run lifespan shutdown once open responses have
+# finished, so run them with a graceful-shutdown timeout (uvicorn
+# --timeout-graceful-shutdown, gunicorn --graceful-timeout) that cuts
+# lingering streams short; clients reconnect to another worker.
+
+RESYNC = object()  # wake-up marker: check `lagged`
+CLOSED = object()  # the hub is shutting down
+
+
+class Subscription:
+    __slots__ = ("user_id", "queue", "lagged")
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=max(1, settings.MESSAGE_PUSH_QUEUE_MAX))
+        self.lagged = False
+
+
+_subscribers: Dict[str, Set[Subscription]] = {}
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_stopping = asyncio.Event()
+
+# message id -> True for rows already fanned out (local publish + NOTIFY echo).
+_published = TTLCache(maxsize=settings.MESSAGE_PUSH_DEDUPE_ENTRIES, ttl=60.0)
+
+_stats_lock = threading.Lock()
+_stats = {
+    "published": 0,
+    "duplicates": 0,
+    "delivered": 0,
+    "dropped": 0,
+    "resyncs": 0,
+    "bad_payloads": 0,
+}
+
+
+def _bump(key: str, n: int = 1):
+    with _stats_lock:
+        _stats[key] += n
+
+
+def _user_key(value: Any) -> str:
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return str(value)
+
+
+def open_subscription(user_id: str) -> Subscription:
+    """Register a connection for `user_id`. Call on the event loop; pair with close_subscription()."""
+    sub = Subscription(_user_key(user_id))
+    _subscribers.setdefault(sub.user_id, set()).add(sub)
+    if _stopping.is_set():
+        sub.queue.put_nowait(CLOSED)
+    return sub
+
+
+def close_subscription(sub: Subscription):
+    subs = _subscribers.get(sub.user_id)
+    if subs is not None:
+        subs.discard(sub)
+        if not subs:
+            del _subscribers[sub.user_id]
+
+
+def _offer(sub: Subscription, item: Any):
+    try:
+        sub.queue.put_nowait(item)
+    except asyncio.QueueFull:
+        if item is not RESYNC and not sub.lagged:
+            _bump("dropped")
+        sub.lagged = True
+
+
+def publish_message(message: Dict[str, Any]):
+    """
+    Fan a committed message row out to the sender's and receiver's
+    connections in this process. Must run on the event loop.
+    """
+    key = _user_key(message["id"])
+    if _published.get(key) is not MISSING:
+        _bump("duplicates")
+        return
+    _published.set(key, True)
+    _bump("published")
+
+    targets = {_user_key(message["sender_user_id"]), _user_key(message["receiver_user_id"])}
+    delivered = 0
+    for user_id in targets:
+        for sub in _subscribers.get(user_id, ()):
+            _offer(sub, message)
+            delivered += 1
+    if delivered:
+        _bump("delivered", delivered)
+
+
+def _resync_all():
+    _bump("resyncs")
+    for subs in _subscribers.values():
+        for sub in subs:
+            sub.lagged = True
+            _offer(sub, RESYNC)
+
+
+def _parse_payload(payload: str) -> Optional[Dict[str, Any]]:
+    try:
+        message = json.loads(payload)
+        message["created_at"] = datetime.fromisoformat(message["created_at"])
+        return message if "id" in message else None
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def _on_message_notify(payload: Optional[str]):
+    # Runs on the NOTIFY listener thread; hand off to the event loop.
+    loop = _loop
+    if loop is None or loop.is_closed():
+        return
+    if payload is None:
+        # (Re)connected: anything sent while we were away was missed.
+        loop.call_soon_threadsafe(_resync_all)
+        return
+    message = _parse_payload(payload)
+    if message is None:
+        _bump("bad_payloads")
+        logger.warning("bad message notification payload: %.200r", payload)
+        return
+    loop.call_soon_threadsafe(publish_message, message)
+
+
+subscribe("medicheck_messages", _on_message_notify)
+
+
+def hub_stopping() -> bool:
+    """True once the hub is shutting down: open streams should end."""
+    return _stopping.is_set()
+
+
+def _close_all():
+    """End every open stream (clients reconnect to another worker)."""
+    _stopping.set()
+    for subs in list(_subscribers.values()):
+        for sub in list(subs):
+            try:
+                sub.queue.put_nowait(CLOSED)
+            except asyncio.QueueFull:
+                sub.queue.get_nowait()
+                sub.queue.put_nowait(CLOSED)
+
+
+def start_message_hub():
+    """Bind the hub to the running loop so NOTIFY deliveries can reach it."""
+    global _loop
+    _loop = asyncio.get_running_loop()
+    _stopping.clear()
+
+
+def stop_message_hub():
+    """Lifespan shutdown: end open streams and stop taking NOTIFY deliveries."""
+    global _loop
+    _loop = None
+    _close_all()
+
+
+def message_hub_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    # Called from the threadpool while the loop (un)registers connections.
+    subscribers = list(_subscribers.values())
+    stats.update({
+        "running": _loop is not None,
+        "users": len(subscribers),
+        "connections": sum(len(subs) for subs in subscribers),
+    })
+    return stats
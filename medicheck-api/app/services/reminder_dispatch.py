@@ -0,0 +1,431 @@
+import asyncio
+import heapq
+import logging
+import os
+import socket
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+from app.core.db import get_conn
+
+logger = logging.getLogger(__name__)
+
+# Reminder dispatcher, one per API worker process.
+#
+# A scheduler task claims reminders due within REMINDER_LOOKAHEAD_SECONDS in
+# batches (FOR UPDATE SKIP LOCKED over the partial (status, remind_at) index,
+# migration 010), so concurrent workers never claim the same row. Claimed
+# reminders are leased to this process until remind_at + REMINDER_LEASE_SECONDS
+# and kept in a heap ordered by remind_at; when one comes due it goes to a
+# queue served by REMINDER_WORKERS delivery tasks, which hand it to the sink.
+# Outcomes are written back in batches. A reminder whose lease ran out is not
+# delivered here (another worker may have reclaimed it), and leases of dead
+# workers are swept back to SCHEDULED. Delivery is therefore at least once:
+# a reminder fires twice whenever its outcome is not written before its lease
+# ends, either because the worker died after delivering it or because the
+# write-back could not reach the database for longer than the lease (the
+# next sweep returns it to SCHEDULED and the late write is a no-op). Sinks
+# should tolerate repeats (dedupe on Reminder.id).
+#
+# At most REMINDER_CLAIM_BATCH reminders are held per process; when the
+# delivery tasks fall behind, claiming pauses and other workers pick up the
+# backlog.
+
+
+class Reminder(NamedTuple):
+    id: str
+    owner_user_id: str
+    patient_id: Optional[str]
+    type: str
+    payload: Dict[str, Any]
+    remind_at: float  # epoch seconds
+    lease_until: float  # epoch seconds
+    attempts: int  # including this one
+
+
+class ReminderSink:
+    """Delivery target. deliver() raising marks the attempt as failed (retried later)."""
+
+    async def deliver(self, reminder: Reminder):
+        raise NotImplementedError
+
+
+class LogSink(ReminderSink):
+    async def deliver(self, reminder: Reminder):
+        logger.info("reminder %s (%s) for user %s", reminder.id, reminder.type, reminder.owner_user_id)
+
+
+class LocalSink(ReminderSink):
+    """Keeps delivered reminders in memory: tests and local development."""
+
+    def __init__(self, maxlen: int = 100000):
+        self.delivered: Deque[Reminder] = deque(maxlen=maxlen)
+
+    async def deliver(self, reminder: Reminder):
+        self.delivered.append(reminder)
+
+
+_SINKS = {"log": LogSink, "local": LocalSink}
+_sink: ReminderSink = _SINKS[settings.REMINDER_SINK]()
+
+
+def set_reminder_sink(sink: ReminderSink):
+    global _sink
+    _sink = sink
+
+
+def get_reminder_sink() -> ReminderSink:
+    return _sink
+
+
+_WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_CLAIM_SQL = """
+    WITH due AS (
+      SELECT id FROM reminders
+      WHERE status = 'SCHEDULED' AND remind_at <= now() + make_interval(secs => %(lookahead)s)
+      ORDER BY remind_at
+      LIMIT %(limit)s
+      FOR UPDATE SKIP LOCKED
+    )
+    UPDATE reminders r
+    SET status = 'CLAIMED', claimed_by = %(worker)s, attempts = r.attempts + 1,
+        claimed_until = greatest(r.remind_at, now()) + make_interval(secs => %(lease)s)
+    FROM due
+    WHERE r.id = due.id
+    RETURNING r.id, r.owner_user_id, r.patient_id, r.type, r.payload_json,
+              r.remind_at, r.claimed_until, r.attempts
+"""
+
+_RECLAIM_SQL = """
+    UPDATE reminders SET status = 'SCHEDULED', claimed_by = NULL, claimed_until = NULL
+    WHERE status = 'CLAIMED' AND claimed_until < now()
+"""
+
+_SENT_SQL = """
+    UPDATE reminders
+    SET status = 'SENT', dispatched_at = now(), claimed_by = NULL, claimed_until = NULL, last_error = NULL
+    WHERE id = ANY(%s::uuid[]) AND status = 'CLAIMED' AND claimed_by = %s
+"""
+
+_FAILED_SQL = """
+    UPDATE reminders
+    SET status = CASE WHEN attempts >= %(max_attempts)s THEN 'FAILED' ELSE 'SCHEDULED' END,
+        remind_at = CASE WHEN attempts >= %(max_attempts)s THEN remind_at
+                         ELSE now() + make_interval(secs => %(delay)s) END,
+        last_error = %(error)s, claimed_by = NULL, claimed_until = NULL
+    WHERE id = %(id)s AND status = 'CLAIMED' AND claimed_by = %(worker)s
+"""
+
+_RELEASE_SQL = """
+    UPDATE reminders
+    SET status = 'SCHEDULED', attempts = greatest(attempts - 1, 0), claimed_by = NULL, claimed_until = NULL
+    WHERE id = ANY(%s::uuid[]) AND status = 'CLAIMED' AND claimed_by = %s
+"""
+
+Outcome = Tuple[Reminder, Optional[str]]  # (reminder, error or None)
+
+# Created by start_reminder_dispatcher() on the app's event loop.
+_heap: List[Tuple[float, int, Reminder]] = []
+_seq = 0
+_pending: Dict[str, Reminder] = {}  # claimed by us and not yet settled
+_ready: "Optional[asyncio.Queue[Optional[Reminder]]]" = None
+_outcomes: "Optional[asyncio.Queue[Optional[Outcome]]]" = None
+_stop: Optional[asyncio.Event] = None
+_tasks: "List[asyncio.Task[None]]" = []
+
+_stats_lock = threading.Lock()
+_stats = {
+    "claimed": 0,
+    "dispatched": 0,
+    "retried": 0,
+    "failed": 0,
+    "expired": 0,
+    "reclaimed": 0,
+    "released": 0,
+    "claim_errors": 0,
+    "flush_errors": 0,
+    "last_claim_ms": 0.0,
+}
+_lags_ms: Deque[float] = deque(maxlen=4096)
+_dispatch_times: Deque[float] = deque()  # monotonic times of the last 60 s of deliveries
+
+
+def _bump(key: str, n: int = 1):
+    with _stats_lock:
+        _stats[key] += n
+
+
+# -----------------------------
+# Database
+# -----------------------------
+
+def _to_reminder(row: Dict[str, Any]) -> Reminder:
+    return Reminder(
+        id=str(row["id"]),
+        owner_user_id=str(row["owner_user_id"]),
+        patient_id=str(row["patient_id"]) if row["patient_id"] else None,
+        type=str(row["type"]),
+        payload=row["payload_json"] or {},
+        remind_at=row["remind_at"].timestamp(),
+        lease_until=row["claimed_until"].timestamp(),
+        attempts=int(row["attempts"]),
+    )
+
+
+async def _claim(limit: int) -> List[Reminder]:
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(_CLAIM_SQL, {
+                "lookahead": settings.REMINDER_LOOKAHEAD_SECONDS,
+                "limit": limit,
+                "worker": _WORKER_ID,
+                "lease": settings.REMINDER_LEASE_SECONDS,
+            })
+            rows = await cur.fetchall()
+    return [_to_reminder(r) for r in rows]
+
+
+async def _reclaim_expired() -> int:
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(_RECLAIM_SQL)
+            return cur.rowcount
+
+
+async def _settle(outcomes: List[Outcome]):
+    sent = [r.id for r, error in outcomes if error is None]
+    failed = [
+        {
+            "id": r.id,
+            "error": error,
+            "delay": settings.REMINDER_RETRY_SECONDS * 2 ** max(r.attempts - 1, 0),
+            "max_attempts": settings.REMINDER_MAX_ATTEMPTS,
+            "worker": _WORKER_ID,
+        }
+        for r, error in outcomes if error is not None
+    ]
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            if sent:
+                await cur.execute(_SENT_SQL, (sent, _WORKER_ID))
+            if failed:
+                await cur.executemany(_FAILED_SQL, failed)
+
+
+async def _release(ids: List[str]):
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(_RELEASE_SQL, (ids, _WORKER_ID))
+
+
+# -----------------------------
+# Scheduler, delivery, write-back
+# -----------------------------
+
+def _schedule(reminders: List[Reminder]):
+    global _seq
+    for r in reminders:
+        _pending[r.id] = r
+        _seq += 1
+        heapq.heappush(_heap, (r.remind_at, _seq, r))
+
+
+async def _run_scheduler():
+    next_claim = next_sweep = 0.0
+    while not _stop.is_set():
+        now = time.time()
+        while _heap and _heap[0][0] <= now:
+            _ready.put_nowait(heapq.heappop(_heap)[2])
+
+        if now >= next_sweep:
+            next_sweep = now + settings.REMINDER_LEASE_SECONDS / 2
+            try:
+                _bump("reclaimed", await _reclaim_expired())
+            except Exception:
+                logger.warning("reminder lease sweep failed", exc_info=True)
+
+        if now >= next_claim:
+            room = settings.REMINDER_CLAIM_BATCH - len(_pending)
+            next_claim = now + settings.REMINDER_POLL_SECONDS
+            if room > 0:
+                started = time.perf_counter()
+                try:
+                    claimed = await _claim(room)
+                except Exception:
+                    logger.warning("reminder claim failed", exc_info=True)
+                    _bump("claim_errors")
+                    claimed = []
+                with _stats_lock:
+                    _stats["claimed"] += len(claimed)
+                    _stats["last_claim_ms"] = round((time.perf_counter() - started) * 1000.0, 3)
+                _schedule(claimed)
+                if len(claimed) == room:
+                    next_claim = now  # backlog: claim again as soon as there is room
+
+        wake = min(next_claim, next_sweep, _heap[0][0] if _heap else next_claim)
+        try:
+            await asyncio.wait_for(_stop.wait(), max(wake - time.time(), 0.001))
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _run_delivery():
+    while True:
+        reminder = await _ready.get()
+        if reminder is None:
+            return
+        if time.time() > reminder.lease_until:
+            # Too late: the lease may already belong to another worker.
+            _pending.pop(reminder.id, None)
+            _bump("expired")
+            continue
+        try:
+            await _sink.deliver(reminder)
+            error = None
+        except Exception as e:
+            logger.warning("reminder %s delivery failed: %s", reminder.id, e)
+            error = f"{type(e).__name__}: {e}"[:500]
+        else:
+            lag_ms = (time.time() - reminder.remind_at) * 1000.0
+            now = time.monotonic()
+            with _stats_lock:
+                _stats["dispatched"] += 1
+                _lags_ms.append(lag_ms)
+                _dispatch_times.append(now)
+                while _dispatch_times[0] < now - 60.0:
+                    _dispatch_times.popleft()
+        _outcomes.put_nowait((reminder, error))
+
+
+async def _next_outcomes() -> Tuple[List[Outcome], bool]:
+    """A batch of outcomes and whether the stop sentinel was seen."""
+    first = await _outcomes.get()
+    if first is None:
+        return [], True
+    batch = [first]
+    deadline = time.monotonic() + settings.REMINDER_FLUSH_INTERVAL_SECONDS
+    while len(batch) < settings.REMINDER_CLAIM_BATCH:
+        if not _outcomes.empty():
+            item = _outcomes.get_nowait()
+        else:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(_outcomes.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+        if item is None:
+            return batch, True
+        batch.append(item)
+    return batch, False
+
+
+async def _run_writeback():
+    backlog: List[Outcome] = []
+    done = False
+    while not done or backlog:
+        if not done:
+            batch, done = await _next_outcomes()
+            backlog.extend(batch)
+        if not backlog:
+            continue
+        try:
+            await _settle(backlog)
+        except Exception:
+            # Keep them: they stay CLAIMED under our lease until it expires,
+            # after which they will be delivered again (see the header).
+            logger.warning("reminder write-back failed for %d outcomes", len(backlog), exc_info=True)
+            _bump("flush_errors")
+            if done:
+                return
+            await asyncio.sleep(settings.REMINDER_POLL_SECONDS)
+            continue
+        with _stats_lock:
+            for r, error in backlog:
+                if error is not None:
+                    _stats["failed" if r.attempts >= settings.REMINDER_MAX_ATTEMPTS else "retried"] += 1
+        for r, _ in backlog:
+            _pending.pop(r.id, None)
+        backlog = []
+
+
+def start_reminder_dispatcher():
+    """Start the scheduler, delivery and write-back tasks on the running loop."""
+    global _ready, _outcomes, _stop
+    if not settings.REMINDER_DISPATCH_ENABLED or _tasks:
+        return
+    _ready = asyncio.Queue()
+    _outcomes = asyncio.Queue()
+    _stop = asyncio.Event()
+    _tasks.append(asyncio.create_task(_run_scheduler(), name="reminder-scheduler"))
+    _tasks.append(asyncio.create_task(_run_writeback(), name="reminder-writeback"))
+    for i in range(max(1, settings.REMINDER_WORKERS)):
+        _tasks.append(asyncio.create_task(_run_delivery(), name=f"reminder-delivery-{i}"))
+
+
+async def stop_reminder_dispatcher():
+    """Finish deliveries in progress, write their outcomes and release the rest."""
+    if not _tasks:
+        return
+    scheduler, writeback, deliveries = _tasks[0], _tasks[1], _tasks[2:]
+    _stop.set()
+    await scheduler
+
+    unsent = [entry[2] for entry in _heap]
+    _heap.clear()
+    while not _ready.empty():
+        item = _ready.get_nowait()
+        if item is not None:
+            unsent.append(item)
+    for _ in deliveries:
+        _ready.put_nowait(None)
+    await asyncio.gather(*deliveries, return_exceptions=True)
+    _outcomes.put_nowait(None)
+    try:
+        await asyncio.wait_for(writeback, timeout=30.0)
+    except asyncio.TimeoutError:
+        logger.warning("reminder write-back did not finish; leases will expire instead")
+    _tasks.clear()
+
+    if unsent:
+        try:
+            await _release([r.id for r in unsent])
+            _bump("released", len(unsent))
+        except Exception:
+            logger.warning("could not release %d claimed reminders; leases will expire", len(unsent), exc_info=True)
+        for r in unsent:
+            _pending.pop(r.id, None)
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return round(sorted_values[k], 3)
+
+
+def reminder_dispatch_stats() -> dict:
+    cutoff = time.monotonic() - 60.0
+    with _stats_lock:
+        stats = dict(_stats)
+        while _dispatch_times and _dispatch_times[0] < cutoff:
+            _dispatch_times.popleft()
+        last_minute = len(_dispatch_times)
+        lags = sorted(_lags_ms)
+    stats.update({
+        "running": bool(_tasks),
+        "worker": _WORKER_ID,
+        "held": len(_pending),
+        "waiting": len(_heap),
+        "ready": _ready.qsize() if _ready is not None else 0,
+        "dispatched_last_minute": last_minute,
+        "lag_ms_p50": _percentile(lags, 50),
+        "lag_ms_p95": _percentile(lags, 95),
+        "lag_ms_max": round(lags[-1], 3) if lags else 0.0,
+    })
+    return stats
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import mmap
+import os
+import sys
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Any, Dict, NamedTuple, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.db import get_conn
+
+try:
+    import msgpack
+except ImportError:  # optional: JSON snapshots work without it
+    msgpack = None
+
+# Where the rules engine gets its rule rows from. A source returns an
+# immutable, versioned RuleSnapshot; compiling and evaluating it is pure CPU.
+# Snapshots can be written to a file (JSON, or msgpack if installed) that
+# worker processes memory-map and decode without touching the database.
+# Files are replaced atomically, so a reader sees either the old or the new
+# snapshot, never a partial one.
+
+_FORMAT_VERSION = 1
+
+
+class RuleSnapshot(NamedTuple):
+    version: int
+    rows: Tuple[Dict[str, Any], ...]  # active rules ordered by (priority, id)
+
+
+class RuleSource(ABC):
+    """Interface: load() returns the current snapshot."""
+
+    @abstractmethod
+    async def load(self) -> RuleSnapshot:
+        ...
+
+
+class PostgresRuleSource(RuleSource):
+    """Active rows of medicheck.rules, versioned by medicheck.rules_version."""
+
+    async def load(self) -> RuleSnapshot:
+        # One REPEATABLE READ snapshot, so the version always matches the rows.
+        async with get_conn() as conn, conn.transaction():
+            async with conn.cursor() as cur:
+                await cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+                await cur.execute("SELECT version FROM medicheck.rules_version")
+                v = await cur.fetchone()
+                await cur.execute(
+                    """
+                    SELECT id, module_id, name, severity, priority, conditions, outcomes
+                    FROM medicheck.rules
+                    WHERE status = 'active'
+                    ORDER BY priority ASC, id ASC
+                    """
+                )
+                rows = await cur.fetchall()
+        return RuleSnapshot(int(v["version"]) if v else 0, tuple(rows))
+
+
+class FileRuleSource(RuleSource):
+    """A snapshot file written by write_snapshot(); re-read only when it changes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self._snapshot: Optional[RuleSnapshot] = None
+
+    async def load(self) -> RuleSnapshot:
+        return await asyncio.to_thread(self._load)
+
+    def _load(self) -> RuleSnapshot:
+        st = os.stat(self.path)
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if self._snapshot is None or stamp != self._stamp:
+            self._snapshot = read_snapshot(self.path)
+            self._stamp = stamp
+        return self._snapshot
+
+
+class MemoryRuleSource(RuleSource):
+    """Rows held in memory: tests, benchmarks and offline tools."""
+
+    def __init__(self, rows: Sequence[Dict[str, Any]] = (), version: int = 0):
+        self._snapshot = RuleSnapshot(version, tuple(rows))
+
+    def set(self, rows: Sequence[Dict[str, Any]], version: Optional[int] = None):
+        """Replace the rows (the version is bumped unless given) and drop the engine's cached rules."""
+        from app.services.rules_engine import invalidate_rules  # the engine imports this module
+
+        if version is None:
+            version = self._snapshot.version + 1
+        self._snapshot = RuleSnapshot(version, tuple(rows))
+        invalidate_rules()
+
+    async def load(self) -> RuleSnapshot:
+        return self._snapshot
+
+
+def source_from_settings() -> RuleSource:
+    if settings.RULES_SOURCE == "file":
+        return FileRuleSource(settings.RULES_SNAPSHOT_PATH)
+    return PostgresRuleSource()
+
+
+# -----------------------------
+# Snapshot files
+# -----------------------------
+
+def _format_for(path: str) -> str:
+    return "msgpack" if path.endswith(".msgpack") else "json"
+
+
+def write_snapshot(snapshot: RuleSnapshot, path: str):
+    """Serialize to path (format from the extension) and swap it in atomically."""
+    doc = {"format": _FORMAT_VERSION, "version": snapshot.version, "rows": list(snapshot.rows)}
+    if _format_for(path) == "msgpack":
+        if msgpack is None:
+            raise RuntimeError("msgpack is not installed; use a .json snapshot path")
+        data = msgpack.packb(doc, use_bin_type=True)
+    else:
+        data = json.dumps(doc, separators=(",", ":"), default=str).encode("utf-8")
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".rules-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def read_snapshot(path: str) -> RuleSnapshot:
+    """Decode a snapshot file through a read-only mmap (shared page cache across workers)."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if _format_for(path) == "msgpack":
+            if msgpack is None:
+                raise RuntimeError("msgpack is not installed; cannot read " + path)
+            doc = msgpack.unpackb(mm, raw=False)
+        else:
+            doc = json.loads(mm[:])
+    if doc.get("format") != _FORMAT_VERSION:
+        raise ValueError(f"unsupported rules snapshot format in {path}: {doc.get('format')!r}")
+    return RuleSnapshot(int(doc["version"]), tuple(doc["rows"]))
+
+
+async def export_snapshot(path: str, source: Optional[RuleSource] = None) -> RuleSnapshot:
+    snapshot = await (source or PostgresRuleSource()).load()
+    write_snapshot(snapshot, path)
+    return snapshot
+
+
+if __name__ == "__main__":
+    # python -m app.services.rule_sources rules.msgpack  -> export the live rules
+    import asyncio
+    from app.core.db import open_pool, close_pool
+
+    async def _main(path: str):
+        await open_pool()
+        try:
+            snap = await export_snapshot(path)
+        finally:
+            await close_pool()
+        print(f"wrote {len(snap.rows)} rules (version {snap.version}) to {path}")
+
+    asyncio.run(_main(sys.argv[1]))
@@ -1,6 +1,24 @@
 from __future__ import annotations
-from typing import Any, Dict, List, Optional, Tuple
-from app.core.db import get_conn
+import asyncio
+import bisect
+import hashlib
+import heapq
+import json
+import operator
+import random
+import threading
+import time
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from app.core.cache import TTLCache, MISSING
+from app.core.config import settings
+from app.core.notify import subscribe
+from app.services.rule_sources import RuleSource, RuleSnapshot, read_snapshot, source_from_settings, write_snapshot
+from app.services.symptom_vocab import canonical_symptom
+
+logger = logging.getLogger(__name__)
 
 TRIAGE_RANK = {
     "emergency": 4,
@@ -34,7 +52,7 @@ def _get_fact(context: Dict[str, Any], fact: str) -> Any:
 def _compare(op: str, left: Any, right: Any, *, symptoms_set: set[str]) -> bool:
     """
     Operations supported:
-      - has: fact must be "symptom", right is symptom key string
+      - has: fact must be "symptom", right is symptom key string (or alias)
       - ==, !=, >, >=, <, <=
       - in: right is list, left must be element
       - contains: left is list/str, right must be in left
@@ -43,7 +61,7 @@ def _compare(op: str, left: Any, right: Any, *, symptoms_set: set[str]) -> bool:
     if op == "has":
         if right is None:
             return False
-        return str(right) in symptoms_set
+        return canonical_symptom(str(right)) in symptoms_set
 
     if op == "exists":
         return left is not None
@@ -86,7 +104,11 @@ def _eval_clause(clause: Dict[str, Any], context: Dict[str, Any], symptoms_set:
         return False
 
     left = _get_fact(context, fact)
-    return _compare(op, left, value, symptoms_set=symptoms_set)
+    try:
+        return _compare(op, left, value, symptoms_set=symptoms_set)
+    except TypeError:
+        # Not comparable (e.g. a number against a string): the clause is false.
+        return False
 
 
 def _eval_conditions(conditions: Dict[str, Any], context: Dict[str, Any], symptoms_set: set[str]) -> bool:
@@ -124,22 +146,591 @@ def _eval_conditions(conditions: Dict[str, Any], context: Dict[str, Any], sympto
     return True
 
 
-def _pick_best_triage(triage_list: List[Dict[str, Any]]) -> Dict[str, Any]:
-    if not triage_list:
-        return {"level": "unknown", "reason": "No matching triage rules."}
-    best = triage_list[0]
-    best_rank = TRIAGE_RANK.get(str(best.get("level", "unknown")), 0)
+_NO_TRIAGE = {"level": "unknown", "reason": "No matching triage rules."}
+_EMERGENCY_RANK = TRIAGE_RANK["emergency"]
+
+
+def _triage_rank(triage: Dict[str, Any]) -> int:
+    return TRIAGE_RANK.get(str(triage.get("level", "unknown")), 0)
+
+
+def _recommendation_id(rec: Dict[str, Any]) -> str:
+    """
+    Stable key for deduplicating recommendations across rules: the author's
+    "id" if the recommendation has one, else a digest of its canonical JSON,
+    so identical recommendations from different rules collapse into one.
+    """
+    rec_id = rec.get("id")
+    if rec_id is not None:
+        return str(rec_id)
+    canonical = json.dumps(rec, sort_keys=True, separators=(",", ":"), default=str)
+    return "rec_" + hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+# -----------------------------
+# Compiled rule set
+# -----------------------------
+# Rules are compiled once into closures (fact paths pre-split, ops resolved)
+# and cached per process until the rule-set version changes.
+
+ClauseFn = Callable[[Dict[str, Any], set], bool]
+
+_OPS: Dict[str, Callable[[Any, Any], Any]] = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+
+def _never(context: Dict[str, Any], symptoms_set: set[str]) -> bool:
+    return False
+
+
+def _compile_fact(fact: str) -> Callable[[Dict[str, Any]], Any]:
+    """
+    Compiled counterpart of _get_fact. The evaluation context never holds
+    dotted keys, so dotted facts always walk the nested path.
+    """
+    parts = tuple(fact.split("."))
+    if len(parts) == 1:
+        return lambda context: context.get(fact)
+
+    def get_path(context: Dict[str, Any]) -> Any:
+        cur: Any = context
+        for p in parts:
+            if isinstance(cur, dict) and p in cur:
+                cur = cur[p]
+            else:
+                return None
+        return cur
+
+    return get_path
+
+
+def _compile_clause(clause: Any) -> ClauseFn:
+    """Compiled counterpart of _eval_clause/_compare; same semantics."""
+    if not isinstance(clause, dict):
+        return _never
+
+    fact = clause.get("fact")
+    op = clause.get("op")
+    value = clause.get("value")
+
+    if not fact or not op:
+        return _never
+
+    if op == "has":
+        if value is None:
+            return _never
+        key = canonical_symptom(str(value))
+        return lambda context, symptoms_set: key in symptoms_set
+
+    get_fact = _compile_fact(str(fact))
+
+    if op == "exists":
+        return lambda context, symptoms_set: get_fact(context) is not None
+
+    fn = _OPS.get(op)
+    if fn is not None:
+        def compare(context: Dict[str, Any], symptoms_set: set[str]) -> bool:
+            left = get_fact(context)
+            if left is None:
+                return False
+            try:
+                return fn(left, value)
+            except TypeError:
+                return False
+        return compare
+
+    if op == "in":
+        if not isinstance(value, (list, tuple, set)):
+            return _never
+        choices = tuple(value)
+
+        def is_in(context: Dict[str, Any], symptoms_set: set[str]) -> bool:
+            left = get_fact(context)
+            return left is not None and left in choices
+        return is_in
+
+    if op == "contains":
+        needle = str(value)
+
+        def contains(context: Dict[str, Any], symptoms_set: set[str]) -> bool:
+            left = get_fact(context)
+            if isinstance(left, (list, tuple, set)):
+                try:
+                    return value in left
+                except TypeError:  # unhashable value against a set
+                    return False
+            if isinstance(left, str):
+                return needle in left
+            return False
+        return contains
+
+    return _never
+
+
+def _compile_group(clauses: Any) -> Tuple[ClauseFn, ...]:
+    return tuple(_compile_clause(c) for c in (clauses or ()))
+
+
+# Top-level facts cheap enough to index on: an "all" clause {fact, "==", value}
+# on one of these rules out every context whose fact differs.
+_INDEXED_FACTS = ("sex", "pregnant")
+
+
+def _mandatory_preconditions(conditions: Dict[str, Any]) -> Tuple[Tuple[str, ...], Tuple[Tuple[str, Any], ...]]:
+    """
+    From the "all" group, collect symptom keys the rule requires ("has") and
+    (fact, value) equality guards on _INDEXED_FACTS. Either can only be
+    satisfied by contexts that report that symptom / fact value.
+    """
+    symptoms: List[str] = []
+    guards: List[Tuple[str, Any]] = []
+    for c in conditions.get("all", []) or ():
+        if not isinstance(c, dict) or not c.get("fact"):
+            continue
+        op = c.get("op")
+        value = c.get("value")
+        if op == "has" and value is not None:
+            symptoms.append(canonical_symptom(str(value)))
+        elif op == "==" and c["fact"] in _INDEXED_FACTS and value is not None:
+            try:
+                hash(value)
+            except TypeError:
+                continue
+            guards.append((c["fact"], value))
+    return tuple(symptoms), tuple(guards)
+
+
+_GROUPS = ("all", "any", "none")
+_ALL, _ANY, _NONE = 0, 1, 2  # plan kinds, indexes into _GROUPS
+
+
+# record(group, index, result, elapsed_ns) for each clause traced_matches() runs.
+ClauseRecorder = Callable[[str, int, bool, int], None]
+
+# Evaluation order of a rule: ((kind, fns, source indexes), ...) for its
+# non-empty groups. See "Clause ordering" below.
+Plan = Tuple[Tuple[int, Tuple[ClauseFn, ...], Tuple[int, ...]], ...]
+
+
+# -----------------------------
+# Clause ordering
+# -----------------------------
+# A clause that cannot be evaluated against the context (an ordering
+# comparison between a number and a string, contains with an unhashable
+# value) is false, like a clause on a missing fact; the candidate index
+# likewise just leaves such rules out. Every clause is then an independent
+# true/false test, so the clauses of a group, and the groups of a rule, can
+# run in any order without changing the result.
+#
+# Rules start in the order of the source JSON. Once the profiler has
+# observed a rule, reoptimize_rules puts its clauses cheapest per chance of
+# deciding the group first (cost / P(false) for all, cost / P(true) for any
+# and none), and its groups cheapest per chance of failing the rule first.
+# Costs and probabilities are per-op priors blended with the observations.
+
+# Evidence the priors are worth, in observations.
+_PRIOR_WEIGHT = 5.0
+_MIN_DECIDE = 1e-6
+
+
+def _clause_prior(clause: Any) -> Tuple[float, float]:
+    """(cost_ns, P(true)) for what _compile_clause builds from `clause`."""
+    never = (20.0, 0.0)
+    if not isinstance(clause, dict):
+        return never
+    fact = clause.get("fact")
+    op = clause.get("op")
+    if not fact or not op:
+        return never
+    if op == "has":
+        return (120.0, 0.1) if clause.get("value") is not None else never
+
+    cost = 200.0 + 100.0 * str(fact).count(".")
+    if op in _OPS or op == "exists":
+        return cost, 0.5
+    if op == "in":
+        return (cost + 50.0, 0.5) if isinstance(clause.get("value"), (list, tuple, set)) else never
+    if op == "contains":
+        return cost + 100.0, 0.5
+    return never
+
+
+def _estimate(prior: Tuple[float, float], observed: Optional[Tuple[int, int, int]]) -> Tuple[float, float]:
+    """(cost_ns, P(true)): the prior blended with observed (evaluations, true, ns)."""
+    cost, p = prior
+    if not observed:
+        return cost, p
+    n, true, ns = observed
+    return (ns + cost * _PRIOR_WEIGHT) / (n + _PRIOR_WEIGHT), (true + p * _PRIOR_WEIGHT) / (n + _PRIOR_WEIGHT)
+
+
+def _order_group(kind: int, estimates: List[Tuple[float, float]]) -> List[int]:
+    def rank(i: int) -> float:
+        cost, p = estimates[i]
+        decide = 1.0 - p if kind == _ALL else p
+        return cost / max(decide, _MIN_DECIDE)
+
+    return sorted(range(len(estimates)), key=rank)
+
+
+def _group_rank(kind: int, ordered: List[Tuple[float, float]]) -> float:
+    """Expected cost of the group per chance that it fails the rule."""
+    cost = 0.0
+    reach = 1.0  # probability the next clause is evaluated
+    for c, p in ordered:
+        cost += reach * c
+        reach *= p if kind == _ALL else 1.0 - p
+    fail = 1.0 - reach if kind != _ANY else reach
+    return cost / max(fail, _MIN_DECIDE)
+
+
+def _plan_for(rule: "CompiledRule", observed: Optional[Dict[Tuple[str, int], Tuple[int, int, int]]] = None) -> Plan:
+    groups = []
+    for kind, group in enumerate(_GROUPS):
+        fns = rule.group_fns(kind)
+        if not fns:
+            continue
+        priors = [_clause_prior(c) for c in (rule.conditions.get(group) or ())]
+        estimates = [_estimate(priors[i], observed.get((group, i)) if observed else None) for i in range(len(fns))]
+        order = _order_group(kind, estimates)
+        groups.append((_group_rank(kind, [estimates[i] for i in order]), kind, order))
+    groups.sort(key=lambda g: g[0])
+    return tuple((kind, tuple(rule.group_fns(kind)[i] for i in order), tuple(order)) for _, kind, order in groups)
+
+
+def _stored_plan(rule: "CompiledRule") -> Plan:
+    """The order of the source JSON, where every rule starts."""
+    return tuple(
+        (kind, rule.group_fns(kind), tuple(range(len(rule.group_fns(kind)))))
+        for kind in (_ALL, _ANY, _NONE) if rule.group_fns(kind)
+    )
+
+
+class CompiledRule:
+    __slots__ = (
+        "rule_id", "conditions", "all_fns", "any_fns", "none_fns", "match", "triage", "triage_rank",
+        "recommendations", "required_symptoms", "guards", "plan",
+    )
+
+    def __init__(self, row: Dict[str, Any]):
+        conditions = row["conditions"]
+        outcomes = row["outcomes"]
+        module_id = row["module_id"]
+
+        self.rule_id = int(row["id"])
+        self.conditions = conditions
+        self.all_fns = _compile_group(conditions.get("all", []))
+        self.any_fns = _compile_group(conditions.get("any", []))
+        self.none_fns = _compile_group(conditions.get("none", []))
+        self.required_symptoms, self.guards = _mandatory_preconditions(conditions)
+
+        # Shared, read-only response fragments.
+        self.match = {
+            "rule_id": self.rule_id,
+            "module_id": int(module_id) if module_id is not None else None,
+            "name": str(row["name"]),
+            "severity": str(row["severity"]),
+            "priority": int(row["priority"]),
+            "outcomes": outcomes,
+        }
+
+        triage = outcomes.get("triage")
+        self.triage = triage if isinstance(triage, dict) and triage.get("level") else None
+        self.triage_rank = _triage_rank(self.triage) if self.triage is not None else -1
+
+        # (id, recommendation as authored, copy carrying its id for compact).
+        recs = outcomes.get("recommendations")
+        entries = []
+        for rec in (recs if isinstance(recs, list) else ()):
+            if isinstance(rec, dict):
+                rec_id = _recommendation_id(rec)
+                entries.append((rec_id, rec, rec if "id" in rec else {"id": rec_id, **rec}))
+        self.recommendations = tuple(entries)
+
+        # Replaced wholesale (one attribute store) by reoptimize_rules.
+        self.plan: Plan = _stored_plan(self)
+
+    def group_fns(self, kind: int) -> Tuple[ClauseFn, ...]:
+        return (self.all_fns, self.any_fns, self.none_fns)[kind]
+
+    def matches(self, context: Dict[str, Any], symptoms_set: set[str]) -> bool:
+        """Evaluate the groups in plan order; clauses that can't be evaluated are false."""
+        for kind, fns, _ in self.plan:
+            if kind == _ALL:
+                for fn in fns:
+                    if not fn(context, symptoms_set):
+                        return False
+            elif kind == _ANY:
+                for fn in fns:
+                    if fn(context, symptoms_set):
+                        break
+                else:
+                    return False
+            else:
+                for fn in fns:
+                    if fn(context, symptoms_set):
+                        return False
+        return True
+
+    def traced_matches(self, context: Dict[str, Any], symptoms_set: set[str], record: ClauseRecorder) -> bool:
+        """matches(), reporting every clause it evaluates to `record` (by source position)."""
+        clock = time.perf_counter_ns
+        for kind, fns, indexes in self.plan:
+            group = _GROUPS[kind]
+            decided = None
+            for fn, i in zip(fns, indexes):
+                started = clock()
+                ok = bool(fn(context, symptoms_set))
+                record(group, i, ok, clock() - started)
+                if kind == _ALL and not ok:
+                    return False
+                if kind == _ANY and ok:
+                    decided = True
+                    break
+                if kind == _NONE and ok:
+                    return False
+            if kind == _ANY and not decided:
+                return False
+        return True
+
+
+class RuleSet:
+    """
+    Compiled rules in (priority, id) order plus an inverted index so only
+    rules whose mandatory preconditions can hold are fully evaluated.
+
+    Each rule is filed under exactly one key: its rarest required symptom,
+    else its first indexed-fact guard, else the unindexed list that every
+    evaluation scans. Buckets hold rule positions in ascending order, so a
+    k-way merge restores the original ordering.
+    """
+    __slots__ = (
+        "version", "rows", "rules", "loaded_at", "by_symptom", "by_fact", "unindexed", "memo_plan",
+    )
+
+    def __init__(self, version: int, rows: Tuple[Dict[str, Any], ...], rules: Tuple[CompiledRule, ...]):
+        self.version = version
+        self.rows = rows  # source rows, used to seed batch worker processes
+        self.rules = rules
+        self.loaded_at = time.monotonic()
+
+        symptom_freq: Dict[str, int] = {}
+        for rule in rules:
+            for key in set(rule.required_symptoms):
+                symptom_freq[key] = symptom_freq.get(key, 0) + 1
+
+        by_symptom: Dict[str, List[int]] = {}
+        by_fact: Dict[Tuple[str, Any], List[int]] = {}
+        unindexed: List[int] = []
+        for pos, rule in enumerate(rules):
+            if rule.required_symptoms:
+                key = min(rule.required_symptoms, key=lambda k: symptom_freq[k])
+                by_symptom.setdefault(key, []).append(pos)
+            elif rule.guards:
+                by_fact.setdefault(rule.guards[0], []).append(pos)
+            else:
+                unindexed.append(pos)
+
+        self.by_symptom = {k: tuple(v) for k, v in by_symptom.items()}
+        self.by_fact = {k: tuple(v) for k, v in by_fact.items()}
+        self.unindexed = tuple(unindexed)
+        self.memo_plan: Optional[_MemoPlan] = None  # built on first cached evaluation
+
+    def candidates(self, context: Dict[str, Any], symptoms_set: set[str]) -> List[CompiledRule]:
+        buckets = [self.by_symptom[s] for s in symptoms_set if s in self.by_symptom]
+        for fact in _INDEXED_FACTS:
+            value = context.get(fact)
+            if value is None:
+                continue
+            try:
+                bucket = self.by_fact.get((fact, value))
+            except TypeError:
+                continue
+            if bucket:
+                buckets.append(bucket)
+
+        rules = self.rules
+        if not buckets:
+            return [rules[pos] for pos in self.unindexed]
+        return [rules[pos] for pos in heapq.merge(self.unindexed, *buckets)]
+
+
+def compile_ruleset(rows: List[Dict[str, Any]], version: int = 0) -> RuleSet:
+    """
+    rows: active rules already ordered by (priority, id), as selected from
+    medicheck.rules. Rows with malformed conditions/outcomes are skipped.
+    """
+    kept = tuple(
+        r for r in rows
+        if isinstance(r["conditions"], dict) and isinstance(r["outcomes"], dict)
+    )
+    return RuleSet(version, kept, tuple(CompiledRule(r) for r in kept))
+
+
+def compile_snapshot(snapshot: RuleSnapshot) -> RuleSet:
+    return compile_ruleset(list(snapshot.rows), snapshot.version)
+
+
+_source: RuleSource = source_from_settings()
+
+
+def set_rule_source(source: RuleSource):
+    """Evaluate against another source from now on (offline tools, tests)."""
+    global _source
+    _source = source
+    invalidate_rules()
+
+
+async def _load_ruleset(current: Optional[RuleSet]) -> RuleSet:
+    snapshot = await _source.load()
+    if current is not None and current.version == snapshot.version:
+        # Same snapshot: keep the compiled rules, just restart the TTL.
+        current.loaded_at = time.monotonic()
+        return current
+    # Compiling (and planning clause order) takes seconds for large rule
+    # sets; keep it off the event loop.
+    return await asyncio.to_thread(compile_snapshot, snapshot)
+
+
+_ruleset: Optional[RuleSet] = None
+_last_ruleset: Optional[RuleSet] = None  # survives invalidation, for version reuse
+_ruleset_generation = 0
+_ruleset_lock = threading.Lock()  # invalidation arrives on the notify thread
+_ruleset_load_lock = asyncio.Lock()  # one reload at a time per process
+
+
+def invalidate_rules(payload: Optional[str] = None):
+    """Drop the cached rule set; the next evaluation reloads it."""
+    global _ruleset, _ruleset_generation, _last_ruleset
+    with _ruleset_lock:
+        _ruleset_generation += 1
+        _ruleset = None
+        if payload is None:
+            # Reconnect or source change: do not trust the version either,
+            # nor results memoized under it.
+            _last_ruleset = None
+            _results.clear()
+
+
+subscribe("medicheck_rules_changed", invalidate_rules)
+
+
+def _is_fresh(rs: Optional[RuleSet]) -> bool:
+    if rs is None:
+        return False
+    ttl = settings.RULES_CACHE_TTL_SECONDS
+    return ttl <= 0 or time.monotonic() - rs.loaded_at < ttl
+
+
+async def get_ruleset() -> RuleSet:
+    global _ruleset, _last_ruleset
+    rs = _ruleset
+    if _is_fresh(rs):
+        return rs
+
+    async with _ruleset_load_lock:
+        with _ruleset_lock:
+            generation = _ruleset_generation
+            rs = _ruleset
+        if _is_fresh(rs):
+            return rs
 
-    for t in triage_list[1:]:
-        rank = TRIAGE_RANK.get(str(t.get("level", "unknown")), 0)
-        if rank > best_rank:
-            best = t
-            best_rank = rank
+        # A concurrent invalidation makes this result usable for the
+        # current call but not cacheable.
+        rs = await _load_ruleset(rs or _last_ruleset)
+        with _ruleset_lock:
+            if generation == _ruleset_generation:
+                _ruleset = _last_ruleset = rs
+        return rs
 
-    return best
 
+def _context_for(payload: Dict[str, Any]) -> Tuple[Dict[str, Any], set[str]]:
+    """
+    Evaluation context and symptom set for one request payload. Symptoms are
+    mapped to canonical keys (symptom_vocab), as are the rules' "has" values.
+    """
+    symptoms = payload.get("symptoms") or []
+    symptoms_set = {canonical_symptom(str(s)) for s in symptoms}
+    symptoms_set.discard("")
 
-def evaluate_rules(payload: Dict[str, Any]) -> Dict[str, Any]:
+    context = {
+        "age": payload.get("age"),
+        "duration_hours": payload.get("duration_hours"),
+        "pregnant": payload.get("pregnant"),
+        "sex": payload.get("sex"),
+        "vitals": payload.get("vitals") or {},
+        "extras": payload.get("extras") or {},
+    }
+    return context, symptoms_set
+
+
+def _evaluate(ruleset: RuleSet, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    One pass over the candidate rules: the best triage is tracked as rules
+    match and recommendations are deduplicated by id (first occurrence, in
+    rule order, wins). Payload options:
+
+      response_mode="compact"  matched_rule_ids instead of the matched rules
+                               with their full outcomes; recommendations
+                               carry their "id" (full mode sends them as
+                               authored)
+      stop_on_emergency=True   stop at the first matching emergency rule;
+                               the triage cannot get any higher, so only the
+                               matched rules and recommendations are cut short
+    """
+    context, symptoms_set = _context_for(payload)
+    return _evaluate_context(
+        ruleset, context, symptoms_set,
+        payload.get("response_mode") == "compact", bool(payload.get("stop_on_emergency")),
+    )
+
+
+def _evaluate_context(
+    ruleset: RuleSet, context: Dict[str, Any], symptoms_set: set[str], compact: bool, stop_on_emergency: bool,
+    observe: Optional[Callable[[CompiledRule], bool]] = None,
+) -> Dict[str, Any]:
+    """observe(rule): evaluate one candidate in place of rule.matches (explain, profiler)."""
+    if observe is None and _profile_rate > 0 and random.random() < _profile_rate:
+        return _profile_evaluation(ruleset, context, symptoms_set, compact, stop_on_emergency)
+
+    matched: List[Any] = []
+    triage: Optional[Dict[str, Any]] = None
+    best_rank = -1
+    recommendations: Dict[str, Dict[str, Any]] = {}
+    short_circuited = False
+
+    for rule in ruleset.candidates(context, symptoms_set):
+        if rule.matches(context, symptoms_set) if observe is None else observe(rule):
+            matched.append(rule.rule_id if compact else rule.match)
+            if rule.triage_rank > best_rank:
+                triage = rule.triage
+                best_rank = rule.triage_rank
+            for rec_id, rec, with_id in rule.recommendations:
+                if rec_id not in recommendations:
+                    recommendations[rec_id] = with_id if compact else rec
+            if stop_on_emergency and rule.triage_rank == _EMERGENCY_RANK:
+                short_circuited = True
+                break
+
+    result = {
+        "triage": triage if triage is not None else _NO_TRIAGE,
+        "recommendations": list(recommendations.values()),
+    }
+    if compact:
+        result["matched_rule_ids"] = matched
+    else:
+        result["matched_rules"] = matched
+    result["short_circuited"] = short_circuited
+    return result
+
+
+async def evaluate_rules(payload: Dict[str, Any]) -> Dict[str, Any]:
     """
     payload:
       {
@@ -149,81 +740,555 @@ def evaluate_rules(payload: Dict[str, Any]) -> Dict[str, Any]:
         "pregnant": ...,
         "sex": ...,
         "vitals": {...},
-        "extras": {...}
+        "extras": {...},
+        "response_mode": "full" | "compact",
+        "stop_on_emergency": bool,
+        "explain": bool
       }
     Returns:
       {
         "triage": {...},
-        "recommendations": [...],
-        "matched_rules": [...]
+        "recommendations": [...],            # deduplicated; with an "id" when compact
+        "matched_rules": [...],              # or "matched_rule_ids" when compact
+        "short_circuited": bool,
+        "explain": {...}                     # only with explain=true, see _explain
       }
     """
-    symptoms = payload.get("symptoms") or []
-    symptoms_set = {str(s).strip() for s in symptoms if str(s).strip()}
+    ruleset = await get_ruleset()
+    if payload.get("explain"):
+        # Tracing every clause of every candidate is too slow for the event loop.
+        return await asyncio.to_thread(_evaluate_cached, ruleset, payload)
+    return _evaluate_cached(ruleset, payload)
 
-    context = {
-        "age": payload.get("age"),
-        "duration_hours": payload.get("duration_hours"),
-        "pregnant": payload.get("pregnant"),
-        "sex": payload.get("sex"),
-        "vitals": payload.get("vitals") or {},
-        "extras": payload.get("extras") or {},
-        # NOTE:
-    }
 
-    matched_rules: List[Dict[str, Any]] = []
-    triage_candidates: List[Dict[str, Any]] = []
-    recommendations: List[Dict[str, Any]] = []
-
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT id, module_id, name, severity, priority, conditions, outcomes
-                FROM medicheck.rules
-                WHERE status = 'active'
-                ORDER BY priority ASC, id ASC
-                """
-            )
-            rows = cur.fetchall()
-
-    for r in rows:
-        rule_id = r["id"] if isinstance(r, dict) else r[0]
-        module_id = r["module_id"] if isinstance(r, dict) else r[1]
-        name = r["name"] if isinstance(r, dict) else r[2]
-        severity = r["severity"] if isinstance(r, dict) else r[3]
-        priority = r["priority"] if isinstance(r, dict) else r[4]
-        conditions = r["conditions"] if isinstance(r, dict) else r[5]
-        outcomes = r["outcomes"] if isinstance(r, dict) else r[6]
-
-        if not isinstance(conditions, dict) or not isinstance(outcomes, dict):
-            continue
+# -----------------------------
+# Result cache
+# -----------------------------
+# Identical evaluations (repeat visits, retries, client re-renders) are served
+# from an LRU keyed by the rule-set version, the response options and a
+# canonical form of the context reduced to what the rules can observe:
+#
+#   - only symptoms some rule tests with "has";
+#   - only fact paths some clause reads;
+#   - numbers (age, vitals, ...) as their position among the numeric values
+#     the rules compare that fact with: every number in the same bucket
+#     gives the same result for ==, !=, <, <=, >, >= and in;
+#   - anything else frozen exactly (type included; dicts by sorted items).
+#
+# The key therefore never merges contexts the rules could tell apart. Entries
+# of older versions are dropped as soon as a newer rule set is evaluated.
+# Cached results are shared: callers must not modify them.
+
+_results = TTLCache(maxsize=settings.RULES_RESULT_CACHE_MAX_ENTRIES)
+_results_version: Optional[int] = None
+
+
+class _Uncacheable(Exception):
+    pass
+
+
+def _is_real(value: Any) -> bool:
+    return isinstance(value, (int, float)) and value == value  # NaN excluded
+
+
+class _MemoPlan:
+    __slots__ = ("symptoms", "facts")
+
+    def __init__(self, rows: Tuple[Dict[str, Any], ...]):
+        symptoms: set = set()
+        thresholds: Dict[str, set] = {}
+        for row in rows:
+            conditions = row["conditions"]
+            for group in ("all", "any", "none"):
+                for c in conditions.get(group) or ():
+                    if not isinstance(c, dict) or not c.get("fact") or not c.get("op"):
+                        continue
+                    op = c["op"]
+                    value = c.get("value")
+                    if op == "has":
+                        if value is not None:
+                            symptoms.add(canonical_symptom(str(value)))
+                        continue
+                    if op not in _OPS and op not in ("exists", "in", "contains"):
+                        continue  # compiled to _never
+                    numbers = thresholds.setdefault(str(c["fact"]), set())
+                    values = value if op == "in" and isinstance(value, (list, tuple, set)) else (value,)
+                    numbers.update(v for v in values if _is_real(v))
+        self.symptoms = frozenset(symptoms)
+        self.facts = tuple(
+            (fact, _compile_fact(fact), tuple(sorted(numbers)))
+            for fact, numbers in sorted(thresholds.items())
+        )
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        items = [(k, _freeze(v)) for k, v in value.items()]
+        try:
+            items.sort(key=lambda kv: kv[0])
+        except TypeError:
+            pass  # mixed key types: insertion order (fewer hits, still exact)
+        return (dict, tuple(items))
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(_freeze(v) for v in value))
+    if isinstance(value, (set, frozenset)):
+        return (type(value), frozenset(_freeze(v) for v in value))
+    try:
+        hash(value)
+    except TypeError:
+        raise _Uncacheable() from None
+    return (type(value), value)
+
+
+def _result_key(plan: _MemoPlan, version: int, context: Dict[str, Any], symptoms_set: set[str],
+                compact: bool, stop_on_emergency: bool) -> Tuple[Any, ...]:
+    parts: List[Any] = [version, compact, stop_on_emergency, tuple(sorted(symptoms_set & plan.symptoms))]
+    for _, get_fact, numbers in plan.facts:
+        value = get_fact(context)
+        if _is_real(value):
+            parts.append(("n", bisect.bisect_left(numbers, value), bisect.bisect_right(numbers, value)))
+        else:
+            parts.append(_freeze(value))
+    return tuple(parts)
+
+
+def _evaluate_cached(ruleset: RuleSet, payload: Dict[str, Any]) -> Dict[str, Any]:
+    global _results_version
+    context, symptoms_set = _context_for(payload)
+    compact = payload.get("response_mode") == "compact"
+    stop_on_emergency = bool(payload.get("stop_on_emergency"))
+    if payload.get("explain"):
+        return _explain(ruleset, context, symptoms_set, compact, stop_on_emergency)
+    if _results.maxsize <= 0:
+        return _evaluate_context(ruleset, context, symptoms_set, compact, stop_on_emergency)
+
+    plan = ruleset.memo_plan
+    if plan is None:
+        plan = ruleset.memo_plan = _MemoPlan(ruleset.rows)
+    try:
+        key = _result_key(plan, ruleset.version, context, symptoms_set, compact, stop_on_emergency)
+    except _Uncacheable:
+        return _evaluate_context(ruleset, context, symptoms_set, compact, stop_on_emergency)
+
+    if ruleset.version != _results_version:
+        _results.clear()
+        _results_version = ruleset.version
+
+    result = _results.get(key)
+    if result is MISSING:
+        generation = _results.generation
+        result = _evaluate_context(ruleset, context, symptoms_set, compact, stop_on_emergency)
+        _results.set(key, result, generation=generation)
+    return dict(result)
+
+
+def rules_result_cache_stats() -> dict:
+    return {**_results.stats(), "version": _results_version}
+
+
+# -----------------------------
+# Explain and profiling
+# -----------------------------
+# Both evaluate candidates with CompiledRule.traced_matches, which follows
+# the same short-circuit order as matches() and times every clause it runs.
+#
+# explain=true returns the trace with the result (never cached). The
+# profiler traces a RULES_PROFILE_SAMPLE_RATE sample of real (cache-missing)
+# evaluations and accumulates per-rule and per-clause counts and time for
+# the current rule-set version. Times are wall-clock around pure-Python
+# code, so they track CPU time; batch items evaluated in worker processes
+# are not sampled into this process's profile.
+
+_profile_rate = settings.RULES_PROFILE_SAMPLE_RATE
+_profile_lock = threading.Lock()
+_profile_version: Optional[int] = None
+_profile_evaluations = 0  # sampled evaluations of _profile_version
+_profile: Dict[int, "_RuleProfile"] = {}
+
+
+class _RuleProfile:
+    __slots__ = ("name", "evaluations", "matches", "ns", "clauses")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.evaluations = 0
+        self.matches = 0
+        self.ns = 0
+        self.clauses: Dict[Tuple[str, int], List[int]] = {}  # (group, index) -> [evaluated, true, ns]
+
+
+def set_profile_sample_rate(rate: float):
+    """Fraction of evaluations to profile from now on; 0 turns the profiler off."""
+    global _profile_rate
+    _profile_rate = max(0.0, min(1.0, float(rate)))
+
+
+def reset_rules_profile():
+    global _profile_version, _profile_evaluations
+    with _profile_lock:
+        _profile.clear()
+        _profile_version = None
+        _profile_evaluations = 0
+
+
+def _profile_evaluation(ruleset: RuleSet, context: Dict[str, Any], symptoms_set: set[str],
+                        compact: bool, stop_on_emergency: bool) -> Dict[str, Any]:
+    global _profile_version, _profile_evaluations
+    samples: List[Tuple[CompiledRule, bool, int, List[Tuple[str, int, bool, int]]]] = []
+    clock = time.perf_counter_ns
 
-        if _eval_conditions(conditions, context, symptoms_set):
-            matched_rules.append(
+    def observe(rule: CompiledRule) -> bool:
+        clauses: List[Tuple[str, int, bool, int]] = []
+        started = clock()
+        ok = rule.traced_matches(context, symptoms_set, lambda g, i, r, ns: clauses.append((g, i, r, ns)))
+        samples.append((rule, ok, clock() - started, clauses))
+        return ok
+
+    result = _evaluate_context(ruleset, context, symptoms_set, compact, stop_on_emergency, observe)
+
+    with _profile_lock:
+        if _profile_version != ruleset.version:
+            _profile.clear()
+            _profile_version = ruleset.version
+            _profile_evaluations = 0
+        _profile_evaluations += 1
+        for rule, ok, ns, clauses in samples:
+            prof = _profile.get(rule.rule_id)
+            if prof is None:
+                prof = _profile[rule.rule_id] = _RuleProfile(rule.match["name"])
+            prof.evaluations += 1
+            prof.matches += ok
+            prof.ns += ns
+            for group, index, res, clause_ns in clauses:
+                counts = prof.clauses.get((group, index))
+                if counts is None:
+                    counts = prof.clauses[(group, index)] = [0, 0, 0]
+                counts[0] += 1
+                counts[1] += res
+                counts[2] += clause_ns
+    return result
+
+
+def rules_profile() -> Dict[str, Any]:
+    """
+    Accumulated profile of the current rule-set version. A rule absent from
+    "rules" was never a candidate in the sample (pruned by the index every
+    time); one with matches == 0 never fired.
+    """
+    with _profile_lock:
+        sampled = _profile_evaluations
+        rules = []
+        for rule_id, prof in _profile.items():
+            clauses = [
                 {
-                    "rule_id": int(rule_id),
-                    "module_id": int(module_id) if module_id is not None else None,
-                    "name": str(name),
-                    "severity": str(severity),
-                    "priority": int(priority),
-                    "outcomes": outcomes,
+                    "group": group,
+                    "index": index,
+                    "evaluations": n,
+                    "true_rate": round(true / n, 4),
+                    "avg_ns": round(ns / n),
                 }
-            )
-
-            triage = outcomes.get("triage")
-            if isinstance(triage, dict) and triage.get("level"):
-                triage_candidates.append(triage)
-
-            recs = outcomes.get("recommendations")
-            if isinstance(recs, list):
-                for rec in recs:
-                    if isinstance(rec, dict):
-                        recommendations.append(rec)
-    best_triage = _pick_best_triage(triage_candidates)
-
-    return {
-        "triage": best_triage,
-        "recommendations": recommendations,
-        "matched_rules": matched_rules,
+                for (group, index), (n, true, ns) in sorted(
+                    prof.clauses.items(), key=lambda kv: (_GROUPS.index(kv[0][0]), kv[0][1])
+                )
+            ]
+            rules.append({
+                "rule_id": rule_id,
+                "name": prof.name,
+                "evaluations": prof.evaluations,
+                "candidate_rate": round(prof.evaluations / sampled, 4) if sampled else 0.0,
+                "matches": prof.matches,
+                "match_rate": round(prof.matches / prof.evaluations, 4),
+                "total_ms": round(prof.ns / 1e6, 3),
+                "avg_us": round(prof.ns / prof.evaluations / 1e3, 3),
+                "clauses": clauses,
+            })
+        version = _profile_version
+    return {"version": version, "sample_rate": _profile_rate, "sampled_evaluations": sampled, "rules": rules}
+
+
+def _clause_trace(rule: CompiledRule, group: str, index: int, context: Dict[str, Any]) -> Dict[str, Any]:
+    clauses = rule.conditions.get(group) or ()
+    clause = clauses[index] if index < len(clauses) else None
+    if not isinstance(clause, dict):
+        return {"group": group, "index": index, "clause": clause}
+    entry: Dict[str, Any] = {
+        "group": group,
+        "index": index,
+        "fact": clause.get("fact"),
+        "op": clause.get("op"),
+        "value": clause.get("value"),
+    }
+    if clause.get("op") == "has":
+        if clause.get("value") is not None:
+            entry["symptom_key"] = canonical_symptom(str(clause["value"]))
+    elif clause.get("fact"):
+        entry["actual"] = _get_fact(context, str(clause["fact"]))
+    return entry
+
+
+def _explain(ruleset: RuleSet, context: Dict[str, Any], symptoms_set: set[str],
+             compact: bool, stop_on_emergency: bool) -> Dict[str, Any]:
+    """
+    The normal result plus "explain": every candidate rule in evaluation
+    order with its clauses in stored order (result null = not reached
+    because of short-circuiting), timings and the clause order it was
+    evaluated in, and the rules the index ruled out.
+    """
+    traces: List[Dict[str, Any]] = []
+    clock = time.perf_counter_ns
+
+    def observe(rule: CompiledRule) -> bool:
+        results: Dict[Tuple[str, int], Tuple[bool, int]] = {}
+        started = clock()
+        ok = rule.traced_matches(context, symptoms_set, lambda g, i, r, ns: results.__setitem__((g, i), (r, ns)))
+        elapsed = clock() - started
+
+        clauses = []
+        for group in _GROUPS:
+            for index in range(len(getattr(rule, group + "_fns"))):
+                entry = _clause_trace(rule, group, index, context)
+                res, ns = results.get((group, index), (None, None))
+                entry["result"] = res
+                entry["elapsed_us"] = round(ns / 1e3, 3) if ns is not None else None
+                clauses.append(entry)
+        traces.append({
+            "rule_id": rule.rule_id,
+            "name": rule.match["name"],
+            "priority": rule.match["priority"],
+            "order": [[_GROUPS[kind], list(indexes)] for kind, _, indexes in rule.plan],
+            "matched": ok,
+            "elapsed_us": round(elapsed / 1e3, 3),
+            "clauses": clauses,
+        })
+        return ok
+
+    started = clock()
+    result = _evaluate_context(ruleset, context, symptoms_set, compact, stop_on_emergency, observe)
+    elapsed = clock() - started
+
+    candidates = {r.rule_id for r in ruleset.candidates(context, symptoms_set)}
+    result["explain"] = {
+        "ruleset_version": ruleset.version,
+        "rules_total": len(ruleset.rules),
+        "elapsed_us": round(elapsed / 1e3, 3),
+        "symptom_keys": sorted(symptoms_set),
+        "pruned_rule_ids": [r.rule_id for r in ruleset.rules if r.rule_id not in candidates],
+        "rules": traces,
     }
+    return result
+
+
+# -----------------------------
+# Re-optimization
+# -----------------------------
+# Every RULES_REOPTIMIZE_SECONDS the current rule set's clause orders are
+# recomputed from the profiler's per-clause observations (see "Clause
+# ordering"). Plans are swapped per rule with a single attribute store, so
+# evaluations running in other threads see either order, both correct.
+# Batch worker processes keep the stored order.
+
+_optimizer_task: "Optional[asyncio.Task[None]]" = None
+_optimizer_stats = {"runs": 0, "reordered": 0, "last_reordered": 0, "last_run_ms": 0.0, "version": None}
+
+
+def _plan_order(plan: Plan) -> List[Tuple[int, Tuple[int, ...]]]:
+    return [(kind, indexes) for kind, _, indexes in plan]
+
+
+def reoptimize_rules(ruleset: Optional[RuleSet] = None) -> int:
+    """Re-plan rules from the profile of their version; returns how many changed order."""
+    rs = ruleset if ruleset is not None else _ruleset
+    if rs is None:
+        return 0
+    started = time.perf_counter()
+    with _profile_lock:
+        if _profile_version != rs.version:
+            observed = {}
+        else:
+            observed = {
+                rule_id: {key: tuple(counts) for key, counts in prof.clauses.items()}
+                for rule_id, prof in _profile.items()
+            }
+
+    changed = 0
+    for rule in rs.rules:
+        clauses = observed.get(rule.rule_id)
+        if not clauses:
+            continue
+        plan = _plan_for(rule, clauses)
+        if _plan_order(plan) != _plan_order(rule.plan):
+            rule.plan = plan
+            changed += 1
+
+    with _profile_lock:
+        _optimizer_stats["runs"] += 1
+        _optimizer_stats["reordered"] += changed
+        _optimizer_stats["last_reordered"] = changed
+        _optimizer_stats["last_run_ms"] = round((time.perf_counter() - started) * 1000.0, 3)
+        _optimizer_stats["version"] = rs.version
+    return changed
+
+
+async def _run_optimizer():
+    while True:
+        await asyncio.sleep(settings.RULES_REOPTIMIZE_SECONDS)
+        try:
+            await asyncio.to_thread(reoptimize_rules)
+        except Exception:
+            logger.exception("rule re-optimization failed")
+
+
+def start_rules_optimizer():
+    global _optimizer_task
+    if settings.RULES_REOPTIMIZE_SECONDS <= 0 or _profile_rate <= 0 or _optimizer_task is not None:
+        return
+    _optimizer_task = asyncio.create_task(_run_optimizer(), name="rules-optimizer")
+
+
+async def stop_rules_optimizer():
+    global _optimizer_task
+    if _optimizer_task is None:
+        return
+    _optimizer_task.cancel()
+    try:
+        await _optimizer_task
+    except asyncio.CancelledError:
+        pass
+    _optimizer_task = None
+
+
+def rules_optimizer_stats() -> dict:
+    with _profile_lock:
+        return {**_optimizer_stats, "running": _optimizer_task is not None}
+
+
+# -----------------------------
+# Batch evaluation
+# -----------------------------
+# A batch uses one rule set snapshot for all items. Large batches can fan out
+# to a long-lived process pool. The snapshot is written once per version to
+# RULES_SNAPSHOT_DIR; each task names the version it needs and a worker whose
+# compiled rules are older loads that file (mmap) and swaps in the new set,
+# so workers never query the database and the pool survives rule changes.
+
+_batch_pool: Optional[ProcessPoolExecutor] = None
+_batch_pool_lock = threading.Lock()
+_snapshot_files: Dict[int, str] = {}  # version -> file, newest last
+_snapshot_refs: Dict[str, int] = {}  # file -> submitted tasks not finished yet
+_KEEP_SNAPSHOT_FILES = 2
+_worker_ruleset: Optional[RuleSet] = None
+
+
+def _batch_worker_evaluate(path: str, version: int, payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    global _worker_ruleset
+    if _worker_ruleset is None or _worker_ruleset.version != version:
+        _worker_ruleset = compile_snapshot(read_snapshot(path))
+    ruleset = _worker_ruleset
+    return [_evaluate_cached(ruleset, p) for p in payloads]
+
+
+def _remove_snapshot_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _snapshot_file(ruleset: RuleSet, tasks: int) -> str:
+    """
+    Path of this process's snapshot file for ruleset.version, writing it if
+    needed. The file is held for `tasks` submissions; pair each with
+    _release_snapshot_file().
+    """
+    with _batch_pool_lock:
+        path = _snapshot_files.get(ruleset.version)
+        if path is None:
+            ext = "msgpack" if settings.RULES_SNAPSHOT_FORMAT == "msgpack" else "json"
+            path = os.path.join(settings.RULES_SNAPSHOT_DIR, f"rules-{os.getpid()}-{ruleset.version}.{ext}")
+            write_snapshot(RuleSnapshot(ruleset.version, ruleset.rows), path)
+            _snapshot_files[ruleset.version] = path
+        _snapshot_refs[path] = _snapshot_refs.get(path, 0) + tasks
+        # Older versions go once a newer one exists, unless tasks already
+        # queued in the pool still have to read them.
+        while len(_snapshot_files) > _KEEP_SNAPSHOT_FILES:
+            old = _snapshot_files.pop(next(iter(_snapshot_files)))
+            if not _snapshot_refs.get(old):
+                _remove_snapshot_file(old)
+        return path
+
+
+def _release_snapshot_file(path: str):
+    with _batch_pool_lock:
+        left = _snapshot_refs.get(path, 0) - 1
+        if left > 0:
+            _snapshot_refs[path] = left
+            return
+        _snapshot_refs.pop(path, None)
+        if path not in _snapshot_files.values():
+            _remove_snapshot_file(path)
+
+
+def _get_batch_pool() -> ProcessPoolExecutor:
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            _batch_pool = ProcessPoolExecutor(max_workers=settings.RULES_BATCH_WORKERS)
+        return _batch_pool
+
+
+def shutdown_batch_pool():
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is not None:
+            _batch_pool.shutdown(wait=True, cancel_futures=True)
+        _batch_pool = None
+        for path in [*_snapshot_files.values(), *_snapshot_refs]:
+            _remove_snapshot_file(path)
+        _snapshot_files.clear()
+        _snapshot_refs.clear()
+
+
+# Items evaluated per hop to a worker thread when there is no process pool.
+_INLINE_CHUNK = 256
+
+
+def _evaluate_many(ruleset: RuleSet, payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [_evaluate_cached(ruleset, p) for p in payloads]
+
+
+async def iter_evaluate_rules(payloads: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Evaluate many payloads against a single rule set snapshot, yielding
+    results in input order as soon as each chunk is ready. Evaluation runs
+    off the event loop.
+    """
+    ruleset = await get_ruleset()
+    workers = settings.RULES_BATCH_WORKERS
+
+    if workers > 0 and len(payloads) >= settings.RULES_BATCH_PARALLEL_MIN_ITEMS:
+        # ~4 chunks per worker keeps them busy without per-item IPC overhead.
+        size = max(1, -(-len(payloads) // (workers * 4)))
+        starts = range(0, len(payloads), size)
+        path = await asyncio.to_thread(_snapshot_file, ruleset, len(starts))
+        pool = _get_batch_pool()
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(pool, _batch_worker_evaluate, path, ruleset.version, payloads[i:i + size])
+            for i in starts
+        ]
+        for fut in futures:
+            # Released as each task finishes, even if this generator is abandoned.
+            fut.add_done_callback(lambda _: _release_snapshot_file(path))
+        for fut in futures:
+            for result in await fut:
+                yield result
+        return
+
+    for i in range(0, len(payloads), _INLINE_CHUNK):
+        results = await asyncio.to_thread(_evaluate_many, ruleset, payloads[i:i + _INLINE_CHUNK])
+        for result in results:
+            yield result
+
+
+async def evaluate_rules_batch(payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [result async for result in iter_evaluate_rules(payloads)]
@@ -0,0 +1,463 @@
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.rules_engine import (
+    RuleSet,
+    _NO_TRIAGE,
+    _compile_fact,
+    _context_for,
+)
+from app.services.symptom_vocab import canonical_symptom
+
+# Columnar evaluator for population screening: many payloads against one
+# compiled RuleSet. Payloads are processed in chunks; within a chunk each
+# referenced fact becomes a column (presence mask, float64 values for
+# numbers, dictionary-encoded codes for hashable scalars) and each symptom
+# key a boolean column. Clauses become vector ops and all/any/none become
+# mask algebra, restricted to the rows the RuleSet index would consider.
+#
+# Rows whose value cannot be compared exactly in vector form for a clause
+# (dicts, sets, NaN, ints beyond 2**53, str vs number ordering, ...) are
+# re-checked with the scalar CompiledRule for that rule, so results are
+# identical to rules_engine._evaluate. Should the scalar rule raise anyway,
+# only that payload is reported, as {"error": ...}.
+
+_MAX_EXACT_INT = 2 ** 53
+
+_NUMPY_OPS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+}
+
+
+def _is_number(value: Any) -> bool:
+    """bool/int/float that float64 represents exactly (NaN excluded)."""
+    t = type(value)
+    if t is bool:
+        return True
+    if t is int:
+        return -_MAX_EXACT_INT <= value <= _MAX_EXACT_INT
+    if t is float:
+        return not math.isnan(value)
+    return False
+
+
+def _hashable(value: Any) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+class _Column:
+    """One fact across a chunk of contexts."""
+    __slots__ = (
+        "present", "simple", "is_num", "num", "codes", "codebook", "uniques", "is_seq", "seqs",
+        "_contains", "_members",
+    )
+
+    def __init__(self, values: List[Any]):
+        present, simple, is_num, num, codes = [], [], [], [], []
+        codebook: Dict[Any, int] = {}
+        uniques: List[Any] = []
+        seqs: List[Tuple[int, Any]] = []  # (row, list/tuple value), for "contains"
+        for row, v in enumerate(values):
+            if v is None:
+                present.append(False)
+                simple.append(False)
+                is_num.append(False)
+                num.append(math.nan)
+                codes.append(-1)
+                continue
+            present.append(True)
+            number = _is_number(v)
+            if number or type(v) is str:
+                code = codebook.get(v)
+                if code is None:
+                    code = codebook[v] = len(uniques)
+                    uniques.append(v)
+                simple.append(True)
+                codes.append(code)
+            else:
+                simple.append(False)
+                codes.append(-1)
+                if type(v) is list or type(v) is tuple:
+                    seqs.append((row, v))
+            is_num.append(number)
+            num.append(float(v) if number else math.nan)
+
+        self.present = np.array(present, dtype=bool)
+        self.simple = np.array(simple, dtype=bool)
+        self.is_num = np.array(is_num, dtype=bool)
+        self.num = np.array(num, dtype=np.float64)
+        self.codes = np.array(codes, dtype=np.int64)
+        self.codebook = codebook
+        self.uniques = uniques
+        self.seqs = seqs
+        self.is_seq = np.zeros(len(values), dtype=bool)
+        self.is_seq[[row for row, _ in seqs]] = True
+        self._contains: Dict[str, np.ndarray] = {}
+        self._members: Dict[Any, np.ndarray] = {}
+
+    def code(self, value: Any) -> Optional[int]:
+        """Code of the column value equal to `value`, if any (same == as Python)."""
+        if not _hashable(value):
+            return None
+        return self.codebook.get(value)
+
+    def contains_table(self, needle: str) -> np.ndarray:
+        """Per code: is it a str containing needle. Computed once per unique value."""
+        table = self._contains.get(needle)
+        if table is None:
+            table = np.array(
+                [type(u) is str and needle in u for u in self.uniques] + [False], dtype=bool
+            )
+            self._contains[needle] = table
+        return table
+
+    def member_mask(self, value: Any) -> np.ndarray:
+        """Rows holding a list/tuple that contains value (== semantics, like `in`)."""
+        key = (type(value), value) if _hashable(value) else None
+        mask = self._members.get(key) if key is not None else None
+        if mask is None:
+            mask = np.zeros(len(self.present), dtype=bool)
+            mask[[row for row, seq in self.seqs if value in seq]] = True
+            if key is not None:
+                self._members[key] = mask
+        return mask
+
+
+class _Chunk:
+    """Columns for one chunk of payloads, built on first use."""
+
+    def __init__(self, contexts: List[Dict[str, Any]], symptom_sets: List[set], fact_getters: Dict[str, Any]):
+        self.n = len(contexts)
+        self.contexts = contexts
+        self.symptom_sets = symptom_sets
+        self._getters = fact_getters
+        self._columns: Dict[str, _Column] = {}
+        self._symptoms: Dict[str, np.ndarray] = {}
+        self._symptom_rows: Dict[str, np.ndarray] = {}
+        self._fact_rows: Dict[Tuple[str, Any], np.ndarray] = {}
+
+    def column(self, fact: str) -> _Column:
+        col = self._columns.get(fact)
+        if col is None:
+            get = self._getters[fact]
+            col = self._columns[fact] = _Column([get(c) for c in self.contexts])
+        return col
+
+    def build_symptoms(self, keys: Sequence[str]):
+        index = {k: i for i, k in enumerate(keys)}
+        hits: List[List[int]] = [[] for _ in keys]
+        for row, symptoms in enumerate(self.symptom_sets):
+            for s in symptoms:
+                i = index.get(s)
+                if i is not None:
+                    hits[i].append(row)
+        for key, rows in zip(keys, hits):
+            mask = np.zeros(self.n, dtype=bool)
+            mask[rows] = True
+            self._symptoms[key] = mask
+            self._symptom_rows[key] = np.array(rows, dtype=np.intp)
+
+    def symptom(self, key: str) -> np.ndarray:
+        return self._symptoms[key]
+
+    def symptom_rows(self, key: str) -> np.ndarray:
+        return self._symptom_rows[key]
+
+    def fact_rows(self, fact: str, value: Any) -> np.ndarray:
+        rows = self._fact_rows.get((fact, value))
+        if rows is None:
+            # Rows equal to the guard value, plus rows the columns cannot
+            # represent (left to the scalar candidate check).
+            col = self.column(fact)
+            code = col.code(value)
+            mask = col.present & ~col.simple
+            if code is not None:
+                mask = mask | (col.codes == code)
+            rows = np.flatnonzero(mask)
+            self._fact_rows[(fact, value)] = rows
+        return rows
+
+
+# Clause specs: (kind, fact, arg). Mirrors rules_engine._compile_clause.
+_NEVER = ("never", None, None)
+
+
+def _clause_spec(clause: Any) -> Tuple[str, Optional[str], Any]:
+    if not isinstance(clause, dict):
+        return _NEVER
+    fact = clause.get("fact")
+    op = clause.get("op")
+    value = clause.get("value")
+    if not fact or not op:
+        return _NEVER
+    if op == "has":
+        return _NEVER if value is None else ("has", None, canonical_symptom(str(value)))
+    fact = str(fact)
+    if op == "exists":
+        return ("exists", fact, None)
+    if op in ("==", "!="):
+        return (op, fact, value)
+    if op in _NUMPY_OPS:
+        return ("cmp", fact, (op, value))
+    if op == "in":
+        if not isinstance(value, (list, tuple, set)):
+            return _NEVER
+        return ("in", fact, tuple(value))
+    if op == "contains":
+        return ("contains", fact, value)
+    return _NEVER
+
+
+def _take(arr: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+    return arr if rows is None else arr[rows]
+
+
+def _eval_spec(spec, chunk: _Chunk, rows: Optional[np.ndarray], size: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """(mask, fallback) over `rows` (None = all rows). fallback rows need the scalar check."""
+    kind, fact, arg = spec
+    if kind == "never":
+        return np.zeros(size, dtype=bool), None
+    if kind == "has":
+        return _take(chunk.symptom(arg), rows), None
+
+    col = chunk.column(fact)
+    present = _take(col.present, rows)
+    if kind == "exists":
+        return present, None
+
+    simple = _take(col.simple, rows)
+    exotic = present & ~simple
+
+    if kind in ("==", "!="):
+        code = col.code(arg)
+        if code is None:
+            eq = np.zeros(size, dtype=bool)
+        else:
+            eq = _take(col.codes, rows) == code
+        return (eq if kind == "==" else simple & ~eq), exotic
+
+    if kind == "cmp":
+        op, value = arg
+        if not (_is_number(value) or (type(value) is float and math.isnan(value))):
+            return np.zeros(size, dtype=bool), present
+        is_num = _take(col.is_num, rows)
+        with np.errstate(invalid="ignore"):
+            mask = _NUMPY_OPS[op](_take(col.num, rows), value) & is_num
+        return mask, present & ~is_num
+
+    if kind == "in":
+        codes = [c for c in (col.code(v) for v in arg) if c is not None]
+        mask = np.isin(_take(col.codes, rows), codes) if codes else np.zeros(size, dtype=bool)
+        return mask, exotic
+
+    if kind == "contains":
+        table = col.contains_table(str(arg))
+        mask = table[_take(col.codes, rows)]
+        if col.seqs:
+            mask |= _take(col.member_mask(arg), rows)
+        return mask, exotic & ~_take(col.is_seq, rows)
+
+    raise ValueError(f"unknown clause kind {kind!r}")
+
+
+class _VectorRule:
+    __slots__ = ("pos", "rule", "all", "any", "none", "bucket", "bucket_key", "rank")
+
+    def __init__(self, pos: int, rule, row: Dict[str, Any], bucket: Optional[Tuple[str, Any]]):
+        conditions = row["conditions"]
+        self.pos = pos
+        self.rule = rule
+        self.all = tuple(_clause_spec(c) for c in (conditions.get("all", []) or ()))
+        self.any = tuple(_clause_spec(c) for c in (conditions.get("any", []) or ()))
+        self.none = tuple(_clause_spec(c) for c in (conditions.get("none", []) or ()))
+        # ("symptom", key) / ("fact", (fact, value)) / None = unindexed
+        self.bucket = bucket
+        self.bucket_key = {bucket[1]: True} if bucket and bucket[0] == "fact" else None
+        self.rank = rule.triage_rank
+
+    def candidate_rows(self, chunk: _Chunk) -> Optional[np.ndarray]:
+        if self.bucket is None:
+            return None
+        kind, key = self.bucket
+        if kind == "symptom":
+            return chunk.symptom_rows(key)
+        return chunk.fact_rows(*key)
+
+    def is_candidate(self, context: Dict[str, Any], symptoms_set: set) -> bool:
+        """Scalar form of candidate_rows, same lookup as RuleSet.candidates."""
+        if self.bucket is None:
+            return True
+        kind, key = self.bucket
+        if kind == "symptom":
+            return key in symptoms_set
+        fact = key[0]
+        value = context.get(fact)
+        if value is None:
+            return False
+        try:
+            return self.bucket_key.get((fact, value), False)
+        except TypeError:
+            return False
+
+
+class VectorRuleSet:
+    """A RuleSet prepared for evaluate_population()."""
+
+    def __init__(self, ruleset: RuleSet):
+        self.version = ruleset.version
+        bucket_of: Dict[int, Tuple[str, Any]] = {}
+        for key, positions in ruleset.by_symptom.items():
+            for pos in positions:
+                bucket_of[pos] = ("symptom", key)
+        for key, positions in ruleset.by_fact.items():
+            for pos in positions:
+                bucket_of[pos] = ("fact", key)
+
+        self.rules = tuple(
+            _VectorRule(pos, rule, row, bucket_of.get(pos))
+            for pos, (rule, row) in enumerate(zip(ruleset.rules, ruleset.rows))
+        )
+        self.rule_ids = np.array([r.rule_id for r in ruleset.rules], dtype=np.int64)
+        self.triages = [r.triage for r in ruleset.rules]
+
+        facts, symptoms = set(), set()
+        for vr in self.rules:
+            for kind, fact, arg in vr.all + vr.any + vr.none:
+                if kind == "has":
+                    symptoms.add(arg)
+                elif fact is not None:
+                    facts.add(fact)
+            if vr.bucket is not None:
+                if vr.bucket[0] == "symptom":
+                    symptoms.add(vr.bucket[1])
+                else:
+                    facts.add(vr.bucket[1][0])
+        self.fact_getters = {f: _compile_fact(f) for f in facts}
+        self.symptom_keys = tuple(sorted(symptoms))
+
+
+def _rule_mask(vr: _VectorRule, chunk: _Chunk, rows: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    size = chunk.n if rows is None else len(rows)
+    ok = np.ones(size, dtype=bool)
+    fallback = np.zeros(size, dtype=bool)
+
+    for spec in vr.all:
+        m, f = _eval_spec(spec, chunk, rows, size)
+        ok &= m
+        if f is not None:
+            fallback |= f
+    if vr.any:
+        any_ok = np.zeros(size, dtype=bool)
+        for spec in vr.any:
+            m, f = _eval_spec(spec, chunk, rows, size)
+            any_ok |= m
+            if f is not None:
+                fallback |= f
+        ok &= any_ok
+    for spec in vr.none:
+        m, f = _eval_spec(spec, chunk, rows, size)
+        ok &= ~m
+        if f is not None:
+            fallback |= f
+    return ok, fallback
+
+
+def _evaluate_chunk(vrs: VectorRuleSet, payloads: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    contexts, symptom_sets = [], []
+    for p in payloads:
+        context, symptoms_set = _context_for(p)
+        contexts.append(context)
+        symptom_sets.append(symptoms_set)
+
+    chunk = _Chunk(contexts, symptom_sets, vrs.fact_getters)
+    chunk.build_symptoms(vrs.symptom_keys)
+    n = chunk.n
+
+    hit_rows: List[np.ndarray] = []
+    hit_pos: List[np.ndarray] = []
+    best_rank = np.full(n, -1, dtype=np.int8)
+    best_pos = np.full(n, -1, dtype=np.int64)
+    errors: Dict[int, str] = {}
+
+    for vr in vrs.rules:
+        rows = vr.candidate_rows(chunk)
+        if rows is not None and len(rows) == 0:
+            continue
+        ok, fallback = _rule_mask(vr, chunk, rows)
+
+        for i in np.flatnonzero(fallback).tolist():
+            row = i if rows is None else int(rows[i])
+            context, symptoms_set = contexts[row], symptom_sets[row]
+            if not vr.is_candidate(context, symptoms_set):
+                ok[i] = False
+                continue
+            try:
+                ok[i] = vr.rule.matches(context, symptoms_set)
+            except Exception as e:
+                errors.setdefault(row, f"{type(e).__name__}: {e}")
+                ok[i] = False
+
+        matched = np.flatnonzero(ok)
+        if len(matched) == 0:
+            continue
+        if rows is not None:
+            matched = rows[matched]
+        hit_rows.append(matched)
+        hit_pos.append(np.full(len(matched), vr.pos, dtype=np.int64))
+
+        if vr.rank >= 0:
+            better = matched[best_rank[matched] < vr.rank]
+            best_rank[better] = vr.rank
+            best_pos[better] = vr.pos
+
+    if hit_rows:
+        all_rows = np.concatenate(hit_rows)
+        all_pos = np.concatenate(hit_pos)
+        order = np.lexsort((all_pos, all_rows))
+        all_rows = all_rows[order]
+        sorted_ids = vrs.rule_ids[all_pos[order]]
+        bounds = np.searchsorted(all_rows, np.arange(n + 1)).tolist()
+    else:
+        sorted_ids = np.empty(0, dtype=np.int64)
+        bounds = [0] * (n + 1)
+
+    results: List[Dict[str, Any]] = []
+    best = best_pos.tolist()
+    for row in range(n):
+        if row in errors:
+            results.append({"error": errors[row]})
+            continue
+        results.append({
+            "matched_rule_ids": sorted_ids[bounds[row]:bounds[row + 1]].tolist(),
+            "triage": vrs.triages[best[row]] if best[row] >= 0 else _NO_TRIAGE,
+        })
+    return results
+
+
+def evaluate_population(
+    ruleset: RuleSet | VectorRuleSet,
+    payloads: Sequence[Dict[str, Any]],
+    *,
+    chunk_size: int = 65536,
+) -> List[Dict[str, Any]]:
+    """
+    Evaluate every payload (same shape as evaluate_rules) against one rule
+    set. Returns, in input order, {"matched_rule_ids": [...], "triage": {...}}
+    per payload, or {"error": "..."} where the scalar engine would raise.
+    """
+    vrs = ruleset if isinstance(ruleset, VectorRuleSet) else VectorRuleSet(ruleset)
+    results: List[Dict[str, Any]] = []
+    for i in range(0, len(payloads), chunk_size):
+        results.extend(_evaluate_chunk(vrs, payloads[i:i + chunk_size]))
+    return results
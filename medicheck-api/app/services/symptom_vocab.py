@@ -0,0 +1,163 @@
+import re
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Tuple
+
+from app.core.cache import TTLCache, MISSING
+from app.core.config import settings
+from app.core.db import get_conn
+
+# Symptom vocabulary shared by the rules engine and clinical_rules.
+#
+# Text is normalized to lower-case word tokens ("Shortness-of-breath",
+# "shortness_of_breath" and "SHORTNESS OF BREATH" are all the same). Every
+# canonical key and alias is indexed twice:
+#
+#   _index  normalized phrase -> key, for a whole reported symptom
+#           ("SOB" -> shortness_of_breath)
+#   _trie   token trie for finding known symptoms inside free text
+#           ("sudden chest pain and sob" -> chest_pain, shortness_of_breath)
+#
+# Both are linear in the length of the input. Results are cached per raw
+# string. The built-in entries are extended at startup with
+# medicheck.symptoms and medicheck.symptom_aliases.
+
+BUILTIN_SYMPTOMS: Dict[str, Tuple[str, ...]] = {
+    "chest_pain": ("chest pressure", "chest tightness", "chest discomfort"),
+    "shortness_of_breath": (
+        "short of breath", "sob", "dyspnea", "dyspnoea", "breathlessness",
+        "difficulty breathing", "trouble breathing", "breathing difficulty",
+    ),
+    "confusion": ("altered mental status", "disoriented", "disorientation"),
+    "fainting": ("syncope", "near syncope", "fainted", "passed out"),
+    "loss_of_consciousness": ("unconscious", "unresponsive", "blacked out", "loc"),
+    "severe_headache": ("worst headache of life", "thunderclap headache"),
+    "headache": ("head ache", "head pain", "cephalgia"),
+    "neck_stiffness": ("stiff neck",),
+    "high_fever": ("high temperature", "hyperpyrexia"),
+    "fever": ("febrile", "pyrexia"),
+    "cough": ("coughing",),
+    "sore_throat": ("throat pain", "painful swallowing"),
+    "dysuria": ("painful urination", "burning urination", "burning with urination"),
+    "abdominal_pain": ("stomach pain", "stomach ache", "stomachache", "belly pain", "tummy ache"),
+}
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+_END = ""  # trie terminal marker; never a token
+
+
+def normalize(raw: str) -> Tuple[str, ...]:
+    return tuple(_TOKEN_RE.findall(raw.lower()))
+
+
+class SymptomMatch(NamedTuple):
+    key: str  # canonical key, or the normalized snake_case text if unknown
+    mentions: Tuple[str, ...]  # known symptoms found inside the text, in order
+
+
+class SymptomVocabulary:
+    def __init__(self, entries: Mapping[str, Iterable[str]]):
+        index: Dict[str, str] = {}
+        trie: Dict[str, dict] = {}
+
+        def add(phrase: str, key: str):
+            tokens = normalize(phrase)
+            if not tokens or " ".join(tokens) in index:
+                return
+            index[" ".join(tokens)] = key
+            node = trie
+            for t in tokens:
+                node = node.setdefault(t, {})
+            node[_END] = key
+
+        keys = {k: "_".join(normalize(k)) for k in entries}
+        # Canonical names first so they win over another key's alias.
+        for raw_key, key in keys.items():
+            add(raw_key, key)
+        for raw_key, aliases in entries.items():
+            for alias in aliases:
+                add(alias, keys[raw_key])
+
+        self.keys = frozenset(k for k in keys.values() if k)
+        self._index = index
+        self._trie = trie
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def lookup(self, raw: str) -> SymptomMatch:
+        tokens = normalize(raw)
+        key = self._index.get(" ".join(tokens)) or "_".join(tokens)
+
+        # Longest match at each position, then continue after it.
+        mentions: List[str] = []
+        trie = self._trie
+        i, n = 0, len(tokens)
+        while i < n:
+            node = trie
+            found, end = None, i
+            j = i
+            while j < n:
+                node = node.get(tokens[j])
+                if node is None:
+                    break
+                j += 1
+                if _END in node:
+                    found, end = node[_END], j
+            if found is None:
+                i += 1
+                continue
+            if found not in mentions:
+                mentions.append(found)
+            i = end
+        return SymptomMatch(key, tuple(mentions))
+
+
+_vocab = SymptomVocabulary(BUILTIN_SYMPTOMS)
+_lookups = TTLCache(maxsize=settings.SYMPTOM_CACHE_MAX_ENTRIES)
+
+
+def lookup_symptom(raw: str) -> SymptomMatch:
+    match = _lookups.get(raw)
+    if match is not MISSING:
+        return match
+    generation = _lookups.generation
+    match = _vocab.lookup(raw)
+    _lookups.set(raw, match, generation=generation)
+    return match
+
+
+def canonical_symptom(raw: str) -> str:
+    """Canonical key for one reported symptom ("" for blank input)."""
+    return lookup_symptom(raw).key
+
+
+def mentioned_symptoms(text: str) -> Tuple[str, ...]:
+    """Canonical keys of the known symptoms mentioned in free text."""
+    return lookup_symptom(text).mentions
+
+
+def symptom_phrase(key: str) -> str:
+    return key.replace("_", " ")
+
+
+def set_vocabulary(vocab: SymptomVocabulary):
+    global _vocab
+    _vocab = vocab
+    _lookups.clear()
+
+
+async def load_symptom_vocabulary():
+    """Built-in entries plus the symptom keys and aliases stored in the database."""
+    entries: Dict[str, List[str]] = {k: list(v) for k, v in BUILTIN_SYMPTOMS.items()}
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT key, display_name FROM medicheck.symptoms")
+            for row in await cur.fetchall():
+                entries.setdefault(row["key"], []).append(row["display_name"])
+            await cur.execute("SELECT alias, symptom_key FROM medicheck.symptom_aliases")
+            for row in await cur.fetchall():
+                entries.setdefault(row["symptom_key"], []).append(row["alias"])
+    set_vocabulary(SymptomVocabulary(entries))
+
+
+def symptom_vocab_stats() -> dict:
+    return {"terms": len(_vocab), "keys": len(_vocab.keys), "cache": _lookups.stats()}
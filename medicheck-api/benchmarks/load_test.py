@@ -0,0 +1,125 @@
+"""
+HTTP load generator for comparing API builds (e.g. the sync and async
+request paths) at increasing concurrency. Standard library only.
+
+Run two builds side by side against the same database, then:
+
+    python benchmarks/load_test.py \
+        --target sync=http://127.0.0.1:8001 --target async=http://127.0.0.1:8000 \
+        --path "/notes?authorization=<jwt>" --concurrency 8,32,128 --duration 20
+
+For each target and concurrency level it reports throughput, p50/p95/p99
+latency and error count. Use --json to keep the raw numbers.
+"""
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+
+def _worker(base, method, path, body, headers, deadline, latencies, errors, lock):
+    parts = urlsplit(base)
+    conn_cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    conn = conn_cls(parts.hostname, parts.port, timeout=30)
+    local_lat, local_err = [], 0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status >= 500:
+                local_err += 1
+            else:
+                local_lat.append((time.perf_counter() - started) * 1000.0)
+        except (OSError, http.client.HTTPException):
+            local_err += 1
+            conn.close()
+            conn = conn_cls(parts.hostname, parts.port, timeout=30)
+    conn.close()
+    with lock:
+        latencies.extend(local_lat)
+        errors[0] += local_err
+
+
+def run(base, method, path, body, headers, concurrency, duration):
+    latencies, errors, lock = [], [0], threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(
+            target=_worker,
+            args=(base, method, path, body, headers, deadline, latencies, errors, lock),
+            daemon=True,
+        )
+        for _ in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 50), 2),
+        "p95_ms": round(_percentile(latencies, 95), 2),
+        "p99_ms": round(_percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--target", action="append", required=True, help="label=base_url (repeatable)")
+    ap.add_argument("--path", default="/health")
+    ap.add_argument("--method", default="GET")
+    ap.add_argument("--body", default=None, help="JSON request body")
+    ap.add_argument("--header", action="append", default=[], help="Name: value (repeatable)")
+    ap.add_argument("--concurrency", default="8,32,128")
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    ap.add_argument("--json", dest="json_out", default=None, help="write results to this file")
+    args = ap.parse_args()
+
+    headers = {}
+    for h in args.header:
+        name, _, value = h.partition(":")
+        headers[name.strip()] = value.strip()
+    body = args.body.encode() if args.body else None
+    if body:
+        headers.setdefault("Content-Type", "application/json")
+
+    results = []
+    print(f"{'target':<10} {'conc':>5} {'rps':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'errors':>7}")
+    for level in [int(c) for c in args.concurrency.split(",")]:
+        for target in args.target:
+            label, _, base = target.partition("=")
+            r = run(base, args.method, args.path, body, headers, level, args.duration)
+            r["target"] = label
+            results.append(r)
+            print(
+                f"{label:<10} {level:>5} {r['rps']:>9} {r['p50_ms']:>8} "
+                f"{r['p95_ms']:>8} {r['p99_ms']:>8} {r['errors']:>7}"
+            )
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Login burst vs. the rest of the API: login throughput under the bcrypt
+process pool, and how much a login storm slows unrelated routes.
+
+Create a test user first, then run against a single server:
+
+    uvicorn app.main:app --workers 1 &
+    python benchmarks/login_load_test.py --base http://127.0.0.1:8000 \
+        --email bench@example.com --password secret \
+        --probe-path "/notes?authorization=<jwt>" --login-concurrency 64 --duration 20 \
+        --ops-token "$OPS_TOKEN"
+
+Two phases are run for --duration seconds each:
+
+  baseline  only the probe route, at --probe-concurrency
+  storm     the same probe load plus --login-concurrency clients looping
+            on POST /auth/login
+
+It reports login rps with ok / 401 / 503 (rejected by the hashing pool)
+counts, probe latency percentiles in both phases, and the server's
+password_pool stats from /health/stats.
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+from load_test import _percentile
+
+
+def _connect(base):
+    parts = urlsplit(base)
+    cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    return cls(parts.hostname, parts.port, timeout=60)
+
+
+def _loop(base, method, path, body, headers, stop, out, lock):
+    conn = _connect(base)
+    latencies, statuses = [], {}
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            status = resp.status
+        except (OSError, http.client.HTTPException):
+            status = "error"
+            conn.close()
+            conn = _connect(base)
+        latencies.append((time.perf_counter() - started) * 1000.0)
+        statuses[status] = statuses.get(status, 0) + 1
+    conn.close()
+    with lock:
+        out["latencies"].extend(latencies)
+        for k, v in statuses.items():
+            out["statuses"][k] = out["statuses"].get(k, 0) + v
+
+
+def _start(n, *args):
+    out = {"latencies": [], "statuses": {}}
+    lock = threading.Lock()
+    threads = [threading.Thread(target=_loop, args=(*args, out, lock), daemon=True) for _ in range(n)]
+    for t in threads:
+        t.start()
+    return threads, out
+
+
+def _summary(out, elapsed):
+    lat = sorted(out["latencies"])
+    return {
+        "requests": len(lat),
+        "rps": round(len(lat) / elapsed, 1),
+        "p50_ms": round(_percentile(lat, 50), 2),
+        "p95_ms": round(_percentile(lat, 95), 2),
+        "p99_ms": round(_percentile(lat, 99), 2),
+        "statuses": {str(k): v for k, v in sorted(out["statuses"].items(), key=str)},
+    }
+
+
+def _phase(args, with_logins):
+    stop = threading.Event()
+    probe_threads, probe = _start(args.probe_concurrency, args.base, "GET", args.probe_path, None, {}, stop)
+    login_threads, login = [], None
+    if with_logins:
+        body = json.dumps({"email": args.email, "password": args.password}).encode()
+        login_threads, login = _start(
+            args.login_concurrency, args.base, "POST", "/auth/login", body,
+            {"Content-Type": "application/json"}, stop,
+        )
+    started = time.perf_counter()
+    time.sleep(args.duration)
+    stop.set()
+    for t in probe_threads + login_threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return _summary(probe, elapsed), (_summary(login, elapsed) if login else None)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--base", required=True)
+    ap.add_argument("--email", required=True)
+    ap.add_argument("--password", required=True)
+    ap.add_argument("--probe-path", default="/health")
+    ap.add_argument("--probe-concurrency", type=int, default=8)
+    ap.add_argument("--login-concurrency", type=int, default=64)
+    ap.add_argument("--duration", type=float, default=15.0, help="seconds per phase")
+    ap.add_argument("--ops-token", default="", help="OPS_TOKEN, to read /health/stats")
+    ap.add_argument("--json", dest="json_out", default=None)
+    args = ap.parse_args()
+
+    baseline, _ = _phase(args, with_logins=False)
+    storm, logins = _phase(args, with_logins=True)
+
+    conn = _connect(args.base)
+    conn.request("GET", "/health/stats", headers={"Authorization": f"Bearer {args.ops_token}"})
+    resp = conn.getresponse()
+    body = resp.read()
+    pool = json.loads(body).get("password_pool") if resp.status == 200 else f"unavailable (HTTP {resp.status})"
+    conn.close()
+
+    print(f"{'phase':<18}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}  statuses")
+    for label, r in (("probe baseline", baseline), ("probe + logins", storm), ("logins", logins)):
+        print(f"{label:<18}{r['rps']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}  {r['statuses']}")
+    print(f"password_pool: {pool}")
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump({"baseline": baseline, "storm": storm, "logins": logins, "password_pool": pool}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
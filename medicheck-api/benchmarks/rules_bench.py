@@ -0,0 +1,236 @@
+"""
+Rules engine scaling benchmark. Runs in-process against rule sets compiled
+in memory (compile_ruleset over synthetic rows), so no PostgreSQL is needed.
+
+    python benchmarks/rules_bench.py                      # compare with the baseline
+    python benchmarks/rules_bench.py --save-baseline      # record a new baseline
+    python benchmarks/rules_bench.py --sizes 100,1000 --threshold 0.2
+
+For each rule-set size it generates synthetic rules (benchmarks/rules_synth.py:
+varied all/any/none depth, every op in rules_engine._compare) and payloads
+validated through EvaluateRulesRequest, then reports:
+
+  compile_ms        compile_ruleset() time
+  evals_per_s       single-thread throughput of one evaluation (_evaluate,
+                    i.e. evaluate_rules after the rule-set cache is warm),
+                    best of --repeat runs
+  speedup           evals_per_s over that of the reference evaluator (the
+                    uncompiled _eval_conditions scanning every rule), timed
+                    turn about with it; median over the --repeat rounds
+  p50/p95/p99_us    per-evaluation latency
+  alloc_kib_mean    mean peak Python allocation per evaluation (tracemalloc,
+  alloc_kib_max     measured in a separate pass so it does not skew latency)
+
+With a baseline file present, the run fails (exit 1) if the speedup for any
+size drops by more than --threshold (fraction) against it. The speedup is
+a ratio of two timings taken side by side, so it carries over between
+machines far better than evals_per_s, which is reported for information.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("JWT_SECRET", "benchmark-secret-" + "x" * 32)
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/unused")
+
+import rules_synth  # noqa: E402
+from app.schemas.rules import EvaluateRulesRequest  # noqa: E402
+from app.services.rules_engine import compile_ruleset, _context_for, _eval_conditions, _evaluate  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "rules_bench.json")
+
+
+def _pct(sorted_ns, pct):
+    k = min(len(sorted_ns) - 1, max(0, int(round(pct / 100.0 * len(sorted_ns))) - 1))
+    return sorted_ns[k] / 1000.0
+
+
+def _reference(rows):
+    """The yardstick: no compilation, no index, every rule's JSON walked per evaluation."""
+    rows = [r for r in rows if isinstance(r["conditions"], dict)]
+
+    def evaluate(payload):
+        context, symptoms_set = _context_for(payload)
+        matched = []
+        for row in rows:
+            try:
+                if _eval_conditions(row["conditions"], context, symptoms_set):
+                    matched.append(row["id"])
+            except AttributeError:  # non-dict clause; never true when compiled
+                pass
+        return matched
+
+    return evaluate
+
+
+def _timed_run(evaluate, payloads, args, min_evals):
+    run = []
+    deadline = time.perf_counter() + args.min_time
+    i = 0
+    while len(run) < min_evals or time.perf_counter() < deadline:
+        p = payloads[i % len(payloads)]
+        t0 = time.perf_counter_ns()
+        evaluate(p)
+        run.append(time.perf_counter_ns() - t0)
+        i += 1
+        if len(run) >= args.max_evals:
+            break
+    return run
+
+
+def bench_size(n_rules, args):
+    rows = rules_synth.rules(n_rules, seed=args.seed, max_clauses=args.max_clauses)
+    payloads = [
+        EvaluateRulesRequest(**p).model_dump()
+        for p in rules_synth.payloads(args.payloads, seed=args.seed + 1)
+    ]
+
+    started = time.perf_counter()
+    ruleset = compile_ruleset(rows, version=1)
+    compile_ms = (time.perf_counter() - started) * 1000.0
+
+    for p in payloads[: min(len(payloads), 50)]:
+        _evaluate(ruleset, p)  # warm-up
+
+    # Best of --repeat runs for throughput (least disturbed by other load);
+    # latency percentiles over all samples. The reference runs right after
+    # the engine in every round, so each pair sees the same machine
+    # conditions; the speedup is the median of the per-round ratios.
+    reference = _reference(rows)
+    samples = []
+    ratios = []
+    best_rate = 0.0
+    for _ in range(args.repeat):
+        run = _timed_run(lambda p: _evaluate(ruleset, p), payloads, args, args.min_evals)
+        rate = len(run) / (sum(run) / 1e9)
+        best_rate = max(best_rate, rate)
+        samples.extend(run)
+        ref = _timed_run(reference, payloads, args, 5)
+        ratios.append(rate / (len(ref) / (sum(ref) / 1e9)))
+    samples.sort()
+
+    peaks = []
+    tracemalloc.start()
+    for p in payloads[: args.alloc_evals]:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        _evaluate(ruleset, p)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(max(peak - base, 0))
+    tracemalloc.stop()
+
+    return {
+        "rules": n_rules,
+        "evals": len(samples),
+        "compile_ms": round(compile_ms, 1),
+        "evals_per_s": round(best_rate, 1),
+        "speedup": round(statistics.median(ratios), 2),
+        "p50_us": round(_pct(samples, 50), 1),
+        "p95_us": round(_pct(samples, 95), 1),
+        "p99_us": round(_pct(samples, 99), 1),
+        "alloc_kib_mean": round(statistics.fmean(peaks) / 1024.0, 2) if peaks else 0.0,
+        "alloc_kib_max": round(max(peaks) / 1024.0, 2) if peaks else 0.0,
+    }
+
+
+def _machine():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Regressions as messages; empty when every size is within threshold."""
+    by_size = {r["rules"]: r for r in baseline.get("results", [])}
+    failures = []
+    for r in results:
+        base = by_size.get(r["rules"])
+        if not base or not base.get("speedup"):
+            continue
+        change = r["speedup"] / base["speedup"] - 1.0
+        r["vs_baseline"] = round(change, 3)
+        if change < -threshold:
+            failures.append(
+                f"{r['rules']} rules: {r['speedup']}x the reference vs baseline "
+                f"{base['speedup']}x ({change:+.1%}, threshold -{threshold:.0%})"
+            )
+    return failures
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="100,1000,10000,50000")
+    ap.add_argument("--payloads", type=int, default=500, help="distinct payloads per size")
+    ap.add_argument("--max-clauses", type=int, default=4, help="max clauses per all/any/none group")
+    ap.add_argument("--min-time", type=float, default=1.0, help="seconds per timed run")
+    ap.add_argument("--repeat", type=int, default=5, help="timed rounds per size; throughput is the best")
+    ap.add_argument("--min-evals", type=int, default=50)
+    ap.add_argument("--max-evals", type=int, default=200000)
+    ap.add_argument("--alloc-evals", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE)
+    ap.add_argument("--threshold", type=float, default=0.2, help="allowed speedup drop (fraction)")
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--json", dest="json_out", default=None, help="also write this run's results here")
+    args = ap.parse_args()
+
+    results = []
+    print(
+        f"{'rules':>7}{'compile_ms':>12}{'evals/s':>11}{'speedup':>9}"
+        f"{'p50_us':>10}{'p95_us':>10}{'p99_us':>10}{'alloc_kib':>11}"
+    )
+    for n in [int(s) for s in args.sizes.split(",")]:
+        r = bench_size(n, args)
+        results.append(r)
+        print(
+            f"{r['rules']:>7}{r['compile_ms']:>12}{r['evals_per_s']:>11}{r['speedup']:>8}x"
+            f"{r['p50_us']:>10}{r['p95_us']:>10}{r['p99_us']:>10}{r['alloc_kib_mean']:>11}"
+        )
+
+    run = {"machine": _machine(), "settings": {
+        "payloads": args.payloads, "max_clauses": args.max_clauses, "seed": args.seed,
+        "min_time": args.min_time, "repeat": args.repeat,
+    }, "results": results}
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(run, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(run, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --save-baseline to record one")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("machine") != run["machine"]:
+        print("note: baseline was recorded on a different machine/python; speedups still compare, evals/s do not")
+    if not any(r.get("speedup") for r in baseline.get("results", [])):
+        print("baseline has no speedup figures; re-record it with --save-baseline")
+        return
+    failures = compare(results, baseline, args.threshold)
+    if failures:
+        print("REGRESSION:")
+        for msg in failures:
+            print(f"  {msg}")
+        sys.exit(1)
+    print(f"ok: speedup within {args.threshold:.0%} of baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Response size and serialization cost of /rules/evaluate per response mode.
+In-process, against a synthetic rule set (benchmarks/rules_synth.py).
+
+    python benchmarks/rules_response_bench.py --rules 2000 --payloads 300
+
+Modes:
+
+  undeduped   the previous response shape: full matched_rules and every
+              rule's recommendations concatenated (rebuilt from a full
+              result for comparison)
+  full        matched_rules, recommendations deduplicated (as authored)
+  compact     matched_rule_ids instead of matched_rules; recommendations
+              carry their dedupe "id"
+  compact+stop  compact with stop_on_emergency
+
+For each mode: mean evaluation time, mean serialization time (what the route
+does: EvaluateRulesResponse validation + JSON dump with exclude_unset) and
+mean/max response bytes.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("JWT_SECRET", "benchmark-secret-" + "x" * 32)
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/unused")
+
+import rules_synth  # noqa: E402
+from app.schemas.rules import EvaluateRulesRequest, EvaluateRulesResponse  # noqa: E402
+from app.services.rules_engine import compile_ruleset, _evaluate  # noqa: E402
+
+MODES = {
+    "undeduped": {},
+    "full": {},
+    "compact": {"response_mode": "compact"},
+    "compact+stop": {"response_mode": "compact", "stop_on_emergency": True},
+}
+
+
+def _undeduped(result):
+    recs = []
+    for m in result["matched_rules"]:
+        for rec in m["outcomes"].get("recommendations") or ():
+            if isinstance(rec, dict):
+                recs.append(rec)
+    return {"triage": result["triage"], "recommendations": recs, "matched_rules": result["matched_rules"]}
+
+
+def _serialize(result):
+    return EvaluateRulesResponse.model_validate(result).model_dump_json(exclude_unset=True).encode()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rules", type=int, default=2000)
+    ap.add_argument("--payloads", type=int, default=300)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    ruleset = compile_ruleset(rules_synth.rules(args.rules, seed=args.seed), version=1)
+    base = [
+        EvaluateRulesRequest(**p).model_dump()
+        for p in rules_synth.payloads(args.payloads, seed=args.seed + 1)
+    ]
+
+    print(f"{'mode':>14}{'eval_us':>10}{'serialize_us':>14}{'bytes_mean':>12}{'bytes_max':>11}")
+    reference = None
+    for mode, options in MODES.items():
+        eval_ns, ser_ns, sizes = [], [], []
+        for p in base:
+            p = {**p, **options}
+            t0 = time.perf_counter_ns()
+            result = _evaluate(ruleset, p)
+            eval_ns.append(time.perf_counter_ns() - t0)
+            if mode == "undeduped":
+                result = _undeduped(result)
+            t0 = time.perf_counter_ns()
+            body = _serialize(result)
+            ser_ns.append(time.perf_counter_ns() - t0)
+            sizes.append(len(body))
+        row = (statistics.fmean(eval_ns) / 1000, statistics.fmean(ser_ns) / 1000, statistics.fmean(sizes))
+        reference = reference or row
+        print(
+            f"{mode:>14}{row[0]:>10.1f}{row[1]:>14.1f}{row[2]:>12.0f}{max(sizes):>11}"
+            f"   ({row[1] / reference[1]:.0%} serialize, {row[2] / reference[2]:.0%} bytes)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Synthetic medicheck.rules rows and EvaluateRulesRequest payloads for the
+rules benchmarks and differential checks. Deterministic for a given seed.
+
+Rules use every op in rules_engine._compare against the facts the engine
+knows (age, sex, pregnant, duration_hours, vitals.*, extras.*, symptoms),
+with 0-N clauses in each of all/any/none. `mixed=True` also produces the
+awkward inputs the engine must tolerate: mismatched types, lists, missing
+facts, None values and unknown ops.
+"""
+import random
+
+SYMPTOMS = [
+    "chest_pain", "shortness_of_breath", "cough", "fever", "rash", "headache",
+    "nausea", "vomiting", "dizziness", "abdominal_pain", "back_pain", "fatigue",
+    "sore_throat", "runny_nose", "palpitations", "confusion", "seizure",
+    "bleeding", "syncope", "wheezing", "joint_pain", "diarrhea", "chills",
+    "blurred_vision", "numbness", "weakness", "anxiety", "insomnia", "itching",
+    "swelling",
+]
+VITALS = {"temp_c": (34.0, 42.0), "hr": (35, 190), "rr": (6, 40), "spo2": (70, 100), "sbp": (70, 220)}
+LEVELS = ["emergency", "urgent", "routine", "self_care"]
+ORDERING = [">", ">=", "<", "<="]
+NUMERIC_FACTS = ["age", "duration_hours"] + [f"vitals.{k}" for k in VITALS]
+
+
+def _number(rng, fact):
+    if fact == "age":
+        return rng.randint(0, 100)
+    if fact == "duration_hours":
+        return rng.choice([1, 6, 12, 24, 48, 72, 168])
+    lo, hi = VITALS[fact.split(".", 1)[1]]
+    return round(rng.uniform(lo, hi), 1) if isinstance(lo, float) else rng.randint(lo, hi)
+
+
+def clause(rng, mixed=False):
+    kind = rng.random()
+    if kind < 0.35:
+        return {"fact": "symptom", "op": "has", "value": rng.choice(SYMPTOMS)}
+    if kind < 0.65:
+        fact = rng.choice(NUMERIC_FACTS)
+        return {"fact": fact, "op": rng.choice(ORDERING), "value": _number(rng, fact)}
+    if kind < 0.75:
+        return {"fact": "sex", "op": rng.choice(["==", "!="]), "value": rng.choice(["male", "female", "other"])}
+    if kind < 0.80:
+        return {"fact": "pregnant", "op": "==", "value": rng.choice([True, False])}
+    if kind < 0.85:
+        fact = rng.choice(["age", "duration_hours"])
+        return {"fact": fact, "op": "in", "value": sorted({_number(rng, fact) for _ in range(3)})}
+    if kind < 0.90:
+        return {"fact": "extras.tags", "op": "contains", "value": rng.choice(["smoker", "diabetic", "asthma"])}
+    if kind < 0.95:
+        return {"fact": "extras.note", "op": "contains", "value": rng.choice(["pain", "worse", "night"])}
+    if not mixed:
+        return {"fact": rng.choice(["vitals.spo2", "extras.travel"]), "op": "exists"}
+
+    # Awkward but valid inputs.
+    return rng.choice([
+        {"fact": "sex", "op": "in", "value": ["male", "other"]},
+        {"fact": "sex", "op": "in", "value": "male"},
+        {"fact": "extras.code", "op": "==", "value": rng.choice([1, "1", True, 1.0])},
+        {"fact": "extras.code", "op": "!=", "value": [1, 2]},
+        {"fact": "extras.tags", "op": "==", "value": ["smoker"]},
+        {"fact": "vitals", "op": "exists"},
+        {"fact": "symptom", "op": "has", "value": None},
+        {"fact": "symptom", "op": "==", "value": "fever"},
+        {"fact": "age", "op": "bogus", "value": 3},
+        {"fact": "", "op": "==", "value": 3},
+        {"fact": "extras.note", "op": "contains", "value": 4},
+        {"fact": "vitals.hr", "op": ">", "value": float("nan")},
+        {"fact": "extras.count", "op": "in", "value": [0, 1, 2]},
+        "not-a-clause",
+    ])
+
+
+def rule(rng, rule_id, max_clauses=4, mixed=False):
+    conditions = {}
+    for group, p in (("all", 0.9), ("any", 0.5), ("none", 0.3)):
+        if rng.random() < p:
+            conditions[group] = [clause(rng, mixed) for _ in range(rng.randint(1 if group == "all" else 0, max_clauses))]
+    outcomes = {
+        "recommendations": [
+            {"type": rng.choice(["test", "advice"]), "text": f"rec-{rng.randint(0, 50)}"}
+            for _ in range(rng.randint(0, 2))
+        ],
+    }
+    if rng.random() < 0.7:
+        outcomes["triage"] = {"level": rng.choice(LEVELS + (["unknown", "bogus"] if mixed else [])), "reason": f"rule {rule_id}"}
+    return {
+        "id": rule_id,
+        "module_id": rng.choice([None, 1, 2, 3]),
+        "name": f"rule-{rule_id}",
+        "severity": rng.choice(["low", "medium", "high"]),
+        "priority": rng.randint(1, 100),
+        "conditions": conditions,
+        "outcomes": outcomes,
+    }
+
+
+def rules(n, seed=1, max_clauses=4, mixed=False):
+    """n active rule rows ordered by (priority, id), as _load_ruleset returns them."""
+    rng = random.Random(seed)
+    rows = [rule(rng, i + 1, max_clauses, mixed) for i in range(n)]
+    rows.sort(key=lambda r: (r["priority"], r["id"]))
+    return rows
+
+
+def payload(rng, mixed=False):
+    vitals = {k: _number(rng, f"vitals.{k}") for k in VITALS if rng.random() < 0.6}
+    extras = {}
+    if rng.random() < 0.5:
+        extras["tags"] = rng.sample(["smoker", "diabetic", "asthma", "hypertension"], rng.randint(0, 3))
+    if rng.random() < 0.3:
+        extras["note"] = rng.choice(["pain at night", "getting worse", "mild"])
+    p = {
+        "symptoms": rng.sample(SYMPTOMS, rng.randint(0, 6)),
+        "age": rng.choice([None, rng.randint(0, 100)]),
+        "sex": rng.choice([None, "male", "female", "other"]),
+        "pregnant": rng.choice([None, True, False]),
+        "duration_hours": rng.choice([None, 2.0, 12.5, 30.0, 200.0]),
+        "vitals": vitals,
+        "extras": extras,
+    }
+    if mixed:
+        if rng.random() < 0.3:
+            extras["code"] = rng.choice([1, "1", True, 2.5, None, [1], 2 ** 60])
+        if rng.random() < 0.2:
+            extras["count"] = rng.choice([0, 1, False, "1"])
+        if rng.random() < 0.2:
+            extras["tags"] = rng.choice(["smoker, asthma", ("smoker",), 5])
+        if rng.random() < 0.1:
+            vitals["hr"] = rng.choice(["fast", float("nan"), None, [80]])
+        if rng.random() < 0.1:
+            p["age"] = rng.choice([float("inf"), 2 ** 60, True, "42"])
+        if rng.random() < 0.05:
+            p["sex"] = rng.choice([["male"], 1])
+        if rng.random() < 0.1:
+            p["symptoms"] = p["symptoms"] + [" fever ", ""]
+    return p
+
+
+def payloads(n, seed=2, mixed=False):
+    rng = random.Random(seed)
+    return [payload(rng, mixed) for _ in range(n)]
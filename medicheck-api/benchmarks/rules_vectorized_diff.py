@@ -0,0 +1,105 @@
+"""
+Differential check: the columnar evaluator (app/services/rules_vectorized.py)
+must agree with the scalar engine (rules_engine._evaluate) on every payload.
+
+    python benchmarks/rules_vectorized_diff.py --rounds 50 --rules 300 --payloads 2000
+
+Each round generates a fresh synthetic rule set and payload population
+(benchmarks/rules_synth.py, including malformed clauses and mixed-type
+facts), evaluates both ways and compares matched rule ids and best triage.
+Where the scalar engine raises, the columnar result must be an error too.
+Exits non-zero on the first mismatch. --timing also prints the speedup.
+tests/test_rules_vectorized.py runs a few rounds through diff_round().
+"""
+import argparse
+import os
+import sys
+import time
+
+# The API root for `app`, and this directory for rules_synth when imported
+# as a module (python -m benchmarks.rules_vectorized_diff, pytest).
+_HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [p for p in (os.path.join(_HERE, ".."), _HERE) if p not in sys.path]
+os.environ.setdefault("JWT_SECRET", "benchmark-secret-" + "x" * 32)
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/unused")
+
+import rules_synth  # noqa: E402
+from app.services.rules_engine import compile_ruleset, _evaluate  # noqa: E402
+from app.services.rules_vectorized import VectorRuleSet, evaluate_population  # noqa: E402
+
+
+def _scalar(ruleset, payload):
+    try:
+        result = _evaluate(ruleset, payload)
+    except Exception as e:
+        return {"error": type(e).__name__}
+    return {
+        "matched_rule_ids": [m["rule_id"] for m in result["matched_rules"]],
+        "triage": result["triage"],
+    }
+
+
+def diff_round(seed, n_rules, n_payloads, chunk_size=512, mixed=False):
+    """
+    Evaluate one synthetic population both ways. Returns (mismatches,
+    compared, scalar errors, scalar seconds, columnar seconds); each mismatch
+    is (payload index, payload, scalar result, columnar result).
+    """
+    ruleset = compile_ruleset(rules_synth.rules(n_rules, seed=seed, mixed=mixed), version=seed)
+    payloads = rules_synth.payloads(n_payloads, seed=seed * 7919, mixed=mixed)
+
+    started = time.perf_counter()
+    expected = [_scalar(ruleset, p) for p in payloads]
+    scalar_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    got = evaluate_population(VectorRuleSet(ruleset), payloads, chunk_size=chunk_size)
+    vector_s = time.perf_counter() - started
+
+    mismatches = []
+    errors = 0
+    for i, (exp, res) in enumerate(zip(expected, got)):
+        if "error" in exp:
+            errors += 1
+            ok = "error" in res
+        else:
+            ok = res == exp
+        if not ok:
+            mismatches.append((i, payloads[i], exp, res))
+    return mismatches, len(payloads), errors, scalar_s, vector_s
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rounds", type=int, default=20)
+    ap.add_argument("--rules", type=int, default=300)
+    ap.add_argument("--payloads", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--chunk-size", type=int, default=512, help="small chunks exercise chunk boundaries")
+    ap.add_argument("--timing", action="store_true")
+    args = ap.parse_args()
+
+    compared = errors = 0
+    scalar_s = vector_s = 0.0
+    for r in range(args.rounds):
+        seed = args.seed + r
+        mismatches, n, e, s_s, v_s = diff_round(seed, args.rules, args.payloads, args.chunk_size, mixed=r % 2 == 0)
+        if mismatches:
+            i, payload, exp, res = mismatches[0]
+            print(f"MISMATCH round={r} seed={seed} payload={i}")
+            print(f"  payload:  {payload!r}")
+            print(f"  scalar:   {exp!r}")
+            print(f"  columnar: {res!r}")
+            sys.exit(1)
+        compared += n
+        errors += e
+        scalar_s += s_s
+        vector_s += v_s
+
+    print(f"ok: {compared} payloads agree over {args.rounds} rounds ({errors} scalar errors matched)")
+    if args.timing:
+        print(f"scalar {scalar_s:.2f}s  columnar {vector_s:.2f}s  speedup x{scalar_s / vector_s:.1f}")
+
+
+if __name__ == "__main__":
+    main()
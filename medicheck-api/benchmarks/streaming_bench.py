@@ -0,0 +1,110 @@
+"""
+Compare buffered vs streamed responses for large records / message threads:
+time-to-first-byte, total time, bytes, and the server's peak RSS per request.
+
+Peak RSS is read from /proc/<pid>/status (VmHWM) after resetting it through
+/proc/<pid>/clear_refs, so run this on the API host (Linux) as the same
+user as a single-worker server:
+
+    uvicorn app.main:app --workers 1 &
+    python benchmarks/streaming_bench.py --base http://127.0.0.1:8000 \
+        --path "/patients/<patient_id>/records?authorization=<jwt>" \
+        --server-pid $(pgrep -f "uvicorn app.main:app") --repeat 5
+
+The path is requested as-is ("buffered") and with stream=true for the JSON
+and NDJSON formats.
+"""
+import argparse
+import http.client
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+def _reset_peak_rss(pid):
+    if pid:
+        with open(f"/proc/{pid}/clear_refs", "w") as f:
+            f.write("5")
+
+
+def _peak_rss_kb(pid):
+    if not pid:
+        return None
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return None
+
+
+def _rss_kb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def fetch(base, path, pid):
+    parts = urlsplit(base)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=300)
+    baseline_rss = _rss_kb(pid) if pid else None
+    _reset_peak_rss(pid)
+
+    started = time.perf_counter()
+    conn.request("GET", path)
+    resp = conn.getresponse()
+    first = resp.read1(65536) if hasattr(resp, "read1") else resp.read(1)
+    ttfb = time.perf_counter() - started
+    size = len(first)
+    while True:
+        chunk = resp.read(65536)
+        if not chunk:
+            break
+        size += len(chunk)
+    total = time.perf_counter() - started
+    conn.close()
+
+    peak = _peak_rss_kb(pid)
+    return {
+        "status": resp.status,
+        "ttfb_ms": ttfb * 1000.0,
+        "total_ms": total * 1000.0,
+        "bytes": size,
+        "peak_rss_growth_kb": (peak - baseline_rss) if peak is not None else None,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--base", required=True)
+    ap.add_argument("--path", required=True)
+    ap.add_argument("--server-pid", type=int, default=None)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    sep = "&" if "?" in args.path else "?"
+    modes = {
+        "buffered": args.path,
+        "stream-json": f"{args.path}{sep}stream=true&format=json",
+        "stream-ndjson": f"{args.path}{sep}stream=true&format=ndjson",
+    }
+
+    print(f"{'mode':<14} {'ttfb_ms':>9} {'total_ms':>9} {'bytes':>11} {'peak_rss_kb':>12}")
+    for mode, path in modes.items():
+        runs = [fetch(args.base, path, args.server_pid) for _ in range(args.repeat)]
+        bad = [r["status"] for r in runs if r["status"] != 200]
+        if bad:
+            print(f"{mode:<14} HTTP {bad[0]}")
+            continue
+        rss = [r["peak_rss_growth_kb"] for r in runs if r["peak_rss_growth_kb"] is not None]
+        print(
+            f"{mode:<14} {statistics.median(r['ttfb_ms'] for r in runs):>9.1f} "
+            f"{statistics.median(r['total_ms'] for r in runs):>9.1f} "
+            f"{runs[0]['bytes']:>11} "
+            f"{(max(rss) if rss else '-'):>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
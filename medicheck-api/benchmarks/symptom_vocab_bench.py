@@ -0,0 +1,98 @@
+"""
+Symptom vocabulary benchmark (app/services/symptom_vocab.py). In-process,
+no database needed.
+
+    python benchmarks/symptom_vocab_bench.py --keys 50000 --aliases 4
+
+Builds a synthetic vocabulary (--keys canonical keys with --aliases aliases
+each, 1-4 words per phrase) and reports:
+
+  build_ms          SymptomVocabulary construction
+  canonical_us      lookup() of a reported alias, uncached (hash of the
+                    normalized tokens plus the trie scan)
+  mentions_us       lookup() of free text, uncached, by text length
+  cached_us         lookup_symptom() on a repeated raw string (LRU hit)
+  naive_us          the substring approach it replaces: test every alias
+                    against the text (on a --naive-keys vocabulary, it is slow)
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("JWT_SECRET", "benchmark-secret-" + "x" * 32)
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/unused")
+
+from app.services import symptom_vocab  # noqa: E402
+from app.services.symptom_vocab import SymptomVocabulary  # noqa: E402
+
+
+def _word(rng):
+    return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9)))
+
+
+def vocabulary(n_keys, n_aliases, seed):
+    rng = random.Random(seed)
+    words = [_word(rng) for _ in range(max(100, n_keys // 2))]
+
+    def phrase():
+        return " ".join(rng.choice(words) for _ in range(rng.randint(1, 4)))
+
+    return {f"key_{i}": tuple(phrase() for _ in range(n_aliases)) for i in range(n_keys)}, words
+
+
+def _per_call_us(fn, items):
+    started = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - started) / len(items) * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--keys", type=int, default=50000)
+    ap.add_argument("--aliases", type=int, default=4)
+    ap.add_argument("--naive-keys", type=int, default=2000)
+    ap.add_argument("--samples", type=int, default=5000)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    entries, words = vocabulary(args.keys, args.aliases, args.seed)
+    started = time.perf_counter()
+    vocab = SymptomVocabulary(entries)
+    build_ms = (time.perf_counter() - started) * 1000.0
+    print(f"vocabulary: {args.keys} keys, {len(vocab)} phrases, build_ms {build_ms:.0f}")
+
+    rng = random.Random(args.seed + 1)
+    aliases = [a for v in entries.values() for a in v]
+    reported = [rng.choice(aliases).upper() for _ in range(args.samples)]
+    print(f"canonical_us  {_per_call_us(vocab.lookup, reported):8.2f}")
+
+    print(f"{'text_words':>10}{'mentions_us':>13}{'naive_us':>11}")
+    naive_entries = dict(list(entries.items())[: args.naive_keys])
+    naive_phrases = [(k, a) for k, v in naive_entries.items() for a in v]
+
+    def naive(text):
+        lowered = text.lower()
+        return [k for k, a in naive_phrases if a in lowered]
+
+    naive_vocab = SymptomVocabulary(naive_entries)
+    for n_words in (5, 20, 80):
+        texts = [" ".join(rng.choice(words) for _ in range(n_words)) for _ in range(max(50, args.samples // 10))]
+        mentions_us = _per_call_us(vocab.lookup, texts)
+        naive_us = _per_call_us(naive, texts[:50])
+        trie_small_us = _per_call_us(naive_vocab.lookup, texts)
+        print(f"{n_words:>10}{mentions_us:>13.2f}{naive_us:>11.1f}   (trie on the same {args.naive_keys} keys: {trie_small_us:.2f})")
+
+    symptom_vocab.set_vocabulary(vocab)
+    hot = reported[:100]
+    for s in hot:
+        symptom_vocab.lookup_symptom(s)
+    print(f"cached_us     {_per_call_us(symptom_vocab.lookup_symptom, hot * 50):8.2f}")
+    print(symptom_vocab.symptom_vocab_stats()["cache"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Offline tests: no database or server. Settings need these to import, and
+# the synthetic rule/payload generators live with the benchmarks.
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [p for p in (_ROOT, os.path.join(_ROOT, "benchmarks")) if p not in sys.path]
+os.environ.setdefault("JWT_SECRET", "test-secret-" + "x" * 32)
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/unused")
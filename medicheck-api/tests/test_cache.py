@@ -0,0 +1,54 @@
+import time
+
+import pytest
+
+from app.core.cache import MISSING, TTLCache
+
+
+@pytest.mark.parametrize("invalidate", [
+    lambda c: c.pop("k"),
+    lambda c: c.pop("other"),
+    lambda c: c.clear(),
+    lambda c: c.discard_where(lambda key: key == "k"),
+])
+def test_invalidation_between_read_and_set_drops_the_value(invalidate):
+    cache = TTLCache(maxsize=10)
+    generation = cache.generation  # caller reads, then loads from the database...
+    invalidate(cache)  # ...while someone invalidates
+    cache.set("k", "stale", generation=generation)
+    assert cache.get("k") is MISSING
+
+    cache.set("k", "fresh", generation=cache.generation)
+    assert cache.get("k") == "fresh"
+
+
+def test_set_without_generation_always_stores():
+    cache = TTLCache(maxsize=10)
+    cache.clear()
+    cache.set("k", 1)
+    assert cache.get("k") == 1
+
+
+def test_discard_where_removes_only_matching_keys():
+    cache = TTLCache(maxsize=10)
+    for key in [("u1", "p1"), ("u1", "p2"), ("u2", "p1")]:
+        cache.set(key, True)
+    before = cache.generation
+    cache.discard_where(lambda key: key[1] == "p1")
+    assert cache.generation == before + 1
+    assert cache.get(("u1", "p2")) is True
+    assert cache.get(("u1", "p1")) is MISSING and cache.get(("u2", "p1")) is MISSING
+
+
+def test_lru_eviction_and_expiry():
+    cache = TTLCache(maxsize=2, ttl=60.0)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "b" is now least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1 and cache.evictions == 1
+
+    cache.set("short", 1, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("short", None) is None
@@ -0,0 +1,95 @@
+"""The single-pass Aho-Corasick matcher against a plain substring scan of the same table."""
+import random
+
+import pytest
+
+from app.services.clinical_rules import CLINICAL_RULES, ClinicalMatcher, _Automaton, analyze_symptoms
+
+WORDS = [
+    "chest", "pain", "chest pain", "Chest Pain", "fever", "FEVER", "cough", "coughing",
+    "shortness of breath", "shortness", "of", "breath", "loss of consciousness", "loss",
+    "abdominal", "abdominal pain", "severe", "mild", "and", "ness", "feve", "r",
+]
+
+# Overlapping and nested patterns, where failure links matter.
+OVERLAPPING = {
+    "urgency": [
+        {"pattern": "he", "min_severity": 3, "level": "A"},
+        {"pattern": "she", "level": "B"},
+        {"pattern": "hers", "min_days": 2, "level": "C"},
+        {"pattern": "his", "level": "D"},
+    ],
+    "default_urgency": "NONE",
+    "insights": [{"all": ["she", "his"], "insight": {"i": 1}}, {"all": ["ers"], "insight": {"i": 2}}],
+    "default_insight": {"i": 0},
+    "tests": [{"any": ["hers", "is"], "test": {"t": 1}}, {"any": ["h"], "test": {"t": 2}}],
+}
+
+
+def _scan(table, symptoms):
+    """What the hand-written rules did: `pattern in text` for every rule."""
+    names = [name.lower() for name, _, _ in symptoms]
+    text = " ".join(names)
+    urgency = table.get("default_urgency", "ROUTINE")
+    for name, (_, severity, days) in zip(names, symptoms):
+        level = next(
+            (r["level"] for r in table["urgency"]
+             if r["pattern"].lower() in name
+             and severity >= r.get("min_severity", 0) and days >= r.get("min_days", 0)),
+            None,
+        )
+        if level is not None:
+            urgency = level
+            break
+    insights = [r["insight"] for r in table["insights"] if all(p.lower() in text for p in r["all"])]
+    if not insights and table.get("default_insight") is not None:
+        insights = [table["default_insight"]]
+    tests = [r["test"] for r in table["tests"] if any(p.lower() in text for p in r["any"])]
+    return urgency, insights, tests
+
+
+def _sessions(rng, words, n):
+    for _ in range(n):
+        yield [
+            (" ".join(rng.choice(words) for _ in range(rng.randint(1, 4))), rng.randint(0, 10), rng.randint(0, 7))
+            for _ in range(rng.randint(0, 4))
+        ]
+
+
+@pytest.mark.parametrize("table,words", [
+    (CLINICAL_RULES, WORDS),
+    (OVERLAPPING, ["he", "she", "hers", "his", "h", "e", "rs", "ushers", "x", "s"]),
+])
+def test_matcher_agrees_with_substring_scan(table, words):
+    matcher = ClinicalMatcher(table)
+    rng = random.Random(7)
+    for symptoms in _sessions(rng, words, 20000):
+        assert tuple(matcher.analyze(symptoms)) == _scan(table, symptoms), symptoms
+
+
+def test_automaton_reports_every_occurrence():
+    patterns = ["he", "she", "his", "hers", "h", "ushers"]
+    automaton = _Automaton(patterns)
+    rng = random.Random(3)
+    for _ in range(2000):
+        text = "".join(rng.choice("hesrux") for _ in range(rng.randint(0, 30)))
+        expected = sorted(
+            (end, idx)
+            for idx, p in enumerate(patterns)
+            for end in range(len(p), len(text) + 1)
+            if text[end - len(p):end] == p
+        )
+        assert sorted((end, idx) for idx, end in automaton.find(text)) == expected, text
+
+
+def test_synonyms_reach_the_patterns():
+    result = analyze_symptoms([{"symptom": "SOB", "severity": 8, "duration_days": 1}])
+    assert result.urgency == "URGENT"
+    assert [t["test"] for t in result.tests] == ["Chest X-ray"]
+
+    result = analyze_symptoms([
+        {"symptom": "pyrexia", "severity": 2, "duration_days": 1},
+        {"symptom": "coughing", "severity": 2, "duration_days": 1},
+    ])
+    assert result.urgency == "ROUTINE"
+    assert [i["condition"] for i in result.insights] == ["Respiratory infection"]
@@ -0,0 +1,105 @@
+import asyncio
+import base64
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.pagination import decode_cursor, encode_cursor, fetch_page, parse_fields
+
+
+class FakeCursor:
+    """Runs fetch_page's keyset query over in-memory rows (descending by created_at, id)."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    async def execute(self, query, args):
+        self.queries.append(query.as_string(None))
+        self.args = list(args)
+
+    async def fetchall(self):
+        sql, args = self.queries[-1], self.args[1:]  # args[0] is the owner param
+        rows = sorted(self.rows, key=lambda r: (r["created_at"], r["id"]), reverse=True)
+        if "(%s::timestamptz, %s::uuid)" in sql:
+            after = (datetime.fromisoformat(args.pop(0)), uuid.UUID(args.pop(0)))
+            rows = [r for r in rows if (r["created_at"], r["id"]) < after]
+        if "LIMIT" in sql:
+            rows = rows[:args.pop(0)]
+        return [dict(r) for r in rows]
+
+
+def _rows(n):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    # Pairs share a timestamp so the id tiebreak matters.
+    return [{"id": uuid.uuid4(), "created_at": start + timedelta(seconds=i // 2), "text": f"n{i}"} for i in range(n)]
+
+
+def _page(cur, cursor=None, limit=None, fields=None):
+    return asyncio.run(fetch_page(
+        cur, table="notes", allowed=["id", "text", "created_at"], where="owner_user_id=%s",
+        params=("owner",), fields=fields, cursor=cursor, limit=limit,
+    ))
+
+
+def test_cursor_round_trip():
+    when = datetime(2026, 3, 4, 5, 6, 7, 890123, tzinfo=timezone.utc)
+    row_id = uuid.uuid4()
+    cursor = encode_cursor(when, row_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (when.isoformat(), str(row_id))
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    "",
+    base64.urlsafe_b64encode(b'["2026-01-01T00:00:00", "not-a-uuid"]').decode(),
+    base64.urlsafe_b64encode(b'["yesterday", "' + str(uuid.uuid4()).encode() + b'"]').decode(),
+    base64.urlsafe_b64encode(b'["2026-01-01T00:00:00"]').decode(),
+    base64.urlsafe_b64encode(b'{"a": 1}').decode(),
+])
+def test_bad_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor)
+    assert exc.value.status_code == 400
+
+
+def test_pages_cover_every_row_once_in_order():
+    rows = _rows(23)
+    cur = FakeCursor(rows)
+    seen, cursor = [], None
+    while True:
+        page = _page(cur, cursor=cursor, limit=5)
+        seen.extend(r["id"] for r in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    expected = [r["id"] for r in sorted(rows, key=lambda r: (r["created_at"], r["id"]), reverse=True)]
+    assert seen == expected
+
+
+def test_no_limit_or_cursor_returns_everything():
+    cur = FakeCursor(_rows(settings.PAGE_DEFAULT_LIMIT + 7))
+    page = _page(cur)
+    assert len(page["items"]) == settings.PAGE_DEFAULT_LIMIT + 7
+    assert page["next_cursor"] is None
+    assert "LIMIT" not in cur.queries[-1]
+
+
+def test_cursor_without_limit_uses_the_default_page_size():
+    cur = FakeCursor(_rows(3 * settings.PAGE_DEFAULT_LIMIT))
+    first = _page(cur, limit=1)
+    page = _page(cur, cursor=first["next_cursor"])
+    assert len(page["items"]) == settings.PAGE_DEFAULT_LIMIT
+    assert page["next_cursor"] is not None
+
+
+def test_projection_drops_the_keyset_columns():
+    page = _page(FakeCursor(_rows(3)), limit=2, fields="text")
+    assert [set(r) for r in page["items"]] == [{"text"}, {"text"}]
+    assert page["next_cursor"] is not None
+    with pytest.raises(HTTPException):
+        parse_fields("text,password_hash", ["id", "text"])
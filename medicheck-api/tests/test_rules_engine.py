@@ -0,0 +1,136 @@
+"""
+Differential checks for the rules engine: the indexed, planned and memoized
+evaluation paths must agree with a plain scan of every rule through the
+uncompiled _eval_clause, on synthetic rule sets (benchmarks/rules_synth.py).
+"""
+import pytest
+
+import rules_synth
+from app.services import rules_engine
+from app.services.rules_engine import (
+    _context_for,
+    _eval_clause,
+    _evaluate,
+    _evaluate_cached,
+    _recommendation_id,
+    _triage_rank,
+    compile_ruleset,
+    reoptimize_rules,
+    reset_rules_profile,
+    set_profile_sample_rate,
+)
+
+SEEDS = [(seed, mixed) for seed in (1, 2, 3) for mixed in (False, True)]
+
+
+@pytest.fixture(autouse=True)
+def _quiet_profiler():
+    set_profile_sample_rate(0.0)
+    reset_rules_profile()
+    rules_engine._results.clear()
+    yield
+    set_profile_sample_rate(0.0)
+    reset_rules_profile()
+    rules_engine._results.clear()
+
+
+def _clause(clause, context, symptoms_set):
+    # Compiled rules treat a non-dict clause as never true.
+    return isinstance(clause, dict) and _eval_clause(clause, context, symptoms_set)
+
+
+def _rule_matches(conditions, context, symptoms_set):
+    all_list = conditions.get("all") or []
+    any_list = conditions.get("any") or []
+    none_list = conditions.get("none") or []
+    return (
+        all(_clause(c, context, symptoms_set) for c in all_list)
+        and (not any_list or any(_clause(c, context, symptoms_set) for c in any_list))
+        and not any(_clause(c, context, symptoms_set) for c in none_list)
+    )
+
+
+def _reference(rows, payload):
+    """Every rule in (priority, id) order, no index, no plan, no cache."""
+    context, symptoms_set = _context_for(payload)
+    matched, recs = [], {}
+    triage, best = None, -1
+    for row in rows:
+        if not isinstance(row["conditions"], dict) or not isinstance(row["outcomes"], dict):
+            continue
+        if not _rule_matches(row["conditions"], context, symptoms_set):
+            continue
+        matched.append(int(row["id"]))
+        outcome = row["outcomes"].get("triage")
+        if isinstance(outcome, dict) and outcome.get("level") and _triage_rank(outcome) > best:
+            triage, best = outcome, _triage_rank(outcome)
+        for rec in row["outcomes"].get("recommendations") or ():
+            if isinstance(rec, dict):
+                recs.setdefault(_recommendation_id(rec), rec)
+    return {
+        "matched_rule_ids": matched,
+        "triage": triage if triage is not None else rules_engine._NO_TRIAGE,
+        "recommendations": list(recs.values()),
+    }
+
+
+def _summary(result):
+    ids = result.get("matched_rule_ids")
+    if ids is None:
+        ids = [m["rule_id"] for m in result["matched_rules"]]
+    return {"matched_rule_ids": ids, "triage": result["triage"], "recommendations": result["recommendations"]}
+
+
+def _population(seed, mixed, n_rules=300, n_payloads=400):
+    rows = rules_synth.rules(n_rules, seed=seed, mixed=mixed)
+    return rows, rules_synth.payloads(n_payloads, seed=seed * 7919, mixed=mixed)
+
+
+@pytest.mark.parametrize("seed,mixed", SEEDS)
+def test_indexed_matches_full_scan(seed, mixed):
+    rows, payloads = _population(seed, mixed)
+    ruleset = compile_ruleset(rows, version=seed)
+    for payload in payloads:
+        assert _summary(_evaluate(ruleset, payload)) == _reference(rows, payload), payload
+
+
+@pytest.mark.parametrize("seed,mixed", SEEDS)
+def test_reoptimized_plans_match_full_scan(seed, mixed):
+    rows, payloads = _population(seed, mixed)
+    ruleset = compile_ruleset(rows, version=seed)
+    set_profile_sample_rate(1.0)
+    for payload in payloads:
+        _evaluate(ruleset, payload)
+    set_profile_sample_rate(0.0)
+    assert reoptimize_rules(ruleset) > 0
+    for payload in payloads:
+        assert _summary(_evaluate(ruleset, payload)) == _reference(rows, payload), payload
+
+
+@pytest.mark.parametrize("seed,mixed", SEEDS)
+def test_memoized_matches_full_scan(seed, mixed):
+    rows, payloads = _population(seed, mixed)
+    ruleset = compile_ruleset(rows, version=seed)
+    expected = []
+    for payload in payloads:
+        want = _reference(rows, payload)
+        expected.append((payload, want))
+        with_ids = [rec if "id" in rec else {"id": _recommendation_id(rec), **rec} for rec in want["recommendations"]]
+        expected.append(({**payload, "response_mode": "compact"}, {**want, "recommendations": with_ids}))
+    for _ in range(2):  # second pass is served from the result cache
+        for payload, want in expected:
+            assert _summary(_evaluate_cached(ruleset, payload)) == want, payload
+    assert rules_engine._results.hits > 0
+
+
+@pytest.mark.parametrize("seed,mixed", SEEDS[:2])
+def test_stop_on_emergency_is_a_prefix(seed, mixed):
+    rows, payloads = _population(seed, mixed)
+    ruleset = compile_ruleset(rows, version=seed)
+    emergency = {int(r["id"]) for r in rows if (r["outcomes"].get("triage") or {}).get("level") == "emergency"}
+    for payload in payloads:
+        full = _reference(rows, payload)["matched_rule_ids"]
+        got = _evaluate(ruleset, {**payload, "response_mode": "compact", "stop_on_emergency": True})
+        first = next((i for i, rid in enumerate(full) if rid in emergency), None)
+        assert got["matched_rule_ids"] == (full if first is None else full[:first + 1])
+        assert got["short_circuited"] == (first is not None)
@@ -0,0 +1,13 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from rules_vectorized_diff import diff_round  # noqa: E402
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3, 4])
+@pytest.mark.parametrize("chunk_size", [7, 512])
+def test_columnar_matches_scalar(seed, chunk_size):
+    mismatches, compared, _, _, _ = diff_round(seed, 200, 600, chunk_size=chunk_size, mixed=seed % 2 == 0)
+    assert compared == 600
+    assert not mismatches, mismatches[0]
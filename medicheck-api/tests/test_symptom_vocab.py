@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from app.services import symptom_vocab
+from app.services.symptom_vocab import (
+    BUILTIN_SYMPTOMS,
+    SymptomVocabulary,
+    canonical_symptom,
+    lookup_symptom,
+    mentioned_symptoms,
+    normalize,
+    set_vocabulary,
+)
+
+
+@pytest.fixture
+def builtin_vocabulary():
+    yield
+    set_vocabulary(SymptomVocabulary(BUILTIN_SYMPTOMS))
+
+
+@pytest.mark.parametrize("raw,key", [
+    ("SOB", "shortness_of_breath"),
+    ("Shortness-of-breath", "shortness_of_breath"),
+    ("  shortness_of_breath ", "shortness_of_breath"),
+    ("stiff neck", "neck_stiffness"),
+    ("Knee swelling", "knee_swelling"),
+    ("", ""),
+])
+def test_canonical_symptom(raw, key):
+    assert canonical_symptom(raw) == key
+
+
+def test_mentions_take_the_longest_phrase():
+    assert mentioned_symptoms("worst headache of life, then SOB and a head ache") == (
+        "severe_headache", "shortness_of_breath", "headache",
+    )
+    assert mentioned_symptoms("chest pain and chest pressure") == ("chest_pain",)
+
+
+def _phrases():
+    # Canonical names first, as SymptomVocabulary does.
+    phrases = {normalize(key): "_".join(normalize(key)) for key in BUILTIN_SYMPTOMS}
+    for key, aliases in BUILTIN_SYMPTOMS.items():
+        for alias in aliases:
+            phrases.setdefault(normalize(alias), "_".join(normalize(key)))
+    return phrases
+
+
+def _naive_mentions(tokens, phrases):
+    """Try every phrase at every position; the longest wins."""
+    found, i = [], 0
+    while i < len(tokens):
+        best = max((p for p in phrases if tuple(tokens[i:i + len(p)]) == p), key=len, default=None)
+        if best is None:
+            i += 1
+            continue
+        if phrases[best] not in found:
+            found.append(phrases[best])
+        i += len(best)
+    return tuple(found)
+
+
+def test_trie_agrees_with_naive_scan():
+    phrases = _phrases()
+    vocab = SymptomVocabulary(BUILTIN_SYMPTOMS)
+    words = sorted({t for p in phrases for t in p}) + ["and", "mild", "since", "yesterday"]
+    rng = random.Random(11)
+    for _ in range(5000):
+        tokens = [rng.choice(words) for _ in range(rng.randint(0, 12))]
+        text = rng.choice([" ", ", ", "-"]).join(tokens)
+        assert vocab.lookup(text).mentions == _naive_mentions(normalize(text), phrases), text
+
+
+def test_set_vocabulary_invalidates_cached_lookups(builtin_vocabulary):
+    assert lookup_symptom("Tummy rumbles").key == "tummy_rumbles"
+    assert symptom_vocab._lookups.get("Tummy rumbles") is not symptom_vocab.MISSING
+    set_vocabulary(SymptomVocabulary({**BUILTIN_SYMPTOMS, "borborygmi": ("tummy rumbles",)}))
+    assert lookup_symptom("Tummy rumbles").key == "borborygmi"